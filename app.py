@@ -1,602 +1,1300 @@
-import random
+import os
+import json
 import time
-import uuid
+import logging
 import threading
-from copy import deepcopy
-from flask import Flask, render_template, request, jsonify
-from flask_socketio import SocketIO, emit, join_room
+import functools
+import mimetypes
+import uuid
+import random
+import secrets
+import multiprocessing
+from itertools import islice, count
+from concurrent.futures import ProcessPoolExecutor
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
+from flask_socketio import SocketIO
+
+import engine
+from engine import CARD_TYPES
+from rooms import Room, RoomRegistry, DEFAULT_ROOM_ID, ROOM_QUEUE_MAX
+from delta import diff_snapshot
+from scheduler import Scheduler
+from journal import Journal
+from history import HistoryStore
+from backend import backend_from_env
+import wire
+import bots
+import assets
+import limits
+import metrics
 
-app = Flask(__name__)
-socketio = SocketIO(app, cors_allowed_origins="*")
-
-# ====== 常數與卡池 ======
-MAX_PLAYERS = 6
-CARDS_PER_PLAYER = 5
-MAX_ROUNDS = 3
-GAME_TIME_LIMIT_SEC = 30 * 60
-BLUFF_TIMEOUT_MS = 5000
-
-# 注意：鍵名需與前端一致（包含空白/特殊字元）
-CARD_TYPES = [" 壽星", " 小丑", " 贈禮者", "️ 偵探", " 守護者", " 狙擊手"]
-ROLE_POOL_30 = []
-for c in CARD_TYPES:
-    ROLE_POOL_30 += [c] * 5  # 6 種 x 5 = 30
-
-ROLE_DISPLAY_NAMES = {
-    " 壽星": "斬魂米娜",
-    " 小丑": "海賊王",
-    " 贈禮者": "假純愛戰士",
-    "️ 偵探": "小菊獸",
-    " 守護者": "烈焰雯の魂",
-    " 狙擊手": "祖濕爺",
-}
+if __name__ == "__main__":
+    # 由 server.py 啟動（見該檔說明）：在建立任何東西之前換掉這個行程
+    import server
+    server.exec_main()
 
-# ====== 全域狀態與輔助容器（Timer 不可放進可序列化狀態）======
-pending_prompts = {}       # prompt_id -> {player, target, role, had_card, extra, timer}
-force_choice_timers = {}   # player_name -> Timer
+logger = logging.getLogger(__name__)
 
-def new_game_state():
-    return {
-        "room_id": "main",
-        "players": {},          # name -> {roles, score, guardian_active, mark_target, mark_used_turn, is_admin, stats}
-        "player_order": [],     # 出手順序
-        "current_turn": None,
-        "draw_pile": [],
-        "discard_pile": [],
-        "logs": [],
-        "game_started": False,
-        "max_players": MAX_PLAYERS,
-        "turn_index": 0,        # 累計已進行的出手次數
-        "max_rounds": MAX_ROUNDS,
-        "start_ts": None,
-        "deadline_ts": None,
-        "pending_prompt_id": None,
-        "turn_marker": None,
-    }
+# 後端於啟動時由環境變數決定：預設單一行程；BIRTHDAY_WORKERS>1 時為叢集中的一個 worker
+backend = backend_from_env(os.environ)
+app = Flask(__name__)
+socketio = SocketIO(app, cors_allowed_origins="*", client_manager=backend.client_manager())
+
+
+# ====== 傳輸層 ======
+# 執行緒模式直接使用 Flask-SocketIO；asyncio 模式（asgi.py）以 use_runtime() 換成 AsyncServer 的實作。
+class ThreadedTransport:
+    def __init__(self, sio):
+        self.sio = sio
+
+    def emit(self, event, payload, to):
+        self.sio.emit(event, payload, room=to)
+
+    def enter_room(self, sid, room_id):
+        self.sio.server.enter_room(sid, room_id)
+
+    def leave_room(self, sid, room_id):
+        self.sio.server.leave_room(sid, room_id)
+
+    def close_room(self, room_id):
+        self.sio.close_room(room_id)
+
+    def is_connected(self, sid):
+        return self.sio.server.manager.is_connected(sid, "/")
+
+ROOM_REAP_INTERVAL_SEC = 60
+ASSET_MAX_AGE_SEC = 365 * 24 * 3600
+INDEX_CACHE = os.environ.get("BIRTHDAY_INDEX_CACHE", "1") != "0"   # 關閉時每次請求重新產生頁面（改模板時用）
+JOURNAL_DIR = "data" if backend.workers == 1 else os.path.join("data", "worker-%d" % backend.worker_id)
+SNAPSHOT_INTERVAL_SEC = 30
+HISTORY_DIR = os.path.join(JOURNAL_DIR, "history")
+HISTORY_ENABLED = os.environ.get("BIRTHDAY_HISTORY", "1") != "0"
+LONG_POLL_MAX_SEC = 30
+SSE_HEARTBEAT_SEC = 15
+REMOTE_POLL_SEC = 0.5   # 房間在別的 worker 時，等待變更改為定期詢問 owner
+# 觀戰：合併後的快照每秒送出的次數，以及比玩家晚多久看到（防止場外報牌）
+SPECTATOR = "spectator"
+SPECTATOR_ROOM_SUFFIX = "#s"
+SPECTATOR_HZ = float(os.environ.get("BIRTHDAY_SPECTATOR_HZ", "2"))
+SPECTATOR_DELAY_SEC = float(os.environ.get("BIRTHDAY_SPECTATOR_DELAY_SEC", "10"))
+# 兩次狀態廣播的最小間隔（毫秒）；0 = 每個事件處理完就送出
+BROADCAST_MIN_INTERVAL_SEC = float(os.environ.get("BIRTHDAY_BROADCAST_INTERVAL_MS", "0")) / 1000.0
+BROADCAST_BYTES_SAMPLE = 16    # 廣播大小指標：每幾次廣播量一次
+broadcast_counter = count()
+# 電腦玩家：搜尋在行程池中進行；每個決策有思考預算，超過硬性截止（預算 + 寬限）就改用隨機走法
+BOT = "bot"
+TAKEOVER = "takeover"
+BOT_NAME = "電腦%d"
+BOT_WORKERS = int(os.environ.get("BIRTHDAY_BOT_WORKERS", "1"))
+BOT_THINK_SEC = float(os.environ.get("BIRTHDAY_BOT_THINK_MS", "1500")) / 1000.0
+BOT_REPLY_THINK_SEC = min(BOT_THINK_SEC, engine.BLUFF_TIMEOUT_MS / 2000.0)   # 拆穿與強制選擇有 5 秒時限
+BOT_GRACE_SEC = 0.5
+BOT_TAKEOVER_SEC = float(os.environ.get("BIRTHDAY_BOT_TAKEOVER_SEC", "30"))  # 斷線多久由電腦代打；0 = 不代打
+
+# 卡牌 → static/images 原圖檔名；實際網址由資產清單（含內容雜湊）決定
+CARD_IMAGES = {
+    " 壽星": "minatest.png",
+    " 小丑": "circletest.png",
+    " 贈禮者": "larrytest.jpg",
+    "️ 偵探": "edwardtest.png",
+    " 守護者": "arwentest.png",
+    " 狙擊手": "jasportest.jpg",
+}
 
-game_state = new_game_state()
+rooms = RoomRegistry(engine.new_game_state)
+scheduler = Scheduler("game-timers")
+spectator_scheduler = Scheduler("spectator-feed")   # 觀戰扇出另開一條，不拖慢遊戲計時器
+transport = ThreadedTransport(socketio)
+client_encodings = {}   # sid -> 協商後的編碼（連線所在的 worker 記錄）
+client_roles = {}       # sid -> SPECTATOR（觀戰連線；玩家連線不記錄）
+# 單獨啟動時在這裡建置；cluster.py 會在啟動 worker 前先建好，這裡就只讀不寫
+asset_manifest = assets.build_assets()
+asset_encodings = assets.precompressed(asset_manifest)
+index_cache = {}    # 產生好的首頁：{"tag": ETag 基底, 編碼: 內容}
+journal = None      # enable_persistence() 後才會寫入指令日誌
+history = None      # enable_history() 後才會寫入對局歷史
+bot_pool = None     # 第一次需要電腦玩家思考時才建立
+bot_pool_lock = threading.Lock()
+limiter = limits.RateLimiter() if limits.RATE_LIMIT_ENABLED else None
+
+# ====== 指標（/metrics）======
+HANDLER_SECONDS = metrics.Histogram("birthday_handler_seconds", "房間事件處理器在房間執行者上的執行時間（不含排隊、被拒絕與重複的指令）",
+                                    labels=("handler",))
+BROADCAST_SECONDS = metrics.Histogram("birthday_broadcast_seconds", "broadcast_state 組快照、比對差異與發送的時間")
+BROADCAST_BYTES = metrics.Histogram("birthday_broadcast_bytes", "狀態廣播的 JSON 大小（每 %d 次抽樣一次）" % BROADCAST_BYTES_SAMPLE,
+                                    metrics.BYTES_BUCKETS)
+EMITS = metrics.Counter("birthday_emits_total", "送往房間或單一連線的事件數", labels=("event",))
+COMMANDS_REJECTED = metrics.Counter("birthday_commands_rejected_total", "房間指令佇列已滿而拒絕的指令數")
+EVENTS_REJECTED = metrics.Counter("birthday_events_rejected_total", "進入處理器前被擋下的事件數，依原因分類（速率 / 格式 / 合併）",
+                                  labels=("event", "reason"))
+COMMANDS_DEDUPED = metrics.Counter("birthday_commands_deduped_total", "指令 ID 重複而略過的指令數")
+RESUMES = metrics.Counter("birthday_resumes_total", "重連續玩次數，依補送方式分類", labels=("result",))
+REPLAYED_EVENTS = metrics.Counter("birthday_replayed_events_total", "重連時補送的房間事件數")
+BLUFF_TIMEOUTS = metrics.Counter("birthday_bluff_timeouts_total", "拆穿提示逾時（視為不揭穿）次數")
+GAME_SECONDS = metrics.Histogram("birthday_game_duration_seconds", "每局遊戲時間", metrics.DURATION_BUCKETS)
+BOT_DECISIONS = metrics.Counter("birthday_bot_decisions_total", "電腦玩家的決策數，依來源分類（搜尋 / 逾時改用隨機）",
+                                labels=("result",))
+BOT_THINK_SECONDS = metrics.Histogram("birthday_bot_think_seconds", "電腦玩家從送出搜尋到取得結果的時間",
+                                      (0.25, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0))
+
+def count_timers(room):
+    return (len(room.prompt_timers) + len(room.force_choice_timers)
+            + sum(t is not None for t in (room.turn_timer, room.game_timer, room.flush_timer)))
+
+metrics.Gauge("birthday_rooms", "本 worker 持有的房間數", lambda: len(rooms))
+metrics.Gauge("birthday_connections", "本 worker 上的連線數", lambda: len(client_encodings))
+metrics.Gauge("birthday_players", "所有房間的玩家數", lambda: sum(len(r.state["players"]) for r in rooms.all()))
+metrics.Gauge("birthday_spectators", "所有房間的觀戰連線數", lambda: sum(len(r.spectators) for r in rooms.all()))
+metrics.Gauge("birthday_pending_prompts", "等待回應的拆穿提示數",
+              lambda: sum(len(r.state["pending_prompts"]) for r in rooms.all()))
+metrics.Gauge("birthday_queued_commands", "所有房間等待執行的指令數", lambda: sum(len(r.commands) for r in rooms.all()))
+metrics.Gauge("birthday_timers", "排程中的房間計時器數", lambda: sum(count_timers(r) for r in rooms.all()))
+metrics.Gauge("birthday_bots_thinking", "正在思考的電腦玩家決策數", lambda: sum(len(r.bot_thinking) for r in rooms.all()))
 
 # ====== 工具函數 ======
-def now_ts():
-    return int(time.time())
+def game_time_remaining_ms(room):
+    return engine.time_remaining_ms(room.state, time.time())
 
-def game_time_remaining_ms():
-    if not game_state["game_started"] or not game_state["deadline_ts"]:
-        return None
-    remain = max(0, game_state["deadline_ts"] - now_ts())
-    return remain * 1000
-
-def num_players():
-    return len(game_state["player_order"])
-
-def round_number():
-    if not game_state["game_started"] or num_players() == 0:
-        return 0
-    # 以「每人一次出手」為 1 輪
-    return (game_state["turn_index"] // max(1, num_players())) + 1
-
-def add_log(text):
-    game_state["logs"].append(text)
-    if len(game_state["logs"]) > 200:
-        game_state["logs"] = game_state["logs"][-200:]
-
-def next_player_name(curr):
-    order = game_state["player_order"]
-    if not order:
-        return None
-    if curr not in order:
-        return order[0]
-    i = (order.index(curr) + 1) % len(order)
-    return order[i]
+def round_number(room):
+    return engine.round_number(room.state)
 
 def sanitize_players_for_emit(players_raw):
-    players_clean = {}
-    for name, p in players_raw.items():
-        q = dict(p)
-        # 確保沒有 Timer 類型進入
-        q.pop("force_choice_timer", None)
-        players_clean[name] = q
-    return players_clean
-
-def broadcast_state():
-    state = {
+    # 公開狀態不含手牌內容，只留張數；手牌另由 push_hands() 私下送給本人
+    return {name: p.to_wire() for name, p in players_raw.items()}
+
+def hand_of(room, name):
+    p = room.state["players"].get(name)
+    if not p:
+        return []
+    # 管理員顯示所有卡
+    return CARD_TYPES.copy() if p.is_admin else p.roles.to_list()
+
+# ====== 房間路由：在本機執行，或轉送給持有房間的 worker ======
+ROOM_HANDLERS = {}      # 處理器名稱 -> fn(room, data, sid)
+
+COALESCED_HANDLERS = {"handle_get_my_cards": "get_my_cards", "handle_request_full_state": "request_full_state"}
+
+def room_id_of(data, sid):
+    # 事件可帶 room_id；否則使用此連線所在房間
+    room_id = data.get("room_id") if isinstance(data, dict) else None
+    return room_id or rooms.room_id_for_sid(sid)
+
+def call_room(room_id, handler, data, sid):
+    if not backend.is_local(room_id):
+        backend.send(backend.owner(room_id),
+                     {"op": "event", "room": room_id, "handler": handler, "data": data, "sid": sid})
+        return
+    room = rooms.get(room_id)
+    if not room:
+        return
+    room.touch()
+    # 唯讀請求（補手牌、要完整狀態）同一連線已在佇列中時不再排入：前一個執行時就會送出最新結果
+    key = (handler, sid) if handler in COALESCED_HANDLERS else None
+    if key is not None:
+        with room.queue_lock:
+            if key in room.inflight:
+                EVENTS_REJECTED.inc(COALESCED_HANDLERS[handler], "coalesced")
+                return
+            room.inflight.add(key)
+    if not submit(room, run_handler, (handler, data, sid)):
+        if key is not None:
+            with room.queue_lock:
+                room.inflight.discard(key)
+        COMMANDS_REJECTED.inc()
+        emit_sid(room, "error", {"message": "操作太頻繁，請稍後再試"}, sid)
+
+def run_handler(room, handler, data, sid):
+    if handler in COALESCED_HANDLERS:
+        with room.queue_lock:
+            room.inflight.discard((handler, sid))
+    if sid in room.spectators:
+        # 觀戰者不能下指令；要求完整狀態時改送延遲後的畫面
+        if handler == "handle_request_full_state":
+            room.spectator_joins.append(sid)
+        else:
+            transport.emit("error", {"message": "觀戰中，無法操作"}, sid)
+        return
+    # 客戶端可帶 cmd_id：重送或連點送出的同一個指令只執行一次
+    cmd_id = data.get("cmd_id") if isinstance(data, dict) else None
+    if cmd_id is not None and not room.remember_command(cmd_id):
+        COMMANDS_DEDUPED.inc()
+        return
+    # 只量處理器真正執行的時間：事件進來時只是排入佇列，在那裡量到的是排隊或順手取完別人的指令
+    if not metrics.ENABLED:
+        ROOM_HANDLERS[handler](room, data, sid)
+        return
+    t0 = time.perf_counter()
+    try:
+        ROOM_HANDLERS[handler](room, data, sid)
+    finally:
+        HANDLER_SECONDS.observe(time.perf_counter() - t0, handler)
+
+# ====== 房間指令佇列：每個房間同一時間只有一個執行者 ======
+# 事件處理與逾時回呼都先排進房間的佇列；沒有執行者時由送出的這條執行緒負責取完
+# （逾時回呼例外：見 run_in_room），已有執行者時只入列就返回。房間之間互不等待，同一房間的狀態只被一個執行者改動。
+# 房間鎖只用來和讀取端互斥：state_body（HTTP 狀態與其他 worker 的 state 請求）讀取前要先取得。
+def submit(room, fn, args, bounded=True):
+    with room.queue_lock:
+        if bounded and len(room.commands) >= ROOM_QUEUE_MAX:
+            return False
+        room.commands.append((fn, args))
+        if room.draining:
+            return True
+        room.draining = True
+    drain(room)
+    return True
+
+def drain(room):
+    while True:
+        with room.queue_lock:
+            if not room.commands:
+                room.draining = False
+                return
+            fn, args = room.commands.popleft()
+        with room.lock:
+            if rooms.get(room.room_id) is not room:
+                continue    # 房間已關閉，剩下的指令一併丟棄
+            try:
+                fn(room, *args)
+            except Exception:
+                logger.exception("room %s command failed: %r", room.room_id, fn)
+
+def room_handler(fn):
+    # Socket 事件：解析所在房間，並在持有該房間的 worker、該房間的執行環境（鎖）內處理
+    ROOM_HANDLERS[fn.__name__] = fn
+
+    @functools.wraps(fn)
+    def wrapper(sid, data=None):
+        room_id = room_id_of(data, sid)
+        if room_id:
+            call_room(room_id, fn.__name__, data, sid)
+    return wrapper
+
+# ====== 指令執行：規則引擎 → 事件發送 → 計時器對齊 ======
+def run_command(room, name, data, sid=None):
+    now = time.time()
+    start_ts = room.state["start_ts"]
+    events = engine.COMMANDS[name](room.state, data, now, room.rng)
+    if history and start_ts and room.state["start_ts"] != start_ts:
+        history.record_abandon(room.room_id, start_ts)   # 上一局沒打完就重開
+    # 被拒絕的指令不會改動狀態，不必寫入日誌
+    if journal and not (len(events) == 1 and events[0][0] == engine.REPLY):
+        room.journal_seq = journal.append(room.room_id, name, data, now)
+    if name == "prompt_timeout" and events:
+        BLUFF_TIMEOUTS.inc()
+    dispatch(room, events, sid)
+    flush_state(room)
+    push_hands(room)
+    sync_timers(room)
+    drive_bots(room)
+    return events
+
+def dispatch(room, events, sid=None):
+    # STATE 標記只把房間標成待廣播；同一個指令裡的多次標記合併成一次，由 flush_state() 送出。
+    # 其後若還有房間事件（如 game_over），先把狀態送出，客戶端看到的先後順序不變。
+    for name, payload in events:
+        if name == engine.STATE:
+            room.state_dirty = True
+        elif name == engine.REPLY:
+            if sid:
+                emit_sid(room, name, payload, sid)
+        elif name == engine.HISTORY:
+            if history:
+                history.record_action(room.room_id, room.state["start_ts"], payload)
+        else:
+            if room.state_dirty:
+                broadcast_state(room)
+            if name == "game_over" and room.state["start_ts"]:
+                GAME_SECONDS.observe(time.time() - room.state["start_ts"])
+                if history:
+                    history.record_game(room.room_id, room.state["start_ts"], time.time(),
+                                        room.state["turn_index"], payload)
+            emit_room(room, name, payload)
+
+# ====== 發送：依連線協商的編碼（JSON / 精簡二進位），每種編碼只序列化一次 ======
+# 房間事件帶第二個參數：房間事件序號。事件同時放進房間的環狀緩衝區，重連時只補送漏掉的部分。
+def emit_room(room, event, payload):
+    EMITS.inc(event)
+    room.event_seq += 1
+    seq = room.event_seq
+    room.event_buffer.append((seq, event, payload))
+    transport.emit(event, (payload, seq), room.room_id)
+    if room.compact_sids:
+        transport.emit(event, (wire.encode(payload), seq), wire.socket_room(room.room_id, wire.COMPACT))
+
+def emit_sid(room, event, payload, sid):
+    EMITS.inc(event)
+    if sid in room.compact_sids:
+        payload = wire.encode(payload)
+    transport.emit(event, payload, sid)
+
+# ====== 私人頻道：手牌只送給本人 ======
+def bind_player(room, name, sid):
+    room.player_sids[name] = sid
+    room.hands_sent.pop(name, None)
+    if room.bots.get(name) == TAKEOVER:
+        set_bot(room, name, None)       # 本人回來了，交還座位
+
+def push_hands(room):
+    # 發牌、抽牌、棄牌與出牌消耗後，只把有變動的手牌送給該玩家的連線
+    for name in room.state["players"]:
+        sid = room.player_sids.get(name)
+        if not sid:
+            continue
+        hand = hand_of(room, name)
+        if room.hands_sent.get(name) != hand:
+            room.hands_sent[name] = hand
+            emit_sid(room, "my_cards", {"cards": hand}, sid)
+
+# ====== 排程（逾時回呼在房間的執行環境內執行）======
+def run_in_room(room, fn, args):
+    # 在排程執行緒上被呼叫：只入列並叫醒房間的執行者，不在這條所有房間共用的執行緒上跑指令。
+    # 逾時回呼不受佇列上限限制，不能被丟棄
+    with room.queue_lock:
+        room.commands.append((fn, args))
+        if room.draining:
+            return
+        room.draining = True
+    start_drain(room)
+
+def drain_in_background(room):
+    # 執行緒模式：另起背景工作擔任這個房間的執行者
+    socketio.start_background_task(drain, room)
+
+start_drain = drain_in_background
+
+def schedule(room, delay_sec, fn, *args):
+    return scheduler.call_later(delay_sec, run_in_room, room, fn, args)
+
+def schedule_command(room, deadline, name, data):
+    return schedule(room, deadline - time.time(), run_command, name, data)
+
+def cancel_timer(handle):
+    if handle:
+        handle.cancel()
+
+def sync_timers(room):
+    # 依狀態中的截止時間補排或取消計時器；成本只和等待中的提示數有關
+    game_state = room.state
+    prompts = game_state["pending_prompts"]
+    for pid in [pid for pid in room.prompt_timers if pid not in prompts]:
+        cancel_timer(room.prompt_timers.pop(pid))
+    for pid, info in prompts.items():
+        if pid not in room.prompt_timers:
+            room.prompt_timers[pid] = schedule_command(room, info["deadline"], "prompt_timeout", {"prompt_id": pid})
+
+    choices = game_state["force_choices"]
+    for name in [n for n in room.force_choice_timers if n not in choices]:
+        cancel_timer(room.force_choice_timers.pop(name))
+    for name, deadline in choices.items():
+        if name not in room.force_choice_timers:
+            room.force_choice_timers[name] = schedule_command(room, deadline, "force_choice_timeout", {"player": name})
+
+    # 回合時限以 turn_marker 區分，遊戲總時限以 start_ts 區分
+    started = game_state["game_started"]
+    turn_key = game_state["turn_marker"] if started and game_state["turn_deadline"] else None
+    if turn_key != room.turn_timer_key:
+        cancel_timer(room.turn_timer)
+        room.turn_timer = None
+        if turn_key:
+            room.turn_timer = schedule_command(room, game_state["turn_deadline"], "turn_timeout", {"turn_marker": turn_key})
+        room.turn_timer_key = turn_key
+    game_key = game_state["start_ts"] if started and game_state["deadline_ts"] else None
+    if game_key != room.game_timer_key:
+        cancel_timer(room.game_timer)
+        room.game_timer = None
+        if game_key:
+            room.game_timer = schedule_command(room, game_state["deadline_ts"], "game_deadline", {"start_ts": game_key})
+        room.game_timer_key = game_key
+
+def flush_state(room):
+    # 事件處理結束時呼叫；距上次廣播未滿最小間隔時，排一次延後的廣播（期間的變更一併送出）
+    if not room.state_dirty:
+        return
+    wait = room.last_broadcast + BROADCAST_MIN_INTERVAL_SEC - time.monotonic()
+    if wait > 0:
+        if not room.flush_timer:
+            room.flush_timer = schedule(room, wait, flush_state_later)
+        return
+    broadcast_state(room)
+
+def flush_state_later(room):
+    room.flush_timer = None
+    flush_state(room)
+
+def finish_all_timers(room):
+    for t in room.prompt_timers.values():
+        cancel_timer(t)
+    room.prompt_timers.clear()
+    for t in room.force_choice_timers.values():
+        cancel_timer(t)
+    room.force_choice_timers.clear()
+    cancel_timer(room.turn_timer)
+    cancel_timer(room.game_timer)
+    cancel_timer(room.flush_timer)
+    room.turn_timer = room.game_timer = room.flush_timer = None
+    room.turn_timer_key = room.game_timer_key = None
+
+# ====== 狀態廣播 ======
+def state_snapshot(room):
+    # 不含日誌；日誌以 log_seq 另行增量傳送
+    game_state = room.state
+    return {
         "room_id": game_state["room_id"],
         "players": sanitize_players_for_emit(game_state["players"]),
         "player_order": list(game_state["player_order"]),
         "current_turn": game_state["current_turn"],
         "draw_pile_count": len(game_state["draw_pile"]),
         "discard_pile_count": len(game_state["discard_pile"]),
-        "logs": list(game_state["logs"]),
         "game_started": game_state["game_started"],
         "max_players": game_state["max_players"],
         "turn_index": game_state["turn_index"],
         "max_rounds": game_state["max_rounds"],
-        "round_number": round_number(),
-        "time_remaining_ms": game_time_remaining_ms(),
+        "round_number": round_number(room),
+        "time_remaining_ms": game_time_remaining_ms(room),
         "turn_marker": game_state["turn_marker"],
     }
-    socketio.emit("game_state", state, room=game_state["room_id"])
 
-def finish_all_timers():
-    for pid, p in list(pending_prompts.items()):
-        t = p.get("timer")
-        if t:
-            try:
-                t.cancel()
-            except Exception:
-                pass
-        pending_prompts.pop(pid, None)
-    for name, t in list(force_choice_timers.items()):
-        try:
-            t.cancel()
-        except Exception:
-            pass
-        force_choice_timers.pop(name, None)
-    game_state["pending_prompt_id"] = None
-
-def end_game(reason=""):
-    # 排名：分數降序；同分 → 成功拆穿 > 成功虛張 > 剩餘手牌多
-    results = []
-    for name, p in game_state["players"].items():
-        results.append({
-            "player": name,
-            "score": p.get("score", 0),
-            "call_bluff_success": p.get("stats", {}).get("call_bluff_success", 0),
-            "bluff_success": p.get("stats", {}).get("bluff_success", 0),
-            "hand_count": len(p.get("roles", [])),
-        })
-    results.sort(key=lambda r: (-r["score"], -r["call_bluff_success"], -r["bluff_success"], -r["hand_count"]))
-
-    game_state["game_started"] = False
-    add_log(f"【遊戲結束】{reason or '條件達成'}")
-    broadcast_state()
-    socketio.emit("game_over", {
-        "reason": reason or "條件達成",
-        "results": results,
-    }, room=game_state["room_id"])
-
-def check_end_conditions(trigger=""):
-    # 提前結束：有人 <= 0
-    for name, p in game_state["players"].items():
-        if p.get("score", 0) <= 0:
-            end_game(f"{name} 分數歸零")
-            return True
-    # 輪數上限
-    if round_number() > game_state["max_rounds"]:
-        end_game("超過最大輪數")
-        return True
-    # 時限
-    if game_state["deadline_ts"] and now_ts() >= game_state["deadline_ts"]:
-        end_game("超過 30 分鐘時限")
-        return True
-    return False
-
-def advance_turn(advance_from=None):
-    # 計入當前玩家已出手次數
-    if advance_from and advance_from in game_state["players"]:
-        st = game_state["players"][advance_from].setdefault("stats", {})
-        st["turns_taken"] = st.get("turns_taken", 0) + 1
-
-    nxt = next_player_name(game_state["current_turn"])
-    game_state["current_turn"] = nxt
-    game_state["turn_index"] += 1
-    game_state["turn_marker"] = str(uuid.uuid4())
-    broadcast_state()
-    check_end_conditions("advance_turn")
-
-# ====== 牌效與行為（精簡版，保留你已有的效果邏輯再置換也可）======
-def apply_guardian_counter(attacker_name, target_name, role_used):
-    # 擋下攻擊，反擊；若擋祖濕爺，反擊 -2，其他 -1
-    atk = game_state["players"].get(attacker_name)
-    tgt = game_state["players"].get(target_name)
-    if not atk or not tgt:
+def full_state(room, flush=True):
+    # Socket 的 game_state 與 HTTP /state 共用的完整狀態（呼叫端持有房間鎖）。
+    # 在房間的執行者上（flush=True）先送出尚未廣播的變更，讓快照、日誌與版本號一致；
+    # HTTP 讀取不能送出事件（asgi 的傳輸只能在事件迴圈上使用），沿用最近一次廣播的快照，內容與 version 相符
+    if flush and (room.state_dirty or room.last_snapshot is None):
+        broadcast_state(room)
+    state = dict(room.last_snapshot or state_snapshot(room))
+    state["time_remaining_ms"] = game_time_remaining_ms(room)
+    state["logs"] = list(room.state["logs"])
+    state["log_seq"] = room.state["logs"].seq
+    state["version"] = room.version
+    state["event_seq"] = room.event_seq
+    return state
+
+def commit_snapshot(room, snap):
+    room.version += 1
+    room.last_snapshot = snap
+    room.last_log_seq = room.state["logs"].seq
+    room.last_log_reset_seq = room.state["logs"].reset_seq
+    room.state_changed.notify_all()
+    room.notify_watchers()
+
+@metrics.timed(BROADCAST_SECONDS)
+def broadcast_state(room):
+    # 只送出與上一版的差異；客戶端版本不連續時會以 request_full_state 重新同步
+    room.state_dirty = False
+    room.last_broadcast = time.monotonic()
+    cancel_timer(room.flush_timer)
+    room.flush_timer = None
+    game_state = room.state
+    snap = state_snapshot(room)
+    prev = room.last_snapshot
+    if prev is None:
+        commit_snapshot(room, snap)
+        state = full_state(room)
+        observe_payload(state)
+        emit_room(room, "game_state", state)
         return
-    dmg = 2 if role_used == " 狙擊手" else 1
-    atk["score"] -= dmg
-    tgt["guardian_active"] = False
-    add_log(f"{target_name} 的『{ROLE_DISPLAY_NAMES[' 守護者']}』觸發，{attacker_name} 受到 -{dmg}")
-
-def resolve_effect(attacker, role, target, extra=None, consume_if_has=True):
-    # 管理員：不消耗手牌
-    if consume_if_has and not game_state["players"][attacker].get("is_admin"):
-        roles = game_state["players"][attacker]["roles"]
-        try:
-            roles.remove(role)
-            game_state["discard_pile"].append(role)
-        except ValueError:
-            pass
-
-    A = game_state["players"].get(attacker)
-    T = game_state["players"].get(target) if target else None
-    if not A:
+
+    patch = diff_snapshot(prev, snap)
+    log = game_state["logs"]
+    if log.seq != room.last_log_seq or log.reset_seq != room.last_log_reset_seq:
+        # 清空過，或新增的筆數超過緩衝區（上次送出後的日誌有缺口）：改送完整日誌
+        logs_new = log.since(room.last_log_seq) if log.reset_seq == room.last_log_reset_seq else None
+        if logs_new is None:
+            patch["logs_reset"] = True
+            logs_new = list(log)
+        patch["logs_new"] = logs_new
+    if not patch:
         return
+    base = room.version
+    commit_snapshot(room, snap)
+    patch["base"] = base
+    patch["v"] = room.version
+    if room.spectators:
+        room.spectator_feed.append((time.monotonic(), snap, patch.get("logs_new"), bool(patch.get("logs_reset"))))
+    patch["time_remaining_ms"] = snap["time_remaining_ms"]
+    if "logs_new" in patch:
+        patch["log_seq"] = log.seq
+    observe_payload(patch)
+    emit_room(room, "game_state_patch", patch)
+
+def observe_payload(payload):
+    # 量大小要多做一次 JSON 序列化（送出時的序列化在 Socket.IO 裡，拿不到結果），
+    # 每次都量會讓廣播慢約兩成五：只抽樣，分佈仍有代表性
+    if metrics.ENABLED and next(broadcast_counter) % BROADCAST_BYTES_SAMPLE == 0:
+        BROADCAST_BYTES.observe(len(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")))
+
+def send_full_state(room, sid):
+    emit_sid(room, "game_state", full_state(room), sid)
+
+# ====== 觀戰：公開狀態、合併、延遲 ======
+# 觀戰者在獨立的 Socket.IO 房間（<room_id>#s），收不到玩家的事件、手牌與拆穿提示。
+# 每次狀態廣播只把（時間, 快照, 新日誌）放進房間的 spectator_feed（快照本身之後不再被改動，可共用）；
+# 另一條排程以 SPECTATOR_HZ 的頻率取出已超過延遲的項目，合併成一份後送出。
+# 觀戰人數再多，序列化與扇出都在這條排程上，不佔用房間的執行者。
+def spectator_room(room_id, enc):
+    return wire.socket_room(room_id + SPECTATOR_ROOM_SUFFIX, enc)
+
+def client_socket_room(sid, room_id):
+    enc = client_encodings.get(sid, wire.JSON)
+    if client_roles.get(sid) == SPECTATOR:
+        return spectator_room(room_id, enc)
+    return wire.socket_room(room_id, enc)
+
+def add_spectator(room, sid, enc):
+    # 在房間的執行者上：第一位觀戰者加入時以目前狀態作為起點
+    if not room.spectators and room.spectator_view is None:
+        full_state(room)
+        room.spectator_feed.append((time.monotonic(), room.last_snapshot, list(room.state["logs"]), True))
+    room.spectators[sid] = enc
+    room.spectator_joins.append(sid)
+    with room.queue_lock:
+        if room.spectator_timer is None:
+            room.spectator_timer = spectator_scheduler.call_later(0, spectator_tick, room)
+
+def spectator_payload(room, logs_new, logs_reset):
+    view = dict(room.spectator_view)
+    view["logs_new"] = logs_new
+    view["logs_reset"] = logs_reset
+    view["log_seq"] = room.spectator_log.seq
+    view["delay_ms"] = int(SPECTATOR_DELAY_SEC * 1000)
+    return view
+
+def spectator_tick(room):
+    feed = room.spectator_feed
+    cutoff = time.monotonic() - SPECTATOR_DELAY_SEC
+    log = room.spectator_log
+    before, reset = log.seq, False
+    changed = False
+    while feed and feed[0][0] <= cutoff:
+        _, snap, logs_new, logs_reset = feed.popleft()
+        if logs_reset:
+            log.clear()
+            reset = True
+        for line in logs_new or ():
+            log.append(line)
+        room.spectator_view = snap
+        changed = True
+    if changed:
+        logs_new = None if reset else log.since(before)
+        if logs_new is None:
+            reset, logs_new = True, list(log)
+        payload = spectator_payload(room, logs_new, reset)
+        encodings = set(room.spectators.values())
+        for enc in encodings:
+            transport.emit("spectator_state", wire.encode(payload) if enc == wire.COMPACT else payload,
+                           spectator_room(room.room_id, enc))
+    while room.spectator_joins:
+        sid = room.spectator_joins.popleft()
+        enc = room.spectators.get(sid)
+        if enc is not None and room.spectator_view is not None:
+            payload = spectator_payload(room, list(log), True)
+            transport.emit("spectator_state", wire.encode(payload) if enc == wire.COMPACT else payload, sid)
+    with room.queue_lock:
+        if rooms.get(room.room_id) is not room or not (room.spectators or room.spectator_joins):
+            room.spectator_timer = None
+            room.spectator_feed.clear()
+            room.spectator_view = None
+            return
+        room.spectator_timer = spectator_scheduler.call_later(1.0 / SPECTATOR_HZ, spectator_tick, room)
+
+# ====== 重連續玩：憑證 + 補送漏掉的房間事件 ======
+# 加入遊戲時發給玩家一個憑證（session 事件）。重連時在連線參數帶 resume=憑證&seq=最後收到的事件序號：
+# 伺服器把座位綁回新連線，只對這條連線補送 seq 之後的房間事件；超出緩衝區才改送完整狀態。
+def issue_session(room, name, sid):
+    for token in [t for t, n in room.sessions.items() if n == name or n not in room.state["players"]]:
+        del room.sessions[token]
+    token = secrets.token_urlsafe(16)
+    room.sessions[token] = name
+    emit_sid(room, "session", {"token": token, "player": name}, sid)
+
+def resume_session(room, sid, token, seq):
+    name = room.sessions.get(token)
+    if name not in room.state["players"]:
+        RESUMES.inc("invalid")
+        emit_sid(room, "session", {"token": None}, sid)
+        send_full_state(room, sid)
+        return
+    bind_player(room, name, sid)
+    emit_sid(room, "session", {"token": token, "player": name}, sid)
+    missed = room.event_seq - seq if seq is not None else -1
+    if 0 <= missed <= len(room.event_buffer):
+        RESUMES.inc("replay")
+        REPLAYED_EVENTS.inc(amount=missed)
+        compact = sid in room.compact_sids
+        for n, event, payload in islice(room.event_buffer, len(room.event_buffer) - missed, None):
+            transport.emit(event, (wire.encode(payload) if compact else payload, n), sid)
+    else:
+        RESUMES.inc("full")
+        send_full_state(room, sid)
+    push_hands(room)
+
+# ====== 電腦玩家：行程池搜尋 + 硬性截止 ======
+# 搜尋（bots.decide）只拿到該玩家看得到的觀察，在另一個行程執行，不佔用房間執行者與事件迴圈。
+# 結果經排程器交回房間佇列套用；同一個決策鍵只會套用一次：先到的一方（搜尋結果或硬性截止）
+# 把 bot_thinking 的項目取走，另一方就什麼都不做。電腦的走法和玩家一樣經 run_command 寫入日誌。
+def get_bot_pool():
+    # forkserver：工作行程從一個只匯入 bots 的乾淨行程分出，不會像 fork 一樣複製到
+    # 伺服器其他執行緒當下持有的鎖。沒有 forkserver 的平台改用 spawn。
+    # 子行程會重跑啟動腳本（__mp_main__）：伺服器由 server.py 啟動，重跑時什麼都不做
+    global bot_pool
+    with bot_pool_lock:
+        if bot_pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            ctx = multiprocessing.get_context(method)
+            if method == "forkserver":
+                ctx.set_forkserver_preload(["bots"])
+            bot_pool = ProcessPoolExecutor(max_workers=BOT_WORKERS, mp_context=ctx)
+        return bot_pool
+
+def set_bot(room, name, kind):
+    if kind:
+        room.bots[name] = kind
+    else:
+        room.bots.pop(name, None)
+    if journal:
+        room.journal_seq = journal.append(room.room_id, "_set_bot", {"player": name, "kind": kind}, time.time())
 
-    # 守護者：啟動（隱形啟動，不寫入公開日誌）
-    if role == " 守護者":
-        A["guardian_active"] = True
+def drive_bots(room):
+    # 每個指令之後呼叫：輪到電腦的決策若還沒開始思考，就送進行程池
+    if not room.bots:
         return
+    for actor, kind, key in bots.pending_decisions(room.state):
+        if actor in room.bots and key not in room.bot_thinking:
+            start_thinking(room, actor, kind, key)
+
+def start_thinking(room, actor, kind, key):
+    budget = BOT_THINK_SEC if kind == bots.TURN else BOT_REPLY_THINK_SEC
+    obs = bots.observe(room.state, actor, time.time())
+    # 種子不取自 room.rng：電腦的思考不能改變房間的亂數序列，日誌重播才會一致
+    future = None
+    try:
+        future = get_bot_pool().submit(bots.decide, obs, kind, budget, random.getrandbits(32))
+    except Exception:
+        logger.exception("bot search could not start in room %s", room.room_id)
+    deadline = schedule(room, budget + BOT_GRACE_SEC, bot_deadline, key)
+    room.bot_thinking[key] = (actor, future, deadline, time.monotonic())
+    if future is not None:
+        future.add_done_callback(functools.partial(bot_search_done, room, key))
+
+def bot_search_done(room, key, future):
+    # 在行程池的管理執行緒上被呼叫：交回排程器，再進房間佇列
+    scheduler.call_soon_threadsafe(run_in_room, room, apply_bot_search, (key, future))
+
+def apply_bot_search(room, key, future):
+    thinking = room.bot_thinking.pop(key, None)
+    if thinking is None:
+        return      # 已由硬性截止處理
+    actor, _, deadline, started = thinking
+    cancel_timer(deadline)
+    BOT_THINK_SECONDS.observe(time.monotonic() - started)
+    try:
+        name, data, _ = future.result()
+    except Exception:
+        logger.exception("bot search failed in room %s", room.room_id)
+        name, data = bots.fallback(room.state, actor, key[0], random.Random())
+        play_bot_move(room, actor, key, name, data, "error")
+        return
+    play_bot_move(room, actor, key, name, data, "search")
 
-    # 需要目標的卡，先判斷守護者是否擋下（流程：先處理拆穿 → 若行動生效才判定守護者）
-    if T and T.get("guardian_active"):
-        apply_guardian_counter(attacker, target, role)
+def bot_deadline(room, key):
+    thinking = room.bot_thinking.pop(key, None)
+    if thinking is None:
+        return
+    actor, future, _, _ = thinking
+    if future is not None:
+        future.cancel()     # 還在排隊就不必算了
+    if bots.still_pending(room.state, key):
+        name, data = bots.fallback(room.state, actor, key[0], random.Random())
+        play_bot_move(room, actor, key, name, data, "timeout")
+
+def play_bot_move(room, actor, key, name, data, result):
+    # 思考期間決策可能已逾時、遊戲重開，或玩家已回來接手
+    if actor not in room.bots or not bots.still_pending(room.state, key):
         return
+    BOT_DECISIONS.inc(result)
+    run_command(room, name, data)
 
-    # 斬魂米娜：標記
-    if role == " 壽星" and T:
-        A["mark_target"] = target
-        A["mark_used_turn"] = round_number()
-        add_log(f"{attacker} 使用『{ROLE_DISPLAY_NAMES[' 壽星']}』標記了 {target}")
-
-    # 偵探：強制選擇（公開/棄1或-1）
-    elif role == "️ 偵探" and T:
-        add_log(f"{attacker} 對 {target} 使用『{ROLE_DISPLAY_NAMES['️ 偵探']}』")
-        # 強制選擇的 UI 已在前端，用事件通知目標
-        socketio.emit("force_choice", {"timeout_ms": 5000, "target": target}, room=game_state["room_id"])
-
-    # 小丑：-2，自身 -1；若被標記者為目標，總傷害不超過 -3（此處保守處理）
-    elif role == " 小丑" and T:
-        dmg = 2
-        if A.get("mark_target") == target and A.get("mark_used_turn") == round_number():
-            dmg = min(3, dmg + 1)  # 額外 -1，但上限 -3
-        T["score"] -= dmg
-        A["score"] -= 1
-        add_log(f"{attacker} 使用『{ROLE_DISPLAY_NAMES[' 小丑']}』→ {target} -{dmg}，{attacker} -1")
-
-    # 贈禮者：A 自+1目標-1；B 兩個不同目標各-1
-    elif role == " 贈禮者" and T:
-        mode = (extra or {}).get("mode", "A")
-        if mode == "B":
-            second_target = (extra or {}).get("second_target")
-            if second_target and second_target != target and second_target in game_state["players"]:
-                game_state["players"][target]["score"] -= 1
-                game_state["players"][second_target]["score"] -= 1
-                add_log(f"{attacker} 使用『{ROLE_DISPLAY_NAMES[' 贈禮者']}』(B) → {target} -1、{second_target} -1")
-            else:
-                # 無效參數時，降級為 A
-                game_state["players"][attacker]["score"] += 1
-                game_state["players"][target]["score"] -= 1
-                add_log(f"{attacker} 使用『{ROLE_DISPLAY_NAMES[' 贈禮者']}』(A) → {attacker} +1、{target} -1")
-        else:
-            game_state["players"][attacker]["score"] += 1
-            game_state["players"][target]["score"] -= 1
-            add_log(f"{attacker} 使用『{ROLE_DISPLAY_NAMES[' 贈禮者']}』(A) → {attacker} +1、{target} -1")
-
-    # 祖濕爺：目標 -3，自損 -1；若目標分數>80 則改為 -2
-    elif role == " 狙擊手" and T:
-        dmg = 3
-        if T["score"] > 80:
-            dmg = 2
-        T["score"] -= dmg
-        A["score"] -= 1
-        add_log(f"{attacker} 使用『{ROLE_DISPLAY_NAMES[' 狙擊手']}』→ {target} -{dmg}，{attacker} -1")
-
-# ====== Bluff（虛張）處理 ======
-def create_challenge_prompt(attacker, role, target, extra=None, had_card=None):
-    # had_card = None → 由手牌判斷；管理員必定 True
-    if had_card is None:
-        if game_state["players"].get(attacker, {}).get("is_admin"):
-            had_card = True
-        else:
-            had_card = role in game_state["players"].get(attacker, {}).get("roles", [])
-
-    prompt_id = str(uuid.uuid4())
-    timer = threading.Timer(BLUFF_TIMEOUT_MS / 1000.0, on_prompt_timeout, args=(prompt_id, attacker))
-    pending_prompts[prompt_id] = {
-        "player": attacker,
-        "target": target,
-        "role": role,
-        "extra": extra,
-        "had_card": had_card,
-        "timer": timer,
-    }
-    game_state["pending_prompt_id"] = prompt_id
-    timer.start()
-
-    socketio.emit("bluff_challenge", {
-        "prompt_id": prompt_id,
-        "player": attacker,
-        "target": target,
-        "role": role,
-        "timeout_ms": BLUFF_TIMEOUT_MS
-    }, room=game_state["room_id"])
-
-def on_prompt_timeout(prompt_id, attacker):
-    # 超時視為不揭穿
-    on_not_call_internal(prompt_id, silent=True, advance_from_player=attacker)
-
-def finish_prompt(prompt_id, advance_from_player=None):
-    info = pending_prompts.pop(prompt_id, None)
-    if info and info.get("timer"):
-        try:
-            info["timer"].cancel()
-        except Exception:
-            pass
-    game_state["pending_prompt_id"] = None
-    broadcast_state()
-    if advance_from_player:
-        advance_turn(advance_from_player)
-
-def on_not_call_internal(prompt_id, silent=False, advance_from_player=None):
-    info = pending_prompts.get(prompt_id)
-    if not info:
+def release_seats(room_id, sid):
+    # 玩家的連線離開：遊戲進行中就排一個代打計時器，時間到仍未重連便交給電腦
+    room = rooms.get(room_id)
+    if not room or not BOT_TAKEOVER_SEC or not room.state["game_started"]:
         return
-    attacker = info["player"]
-    role = info["role"]
-    target = info["target"]
-    extra = info.get("extra")
-    had_card = info["had_card"]
-
-    # 不揭穿：若有牌 → 效果生效；若無牌 → 虛張成功，依規則 -2/-?（你先前定義過 -2）
-    if had_card:
-        resolve_effect(attacker, role, target, extra, consume_if_has=not game_state["players"][attacker].get("is_admin"))
-        msg = f"{attacker} 的行動生效：{ROLE_DISPLAY_NAMES.get(role, role)}"
-        succ = True
+    for name in [n for n, s in room.player_sids.items() if s == sid]:
+        schedule(room, BOT_TAKEOVER_SEC, takeover_seat, name)
+
+def takeover_seat(room, name):
+    state = room.state
+    if name in room.bots or name in room.player_sids or name not in state["players"] or not state["game_started"]:
+        return
+    set_bot(room, name, TAKEOVER)
+    emit_room(room, "bot_takeover", {"player": name})
+    drive_bots(room)
+
+# ====== 房間管理 ======
+def enter_room(sid, room_id, mode, resume=None):
+    # mode："connect" 不存在就建立；"create" 必須是新房間；"enter" 必須已存在
+    # resume：重連時的 (憑證, 最後收到的事件序號)
+    msg = {"op": "enter", "room": room_id, "sid": sid, "mode": mode, "origin": backend.worker_id,
+           "enc": client_encodings.get(sid, wire.JSON), "role": client_roles.get(sid), "resume": resume}
+    if backend.is_local(room_id):
+        owner_enter(msg)
     else:
-        # 虛張成功：目標受影響（此遊戲規則：不揭穿則視同真的；此處僅記錄成功次數）
-        st = game_state["players"][attacker].setdefault("stats", {})
-        st["bluff_success"] = st.get("bluff_success", 0) + 1
-        resolve_effect(attacker, role, target, extra, consume_if_has=False)
-        msg = f"{attacker} 的虛張成功，行動生效：{ROLE_DISPLAY_NAMES.get(role, role)}"
-        succ = True
+        backend.send(backend.owner(room_id), msg)
 
-    socketio.emit("bluff_result", {"success": succ, "message": msg}, room=game_state["room_id"])
-    finish_prompt(prompt_id, advance_from_player=attacker)
+def owner_enter(msg):
+    # 在持有房間的 worker 上執行：確認房間、記錄成員、送出完整狀態
+    room_id, sid, mode = msg["room"], msg["sid"], msg["mode"]
+    if mode == "create":
+        try:
+            room = rooms.create(room_id)
+        except KeyError:
+            transport.emit("error", {"message": "房間已存在"}, sid); return
+    elif mode == "enter":
+        room = rooms.get(room_id)
+        if not room:
+            transport.emit("error", {"message": "房間不存在"}, sid); return
+    else:
+        room = rooms.get_or_create(room_id)
+    if msg["origin"] == backend.worker_id:
+        attach_sid(sid, room_id)
+    else:
+        backend.send(msg["origin"], {"op": "attach", "room": room_id, "sid": sid})
+    rooms.bind_sid(sid, room_id)
+    if msg.get("role") == SPECTATOR:
+        submit(room, add_spectator, (sid, msg["enc"]), bounded=False)
+        return
+    if msg["enc"] == wire.COMPACT:
+        room.compact_sids.add(sid)
+    if mode == "create":
+        emit_sid(room, "room_created", {"room_id": room_id}, sid)
+    if msg.get("resume"):
+        submit(room, resume_session, msg["resume"], bounded=False)
+        return
+    submit(room, send_full_state, (sid,), bounded=False)
+
+def attach_sid(sid, room_id):
+    # 在連線所在的 worker 上切換 Socket.IO 房間；舊房間在別的 worker 時通知它移除成員
+    if not transport.is_connected(sid):
+        return
+    old_id = rooms.room_id_for_sid(sid)
+    if old_id and old_id != room_id:
+        transport.leave_room(sid, client_socket_room(sid, old_id))
+        if not backend.is_local(old_id):
+            backend.send(backend.owner(old_id), {"op": "leave", "room": old_id, "sid": sid})
+    transport.enter_room(sid, client_socket_room(sid, room_id))
+    rooms.bind_sid(sid, room_id)
+
+def list_all_rooms():
+    result = rooms.list()
+    for worker_id in range(backend.workers):
+        if worker_id != backend.worker_id:
+            result.extend(backend.request(worker_id, {"op": "list_rooms"}) or [])
+    return result
+
+def on_worker_message(msg):
+    # 其他 worker 經匯流排送來的訊息（單一行程模式不會用到）
+    op = msg["op"]
+    if op == "event":
+        call_room(msg["room"], msg["handler"], msg["data"], msg["sid"])
+    elif op == "enter":
+        owner_enter(msg)
+    elif op == "attach":
+        attach_sid(msg["sid"], msg["room"])
+    elif op == "leave":
+        release_seats(msg["room"], msg["sid"])
+        rooms.unbind_sid(msg["sid"], msg["room"])
+    elif op == "state":
+        return state_body(msg["room"], msg["since"])
+    elif op == "tag":
+        room = http_room(msg["room"])
+        return room.state_tag() if room else None
+    elif op == "list_rooms":
+        return rooms.list()
+
+backend.start(on_worker_message)
+
+def evict_idle_rooms():
+    evicted = []
+    for room in rooms.idle_rooms():
+        with room.lock:
+            finish_all_timers(room)
+            rooms.close(room.room_id)
+        evicted.append(room.room_id)
+    return evicted
+
+def room_reaper():
+    try:
+        evict_idle_rooms()
+    finally:
+        scheduler.call_later(ROOM_REAP_INTERVAL_SEC, room_reaper)
+
+# ====== 持久化：指令日誌 + 定期快照 ======
+def journal_room_created(room):
+    if journal:
+        room.journal_seq = journal.append(room.room_id, "_create_room", {"seed": room.seed}, time.time())
+
+def journal_room_closed(room):
+    if journal:
+        journal.append(room.room_id, "_close_room", None, time.time())
+
+def room_closed(room):
+    journal_room_closed(room)
+    if history and room.state["start_ts"]:
+        history.record_abandon(room.room_id, room.state["start_ts"])
+
+rooms.on_create = journal_room_created
+rooms.on_close = room_closed
+
+def dump_room(room):
+    version, internal, gauss = room.rng.getstate()
+    return {
+        "seed": room.seed,
+        "rng": [version, list(internal), gauss],
+        "journal_seq": room.journal_seq,
+        "version": room.version,
+        "state": engine.dump_state(room.state),
+        "sessions": room.sessions,
+        "bots": room.bots,
+    }
+
+def load_room(room_id, d):
+    room = Room(room_id, engine.load_state(d["state"]), d["seed"])
+    version, internal, gauss = d["rng"]
+    room.rng.setstate((version, tuple(internal), gauss))
+    room.journal_seq = d["journal_seq"]
+    room.version = d["version"]
+    room.sessions = dict(d.get("sessions", {}))
+    room.bots = dict(d.get("bots", {}))
+    return room
+
+def snapshot_rooms(j):
+    cut = j.rotate()
+    out = {}
+    for room in rooms.all():
+        with room.lock:
+            # 在鎖內序列化成字串，避免之後狀態繼續變動
+            out[room.room_id] = json.dumps(dump_room(room), ensure_ascii=False)
+    body = {"journal_seq": cut, "ts": time.time(),
+            "rooms": {rid: json.loads(text) for rid, text in out.items()}}
+    j.write_snapshot(body)
+    return cut
+
+def restore_rooms(j):
+    # 載入最新快照，再重播之後的日誌；重播只改狀態，不發送事件
+    snap = j.load_snapshot()
+    after = 0
+    if snap:
+        after = snap["journal_seq"]
+        for room_id, d in snap["rooms"].items():
+            rooms.add(load_room(room_id, d))
+    replayed = 0
+    for rec in j.read(after):
+        room = rooms.get(rec["r"])
+        if room and rec["s"] <= room.journal_seq:
+            continue
+        if rec["c"] == "_create_room":
+            room = rooms.add(Room(rec["r"], engine.new_game_state(rec["r"]), rec["d"]["seed"]))
+        elif rec["c"] == "_close_room":
+            rooms.close(rec["r"])
+            continue
+        elif rec["c"] == "_set_bot":
+            if not room:
+                continue
+            if rec["d"]["kind"]:
+                room.bots[rec["d"]["player"]] = rec["d"]["kind"]
+            else:
+                room.bots.pop(rec["d"]["player"], None)
+        elif room:
+            engine.COMMANDS[rec["c"]](room.state, rec["d"], rec["t"], room.rng)
+        else:
+            continue
+        room.journal_seq = rec["s"]
+        replayed += 1
+    # 依狀態中的截止時間恢復拆穿提示、強制選擇與遊戲時限的計時器，並讓電腦玩家繼續思考
+    for room in rooms.all():
+        with room.lock:
+            sync_timers(room)
+            drive_bots(room)
+    return replayed
+
+def snapshot_job(last_cut=0):
+    # 有新指令才做快照；序列化在另一條執行緒進行，不佔用排程執行緒
+    j = journal
+    if j and j.seq != last_cut:
+        cut = j.seq
+        threading.Thread(target=snapshot_rooms, args=(j,), name="snapshot", daemon=True).start()
+        last_cut = cut
+    scheduler.call_later(SNAPSHOT_INTERVAL_SEC, snapshot_job, last_cut)
+
+def enable_persistence(path=JOURNAL_DIR):
+    global journal
+    j = Journal(path)
+    restore_rooms(j)
+    journal = j
+    scheduler.call_later(SNAPSHOT_INTERVAL_SEC, snapshot_job, j.seq)
+    return j
+
+def enable_history(path=HISTORY_DIR):
+    # 結束的對局與每次出牌結算寫入欄式歷史庫；查詢：python history.py data/history
+    global history
+    history = HistoryStore(path)
+    return history
 
 # ====== Flask 與 Socket 事件 ======
+def accepted_encoding(available):
+    # available：[(Content-Encoding, 副檔名)]，依偏好排列；回傳客戶端接受的第一個
+    for encoding, suffix in available:
+        if request.accept_encodings[encoding]:
+            return encoding, suffix
+    return None, ""
+
+def render_index():
+    # 首頁內容只取決於資產清單與線路編碼，產生一次後連同壓縮版本一起快取
+    images = asset_manifest["images"]
+    page_config = {
+        "cardImages": {role: images[fn] for role, fn in CARD_IMAGES.items() if fn in images},
+        "wireTable": wire.client_table() if wire.available() else None,
+    }
+    html = render_template("index.html", page_config=page_config,
+                           asset_url=functools.partial(assets.asset_url, asset_manifest)).encode("utf-8")
+    page = {"tag": assets.digest(html, 16), None: html}
+    for encoding, _ in assets.supported_encodings():
+        page[encoding] = assets.compress(html, encoding)
+    return page
+
 @app.route("/")
 def index():
-    return render_template("index.html")
+    page = index_cache.get("page") if INDEX_CACHE else None
+    if page is None:
+        page = index_cache["page"] = render_index()
+    encoding, _ = accepted_encoding(assets.supported_encodings())
+    resp = Response(page[encoding], mimetype="text/html")
+    # 不用 immutable：部署後資產網址會變；每次重新驗證，沒變就是 304
+    resp.set_etag(page["tag"] + ("-" + encoding if encoding else ""))
+    resp.cache_control.no_cache = True
+    resp.vary.add("Accept-Encoding")
+    if encoding:
+        resp.content_encoding = encoding
+    return resp.make_conditional(request)
+
+@app.route("/assets/<path:filename>")
+def hashed_asset(filename):
+    # 檔名含內容雜湊，內容永不變動 → 長效 immutable 快取（附 ETag 供條件請求）
+    # CSS / JS 有預先壓縮的 .br / .gz 時，依 Accept-Encoding 直接送出壓縮檔
+    encoding, suffix = accepted_encoding(asset_encodings.get(filename, ()))
+    resp = send_from_directory(assets.BUILD_DIR, filename + suffix, max_age=ASSET_MAX_AGE_SEC,
+                               mimetype=mimetypes.guess_type(filename)[0])
+    if encoding:
+        resp.content_encoding = encoding
+    if filename in asset_encodings:
+        resp.vary.add("Accept-Encoding")
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
+
+def http_room(room_id):
+    # HTTP 讀取用（在持有房間的 worker 上）：預設房間和連線進來時一樣隨時建立，
+    # 還沒有人連線或閒置回收後也回傳空的大廳；其他房間不存在就是 None
+    if room_id == DEFAULT_ROOM_ID:
+        return rooms.get_or_create(room_id)
+    return rooms.get(room_id)
+
+def state_body(room_id, since):
+    room = http_room(room_id)
+    if not room:
+        return None
+    # 在房間鎖內組好，不會讀到執行到一半的指令；內容與 Socket 的完整狀態相同，另加日誌增量與版本標記
+    with room.lock:
+        state = full_state(room, flush=False)
+        log = room.state["logs"]
+        # since=N：只回傳序號 N 之後的日誌；N 早於最近一次清空、或之後的日誌已被擠出緩衝區時
+        # 回傳全部並標記 logs_reset
+        logs = None if since is None or since < log.reset_seq else log.since(since)
+        if logs is not None:
+            state["logs"] = logs
+        state["logs_reset"] = logs is None
+        state["tag"] = room.state_tag()
+        return state
+
+def fetch_state(room_id, since):
+    if backend.is_local(room_id):
+        return state_body(room_id, since)
+    return backend.request(backend.owner(room_id), {"op": "state", "room": room_id, "since": since})
+
+def state_tag(room_id):
+    # 只取版本標記，不組狀態內容
+    if backend.is_local(room_id):
+        room = http_room(room_id)
+        return room.state_tag() if room else None
+    return backend.request(backend.owner(room_id), {"op": "tag", "room": room_id})
+
+def wait_state_change(room_id, tag, timeout):
+    # 等到版本標記與 tag 不同或逾時；回傳目前的標記（房間不存在為 None）
+    deadline = time.monotonic() + timeout
+    if backend.is_local(room_id):
+        room = http_room(room_id)
+        if not room:
+            return None
+        with room.state_changed:
+            room.state_changed.wait_for(
+                lambda: room.state_tag() != tag or rooms.get(room_id) is not room,
+                max(0.0, deadline - time.monotonic()))
+        return state_tag(room_id)
+    current = state_tag(room_id)
+    while current == tag and time.monotonic() < deadline:
+        time.sleep(min(REMOTE_POLL_SEC, max(0.0, deadline - time.monotonic())))
+        current = state_tag(room_id)
+    return current
 
 @app.route("/state")
 def http_state():
-    state = {
-        "players": sanitize_players_for_emit(game_state["players"]),
-        "player_order": list(game_state["player_order"]),
-        "current_turn": game_state["current_turn"],
-        "logs": list(game_state["logs"]),
-        "game_started": game_state["game_started"],
-        "max_rounds": game_state["max_rounds"],
-        "round_number": round_number(),
-        "time_remaining_ms": game_time_remaining_ms(),
-    }
-    return jsonify(state)
+    # 條件請求：If-None-Match 與目前版本相同 → 304，不組狀態內容。
+    # 長輪詢：另帶 wait=秒數時，版本相同就等到變更或逾時（逾時仍回 304）。
+    room_id = request.args.get("room", DEFAULT_ROOM_ID)
+    since = request.args.get("since", type=int)
+    wait = min(max(request.args.get("wait", 0.0, type=float), 0.0), LONG_POLL_MAX_SEC)
+    tag = state_tag(room_id)
+    if tag is not None and wait > 0 and request.if_none_match.contains(tag):
+        tag = wait_state_change(room_id, tag, wait)
+    if tag is not None and request.if_none_match.contains(tag):
+        resp = Response(status=304)
+        resp.set_etag(tag)
+        return resp
+    state = fetch_state(room_id, since)
+    if state is None:
+        return jsonify({"error": "房間不存在"}), 404
+    resp = jsonify(state)
+    resp.set_etag(state["tag"])
+    resp.cache_control.no_cache = True
+    return resp
+
+@app.route("/state/stream")
+def http_state_stream():
+    # SSE：每次版本變動推送一次狀態（日誌只送新增的部分），閒置時定期送註解行保持連線
+    room_id = request.args.get("room", DEFAULT_ROOM_ID)
+    state = fetch_state(room_id, request.args.get("since", type=int))
+    if state is None:
+        return jsonify({"error": "房間不存在"}), 404
+
+    def stream(state):
+        while state is not None:
+            yield sse_state(state)
+            tag = current = state["tag"]
+            while current == tag:
+                current = wait_state_change(room_id, tag, SSE_HEARTBEAT_SEC)
+                if current == tag:
+                    yield SSE_KEEPALIVE
+            state = fetch_state(room_id, state["log_seq"]) if current else None
+        yield SSE_CLOSED
+
+    resp = Response(stream(state), mimetype="text/event-stream")
+    resp.headers.update(SSE_HEADERS)
+    return resp
+
+# SSE 格式：asyncio 模式（asgi.py）的原生串流共用
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+SSE_KEEPALIVE = ": keep-alive\n\n"
+SSE_CLOSED = "event: closed\ndata: {}\n\n"
+
+def sse_state(state):
+    return "event: state\nid: %s\ndata: %s\n\n" % (state["tag"], json.dumps(state, ensure_ascii=False))
+
+@app.route("/metrics")
+def http_metrics():
+    if not metrics.ENABLED:
+        return jsonify({"error": "指標已關閉"}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/rooms")
+def http_rooms():
+    return jsonify({"rooms": list_all_rooms()})
+
+# Socket 事件處理函數一律是 fn(sid, data)，執行緒模式與 asyncio 模式共用同一份
+SOCKET_EVENTS = {}      # 事件名稱 -> fn(sid, data)
+
+def socket_event(name):
+    def deco(fn):
+        handler = guarded(name, fn)
+        SOCKET_EVENTS[name] = handler
+        socketio.on_event(name, functools.partial(on_threaded_event, handler))
+        return fn
+    return deco
+
+# 進入處理器之前：先檢查資料形狀，再扣這條連線的權杖
+def guarded(name, fn):
+    @functools.wraps(fn)
+    def wrapper(sid, data=None):
+        if not limits.valid_payload(name, data):
+            reject_event(name, "invalid", sid, "資料格式錯誤")
+            return
+        if limiter is not None and not limiter.allow(sid, name):
+            reject_event(name, "rate", sid, "操作太頻繁，請稍後再試")
+            return
+        return fn(sid, data)
+    return wrapper
+
+def reject_event(name, reason, sid, message):
+    EVENTS_REJECTED.inc(name, reason)
+    if limiter is None or limiter.should_notify(sid):
+        transport.emit("error", {"message": message}, sid)
+
+def on_threaded_event(fn, data=None):
+    return fn(request.sid, data)
+
+def client_connected(sid, room_id, encoding=None, role=None, resume=None, seq=None):
+    client_encodings[sid] = wire.negotiate(encoding)
+    if role == SPECTATOR:
+        client_roles[sid] = SPECTATOR
+    try:
+        seq = int(seq) if seq not in (None, "") else None
+    except ValueError:
+        seq = None
+    enter_room(sid, room_id or DEFAULT_ROOM_ID, "connect", (sid, resume, seq) if resume else None)
+
+def client_disconnected(sid):
+    client_encodings.pop(sid, None)
+    client_roles.pop(sid, None)
+    if limiter is not None:
+        limiter.forget(sid)
+    room_id = rooms.room_id_for_sid(sid)
+    if room_id and backend.is_local(room_id):
+        release_seats(room_id, sid)
+    rooms.unbind_sid(sid)
+    if room_id and not backend.is_local(room_id):
+        backend.send(backend.owner(room_id), {"op": "leave", "room": room_id, "sid": sid})
 
 @socketio.on("connect")
 def on_connect():
-    join_room(game_state["room_id"])
-    broadcast_state()
+    args = request.args
+    client_connected(request.sid, args.get("room"), args.get("enc"), args.get("role"), args.get("resume"), args.get("seq"))
 
 @socketio.on("disconnect")
 def on_disconnect():
-    pass
-
-@socketio.on("join_game")
-def handle_join(data):
-    name = (data or {}).get("player_name", "").strip()
-    if not name:
-        emit("error", {"message": "請提供玩家名稱"}, room=request.sid); return
-    if game_state["game_started"]:
-        emit("error", {"message": "遊戲已開始，暫不接受新玩家"}, room=request.sid); return
-    if len(game_state["players"]) >= game_state["max_players"]:
-        emit("error", {"message": "玩家已滿"}, room=request.sid); return
-    if name in game_state["players"]:
-        emit("error", {"message": "名稱已存在"}, room=request.sid); return
-
-    game_state["players"][name] = {
-        "roles": [],
-        "score": 100,
-        "guardian_active": False,
-        "mark_target": None,
-        "mark_used_turn": None,
-        "is_admin": name.lower() == "admin",
-        "stats": {"call_bluff_success": 0, "bluff_success": 0, "turns_taken": 0},
-    }
-    game_state["player_order"].append(name)
-    add_log(f"{name} 加入了遊戲")
-    socketio.emit("player_joined", {"player": name, "total_players": len(game_state["players"])}, room=game_state["room_id"])
-    broadcast_state()
-
-@socketio.on("start_game")
-def handle_start():
-    if game_state["game_started"]:
-        return
-    if len(game_state["players"]) < 2:
-        emit("error", {"message": "至少需要 2 位玩家"}, room=request.sid); return
-
-    # 重置
-    finish_all_timers()
-    deck = ROLE_POOL_30.copy()
-    random.shuffle(deck)
-
-    names = list(game_state["players"].keys())
-    random.shuffle(names)
-    game_state["player_order"] = names
-
-    for i, name in enumerate(names):
-        start = i * CARDS_PER_PLAYER
-        end = start + CARDS_PER_PLAYER
-        game_state["players"][name]["roles"] = deck[start:end]
-        game_state["players"][name]["score"] = 100
-        game_state["players"][name]["guardian_active"] = False
-        game_state["players"][name]["mark_target"] = None
-        game_state["players"][name]["mark_used_turn"] = None
-        game_state["players"][name]["stats"] = {"call_bluff_success": 0, "bluff_success": 0, "turns_taken": 0}
-
-    game_state["draw_pile"] = deck[len(names) * CARDS_PER_PLAYER:]
-    game_state["discard_pile"] = []
-    game_state["current_turn"] = names[0] if names else None
-    game_state["turn_index"] = 0
-    game_state["game_started"] = True
-    game_state["start_ts"] = now_ts()
-    game_state["deadline_ts"] = game_state["start_ts"] + GAME_TIME_LIMIT_SEC
-    game_state["turn_marker"] = str(uuid.uuid4())
-    game_state["logs"] = []
-    add_log("遊戲開始！")
-    socketio.emit("game_started", {"message": "遊戲已開始"}, room=game_state["room_id"])
-    broadcast_state()
-
-@socketio.on("get_my_cards")
-def handle_get_my_cards(data):
-    player = (data or {}).get("player")
-    if not player or player not in game_state["players"]:
-        return
-    if game_state["players"][player].get("is_admin"):
-        # 管理員顯示所有卡
-        cards = CARD_TYPES.copy()
-    else:
-        cards = list(game_state["players"][player]["roles"])
-    emit("my_cards", {"cards": cards}, room=request.sid)
-
-@socketio.on("play_card")
-def handle_play_card(data):
-    if not game_state["game_started"]:
-        emit("error", {"message": "遊戲未開始"}, room=request.sid); return
-    attacker = (data or {}).get("player")
-    role = (data or {}).get("role")
-    target = (data or {}).get("target")
-    is_bluff = bool((data or {}).get("is_bluff"))
-    extra = (data or {}).get("extra") or {}
-
-    if attacker != game_state["current_turn"]:
-        emit("error", {"message": "不是你的回合"}, room=request.sid); return
-    if attacker not in game_state["players"]:
-        return
-
-    # 管理員使用守護者可跳過手牌檢查
-    has_card = True
-    if not game_state["players"][attacker].get("is_admin") or role != " 守護者":
-        has_card = role in game_state["players"][attacker]["roles"]
-
-    # 先建立拆穿提示（所有有目標的卡都能被拆穿；守護者無目標，直接生效）
-    if role == " 守護者":
-        resolve_effect(attacker, role, None, extra, consume_if_has=not game_state["players"][attacker].get("is_admin"))
-        broadcast_state()
-        advance_turn(advance_from=attacker)
-        return
-
-    if not target or target not in game_state["players"]:
-        emit("error", {"message": "請選擇有效目標"}, room=request.sid); return
-
-    # 一律發出拆穿提示（守護者已排除），管理員視為 had_card=True
-    create_challenge_prompt(attacker, role, target, extra, had_card=has_card if not is_bluff else False)
-    broadcast_state()
-
-@socketio.on("call_bluff")
-def handle_call_bluff(data):
-    pid = (data or {}).get("prompt_id")
-    player = (data or {}).get("player")  # 誰按揭穿
-    info = pending_prompts.get(pid)
-    if not info:
-        return
-    attacker = info["player"]
-    role = info["role"]
-    target = info["target"]
-    had_card = info["had_card"]
-
-    # 揭穿：若對方無牌 → 揭穿成功，對方 -5；若對方有牌 → 揭穿失敗，自己 -2，效果生效
-    if not had_card:
-        game_state["players"][attacker]["score"] -= 5
-        st = game_state["players"].setdefault(player, {}).setdefault("stats", {})
-        st["call_bluff_success"] = st.get("call_bluff_success", 0) + 1
-        msg = f"{player} 成功揭穿 {attacker}！{attacker} -5"
-        succ = True
-        socketio.emit("bluff_result", {"success": succ, "message": msg}, room=game_state["room_id"])
-        finish_prompt(pid, advance_from_player=attacker)
-    else:
-        # 揭穿失敗：自己 -2，且行動生效
-        game_state["players"][player]["score"] -= 2
-        resolve_effect(attacker, role, target, info.get("extra"), consume_if_has=not game_state["players"][attacker].get("is_admin"))
-        msg = f"{player} 揭穿失敗！{player} -2，{attacker} 的行動生效"
-        succ = False
-        socketio.emit("bluff_result", {"success": succ, "message": msg}, room=game_state["room_id"])
-        finish_prompt(pid, advance_from_player=attacker)
-
-@socketio.on("not_call_bluff")
-def handle_not_call_bluff(data):
-    pid = (data or {}).get("prompt_id")
-    attacker = (data or {}).get("player")  # 這裡傳的是誰按的；實際上不需要
-    on_not_call_internal(pid, silent=False, advance_from_player=pending_prompts.get(pid, {}).get("player"))
-
-@socketio.on("force_choice_answer")
-def handle_force_choice_answer(data):
-    # 偵探的強制選擇回覆
+    client_disconnected(request.sid)
+
+@socket_event("create_room")
+def handle_create_room(sid, data=None):
+    # 房間 ID 先在這裡決定，才能路由到持有它的 worker
+    room_id = ((data or {}).get("room_id") or "").strip() or uuid.uuid4().hex[:8]
+    enter_room(sid, room_id, "create")
+
+@socket_event("list_rooms")
+def handle_list_rooms(sid, data=None):
+    transport.emit("room_list", {"rooms": list_all_rooms()}, sid)
+
+@socket_event("enter_room")
+def handle_enter_room(sid, data=None):
+    room_id = (data or {}).get("room_id")
+    if not room_id:
+        transport.emit("error", {"message": "房間不存在"}, sid); return
+    enter_room(sid, room_id, "enter")
+
+@socket_event("request_full_state")
+@room_handler
+def handle_request_full_state(room, data, sid):
+    send_full_state(room, sid)
+
+@socket_event("close_room")
+@room_handler
+def handle_close_room(room, data, sid):
     player = (data or {}).get("player")
-    choice = (data or {}).get("choice")
-    if not player or player not in game_state["players"]:
-        return
-    if choice == "discard_one":
-        role = (data or {}).get("discard_role")
-        if role and role in game_state["players"][player]["roles"]:
-            game_state["players"][player]["roles"].remove(role)
-            game_state["discard_pile"].append(role)
-            add_log(f"{player} 丟棄了一張手牌")
-        else:
-            add_log(f"{player} 未選擇有效手牌，視為 -1")
-            game_state["players"][player]["score"] -= 1
-    elif choice == "lose_one":
-        game_state["players"][player]["score"] -= 1
-        add_log(f"{player} 選擇扣 1 分")
-    broadcast_state()
-    check_end_conditions("force_choice_answer")
-
-@socketio.on("end_turn_discard_draw")
-def handle_end_turn_discard_draw(data):
+    if not engine.is_admin(room.state, player):
+        emit_sid(room, "error", {"message": "你不是管理員"}, sid); return
+    finish_all_timers(room)
+    rooms.close(room.room_id)
+    emit_room(room, "room_closed", {"room_id": room.room_id})
+    for enc in set(room.spectators.values()):
+        payload = {"room_id": room.room_id}
+        transport.emit("room_closed", wire.encode(payload) if enc == wire.COMPACT else payload,
+                       spectator_room(room.room_id, enc))
+    for enc in (wire.JSON, wire.COMPACT):
+        transport.close_room(wire.socket_room(room.room_id, enc))
+        transport.close_room(spectator_room(room.room_id, enc))
+
+@socket_event("join_game")
+@room_handler
+def handle_join(room, data, sid):
+    events = run_command(room, "join_game", data, sid)
+    if events and events[0][0] != engine.REPLY:
+        name = (data or {}).get("player_name", "").strip()
+        bind_player(room, name, sid)
+        issue_session(room, name, sid)
+
+@socket_event("add_bot")
+@room_handler
+def handle_add_bot(room, data, sid):
+    # 開局前補一位電腦玩家；人數不足也能開始
+    n = 1
+    while BOT_NAME % n in room.state["players"]:
+        n += 1
+    name = BOT_NAME % n
+    events = run_command(room, "join_game", {"player_name": name}, sid)
+    if events and events[0][0] != engine.REPLY:
+        set_bot(room, name, BOT)
+
+@socket_event("start_game")
+@room_handler
+def handle_start(room, data, sid):
+    run_command(room, "start_game", data, sid)
+
+@socket_event("get_my_cards")
+@room_handler
+def handle_get_my_cards(room, data, sid):
+    # 唯讀：只把手牌重送給已坐在這個座位的連線。換連線綁回座位只能在連線時出示重連憑證（resume_session），
+    # 只報名字不能取得別人的手牌或私人頻道
     player = (data or {}).get("player")
-    discard_role = (data or {}).get("discard_role")
-    if player != game_state["current_turn"]:
-        emit("error", {"message": "不是你的回合"}, room=request.sid); return
-    if discard_role:
-        roles = game_state["players"][player]["roles"]
-        if discard_role in roles:
-            roles.remove(discard_role)
-            game_state["discard_pile"].append(discard_role)
-    # 抽一張
-    if game_state["draw_pile"]:
-        card = game_state["draw_pile"].pop(0)
-        game_state["players"][player]["roles"].append(card)
-    broadcast_state()
-    advance_turn(advance_from=player)
-
-@socketio.on("admin_reset_game")
-def handle_admin_reset_game(data):
-    player = (data or {}).get("player")
-    if not player or not game_state["players"].get(player, {}).get("is_admin"):
-        emit("error", {"message": "你不是管理員"}, room=request.sid); return
-
-    finish_all_timers()
-    deck = ROLE_POOL_30.copy()
-    random.shuffle(deck)
-    names = list(game_state["players"].keys())
-    random.shuffle(names)
-    cards_per_player = CARDS_PER_PLAYER
-
-    for i, name in enumerate(names):
-        start = i * cards_per_player
-        end = start + cards_per_player
-        st = game_state["players"][name]
-        st["roles"] = deck[start:end]
-        st["score"] = 100
-        st["guardian_active"] = False
-        st["mark_target"] = None
-        st["mark_used_turn"] = None
-        st["stats"] = {"call_bluff_success": 0, "bluff_success": 0, "turns_taken": 0}
-
-    game_state["player_order"] = names
-    game_state["draw_pile"] = deck[len(names) * cards_per_player:]
-    game_state["discard_pile"] = []
-    game_state["current_turn"] = names[0] if names else None
-    game_state["game_started"] = True
-    game_state["turn_index"] = 0
-    game_state["turn_marker"] = str(uuid.uuid4())
-    game_state["start_ts"] = now_ts()
-    game_state["deadline_ts"] = game_state["start_ts"] + GAME_TIME_LIMIT_SEC
-    game_state["logs"] = []
-    socketio.emit("game_started", {"message": "管理員已重啟遊戲"}, room=game_state["room_id"])
-    broadcast_state()
+    if not player or room.player_sids.get(player) != sid:
+        emit_sid(room, "error", {"message": "無法取得這位玩家的手牌"}, sid); return
+    room.hands_sent.pop(player, None)
+    push_hands(room)
+
+@socket_event("play_card")
+@room_handler
+def handle_play_card(room, data, sid):
+    run_command(room, "play_card", data, sid)
+
+@socket_event("call_bluff")
+@room_handler
+def handle_call_bluff(room, data, sid):
+    run_command(room, "call_bluff", data, sid)
+
+@socket_event("not_call_bluff")
+@room_handler
+def handle_not_call_bluff(room, data, sid):
+    run_command(room, "not_call_bluff", data, sid)
+
+@socket_event("force_choice_answer")
+@room_handler
+def handle_force_choice_answer(room, data, sid):
+    run_command(room, "force_choice_answer", data, sid)
+
+@socket_event("end_turn_discard_draw")
+@room_handler
+def handle_end_turn_discard_draw(room, data, sid):
+    run_command(room, "end_turn_discard_draw", data, sid)
+
+@socket_event("admin_reset_game")
+@room_handler
+def handle_admin_reset_game(room, data, sid):
+    run_command(room, "admin_reset_game", data, sid)
 
 # ====== 啟動 ======
-if __name__ == "__main__":
-    # 服務遊戲頁面
+def use_runtime(new_transport, new_scheduler, drainer=drain_in_background):
+    # asyncio 模式：換成事件迴圈上的傳輸層與排程器；回呼本來就在事件迴圈上執行，直接取完（drainer=drain）
+    global transport, scheduler, spectator_scheduler, start_drain
+    transport = new_transport
+    scheduler = spectator_scheduler = new_scheduler
+    start_drain = drainer
+
+def start_background_jobs():
+    scheduler.call_later(ROOM_REAP_INTERVAL_SEC, room_reaper)
+    enable_persistence(JOURNAL_DIR)
+    if HISTORY_ENABLED:
+        enable_history(HISTORY_DIR)
+
+def serve(port):
+    # 服務遊戲頁面（執行緒模式；由 server.py 呼叫）
     app.template_folder = "templates"
     app.static_folder = "static"
-    socketio.run(app, host="0.0.0.0", port=5000)
\ No newline at end of file
+    start_background_jobs()
+    socketio.run(app, host="0.0.0.0", port=port)
@@ -0,0 +1,201 @@
+import os
+import asyncio
+import inspect
+import logging
+from urllib.parse import parse_qs, urlencode
+
+import socketio
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.http import parse_etags
+
+if __name__ == "__main__":
+    # 由 server.py --asgi 啟動（見該檔說明）：在匯入 app 之前換掉這個行程
+    import server
+    server.exec_main("--asgi")
+
+import app as core
+from scheduler import AsyncioScheduler
+
+logger = logging.getLogger(__name__)
+
+# ====== asyncio / ASGI 模式 ======
+# 以 python-socketio 的 AsyncServer 取代 Flask-SocketIO 的執行緒模式：連線、事件處理與逾時
+# 都在同一個事件迴圈上，閒置連線不佔執行緒堆疊。遊戲邏輯、房間與 HTTP 路由沿用 app.py，
+# 只換掉傳輸層與排程器。啟動：
+#   python server.py --asgi   或   uvicorn asgi:application --port 5000
+# 目前只支援單一行程（memory 後端）；多 worker 請用執行緒模式搭配 cluster.py。
+
+
+class AsyncTransport:
+    # 處理器在迴圈內同步執行；送出動作依序排入佇列，由單一任務 await，確保每個客戶端收到的順序不變
+    def __init__(self, sio):
+        self.sio = sio
+        self._outbox = None
+        self._task = None
+
+    def start(self):
+        self._outbox = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    async def _drain(self):
+        while True:
+            fn, args = await self._outbox.get()
+            try:
+                result = fn(*args)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("socket send failed: %r", fn)
+
+    def emit(self, event, payload, to):
+        self._outbox.put_nowait((self._emit, (event, payload, to)))
+
+    def _emit(self, event, payload, to):
+        return self.sio.emit(event, payload, to=to)
+
+    def enter_room(self, sid, room_id):
+        self._outbox.put_nowait((self.sio.enter_room, (sid, room_id)))
+
+    def leave_room(self, sid, room_id):
+        self._outbox.put_nowait((self.sio.leave_room, (sid, room_id)))
+
+    def close_room(self, room_id):
+        self._outbox.put_nowait((self.sio.close_room, (room_id,)))
+
+    def is_connected(self, sid):
+        return self.sio.manager.is_connected(sid, "/")
+
+
+sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+transport = AsyncTransport(sio)
+
+def async_handler(fn):
+    async def handler(sid, data=None):
+        fn(sid, data)
+    return handler
+
+for name, fn in core.SOCKET_EVENTS.items():
+    sio.on(name, async_handler(fn))
+
+@sio.event
+async def connect(sid, environ):
+    query = {k: v[0] for k, v in parse_qs(environ.get("QUERY_STRING", "")).items()}
+    core.client_connected(sid, query.get("room"), query.get("enc"), query.get("role"), query.get("resume"), query.get("seq"))
+
+@sio.event
+async def disconnect(sid):
+    core.client_disconnected(sid)
+
+async def startup():
+    if core.backend.workers > 1:
+        raise RuntimeError("asyncio 模式目前只支援單一行程（memory 後端）")
+    transport.start()
+    core.use_runtime(transport, AsyncioScheduler(asyncio.get_running_loop()), core.drain)
+    core.start_background_jobs()
+
+async def shutdown():
+    await transport.stop()
+    if core.journal:
+        core.journal.close()
+    if core.history:
+        core.history.close()
+
+# ====== HTTP ======
+# Flask 路由經 WsgiToAsgi 轉接，而 asgiref 把所有 WSGI 請求排在同一條執行緒上依序執行：
+# 長輪詢或 SSE 在那裡等待會卡住其他所有 HTTP 請求。因此等待一律在事件迴圈上進行——
+# 長輪詢先在這裡等到版本變動或逾時，再去掉 wait 交給 Flask 立即回應（304 或狀態）；
+# SSE 整條串流在這裡送出。其餘路由照常交給 Flask。
+flask_app = WsgiToAsgi(core.app)
+
+async def wait_state_change(room_id, tag, timeout):
+    # 與 core.wait_state_change 相同，但不佔執行緒：由房間的 watchers 叫醒
+    room = core.rooms.get(room_id)
+    if not room:
+        return None
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    wake = lambda: loop.call_soon_threadsafe(changed.set)
+    room.watchers.add(wake)
+    try:
+        if room.state_tag() == tag and core.rooms.get(room_id) is room:
+            try:
+                await asyncio.wait_for(changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        room.watchers.discard(wake)
+    return core.state_tag(room_id)
+
+def header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+async def http_state(scope, receive, send, query):
+    room_id = query.get("room", core.DEFAULT_ROOM_ID)
+    try:
+        wait = min(max(float(query.pop("wait", 0)), 0.0), core.LONG_POLL_MAX_SEC)
+    except ValueError:
+        wait = 0.0
+    tag = core.state_tag(room_id)
+    if tag is not None and wait > 0 and parse_etags(header(scope, b"if-none-match")).contains(tag):
+        await wait_state_change(room_id, tag, wait)
+    scope = dict(scope, query_string=urlencode(query).encode())
+    await flask_app(scope, receive, send)
+
+async def http_state_stream(scope, receive, send, query):
+    room_id = query.get("room", core.DEFAULT_ROOM_ID)
+    try:
+        since = int(query["since"]) if "since" in query else None
+    except ValueError:
+        since = None
+    # 組狀態要取得房間鎖（或向其他 worker 要），放到執行緒去做，不卡住事件迴圈
+    state = await asyncio.to_thread(core.fetch_state, room_id, since)
+    if state is None:
+        await flask_app(scope, receive, send)   # 404 由 Flask 回應
+        return
+
+    async def stream(state):
+        headers = [(b"content-type", b"text/event-stream; charset=utf-8")]
+        headers += [(k.lower().encode(), v.encode()) for k, v in core.SSE_HEADERS.items()]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        while state is not None:
+            await send({"type": "http.response.body", "body": core.sse_state(state).encode(), "more_body": True})
+            tag = current = state["tag"]
+            while current == tag:
+                current = await wait_state_change(room_id, tag, core.SSE_HEARTBEAT_SEC)
+                if current == tag:
+                    await send({"type": "http.response.body", "body": core.SSE_KEEPALIVE.encode(), "more_body": True})
+            state = await asyncio.to_thread(core.fetch_state, room_id, state["log_seq"]) if current else None
+        await send({"type": "http.response.body", "body": core.SSE_CLOSED.encode()})
+
+    async def watch_disconnect(task):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        task.cancel()
+
+    task = asyncio.ensure_future(stream(state))
+    watcher = asyncio.ensure_future(watch_disconnect(task))
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        watcher.cancel()
+
+ASYNC_ROUTES = {"/state": http_state, "/state/stream": http_state_stream}
+
+async def http_app(scope, receive, send):
+    route = ASYNC_ROUTES.get(scope["path"]) if scope["type"] == "http" else None
+    if route is None:
+        await flask_app(scope, receive, send)
+        return
+    query = {k: v[0] for k, v in parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+    await route(scope, receive, send, query)
+
+application = socketio.ASGIApp(sio, other_asgi_app=http_app, on_startup=startup, on_shutdown=shutdown)
@@ -0,0 +1,293 @@
+import os
+import io
+import re
+import sys
+import gzip
+import json
+import shutil
+import zipfile
+import posixpath
+import hashlib
+import logging
+import argparse
+import tempfile
+import urllib.request
+
+try:
+    from PIL import Image
+    from PIL import features as pil_features
+except ImportError:  # 未安裝 Pillow 時只做內容雜湊，不轉檔
+    Image = None
+
+try:
+    import brotli
+except ImportError:  # 未安裝 brotli 時只預先產生 gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# ====== 資產建置 ======
+# 卡圖：從 static/images 的原圖產生縮圖（手牌）與大圖（放大檢視）兩種尺寸，
+# 各輸出 AVIF / WebP / PNG。頁面的 CSS / JS（static/css、static/js）與自行託管的
+# 第三方資產（static/vendor）複製成含內容雜湊的檔名，並預先壓縮出 .br / .gz，
+# 由 /assets/ 依 Accept-Encoding 直接送出壓縮檔。檔名含雜湊，可用 immutable 長效快取。
+# 清單寫在 static/build/manifest.json，來源雜湊沒變就不重建。
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(BASE_DIR, "static", "images")
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+VENDOR_DIR = os.path.join(STATIC_DIR, "vendor")
+BUILD_DIR = os.path.join(BASE_DIR, "static", "build")
+MANIFEST_PATH = os.path.join(BUILD_DIR, "manifest.json")
+URL_PREFIX = "/assets/"
+TMP_SUFFIX = ".tmp"
+
+# 頁面資產（相對 static/）；js/msgpack.js 是精簡線路編碼用的解碼器
+PAGE_FILES = ("css/game.css", "js/msgpack.js", "js/game.js")
+# 自行託管的第三方資產：static/vendor/<相對路徑> ← (固定版本的來源網址, sha256)。
+# 網址帶 #成員 時來源是壓縮檔（例如 PyPI 的 wheel），取出其中該成員。
+# 檔案隨原始碼一起提交；缺檔或內容與雜湊不符時建置直接失敗，頁面不會退回 CDN。
+# 升級版本時改網址與雜湊，再執行 python assets.py --fetch-vendor 並提交新檔。
+FONTAWESOME_WHEEL = ("https://files.pythonhosted.org/packages/bb/e9/d43f5133b73e7ef9047bda28daaa6905e00b7d39f093b547f7e78ee2fc40/"
+                     "fontawesomefree-6.6.0-py3-none-any.whl#fontawesomefree/static/fontawesomefree/")
+VENDOR = {
+    "socket.io.min.js": ("https://cdn.socket.io/4.7.5/socket.io.min.js",
+                         "73eba16bc895fdfa454e27ecb80def31ede8d861f99e175ff93b110eabec044f"),
+    # Font Awesome Free 6.6.0：樣式表以 ../webfonts/ 引用字型，建置時改寫成字型的雜湊網址
+    "fontawesome/css/all.min.css": (FONTAWESOME_WHEEL + "css/all.min.css",
+                                    "e5e202e3c899507992952533f57b634722b69b34241d271963559d31aa33ef81"),
+    "fontawesome/webfonts/fa-brands-400.ttf": (FONTAWESOME_WHEEL + "webfonts/fa-brands-400.ttf",
+                                               "bc844b5b02d3f3adabb514de4e0c0208252d3123413bd03f6287fa446acee859"),
+    "fontawesome/webfonts/fa-brands-400.woff2": (FONTAWESOME_WHEEL + "webfonts/fa-brands-400.woff2",
+                                                 "c411f11975d26eb04cd2aa3c071181d4b18e489f1fb97060d4176a3531dfb36e"),
+    "fontawesome/webfonts/fa-regular-400.ttf": (FONTAWESOME_WHEEL + "webfonts/fa-regular-400.ttf",
+                                                "64f9fb623681f112261e9a2f97826782439f3925dea8f44a57d1e4db95ba6cfd"),
+    "fontawesome/webfonts/fa-regular-400.woff2": (FONTAWESOME_WHEEL + "webfonts/fa-regular-400.woff2",
+                                                  "c732f106e91bc618767fbac8e2c7b27e5c736d477b2bb4fb83f597a43198c33c"),
+    "fontawesome/webfonts/fa-solid-900.ttf": (FONTAWESOME_WHEEL + "webfonts/fa-solid-900.ttf",
+                                              "31f099c13f6e4ba05f1b471bf170cb5493249474222917372de3ca5cf29e6a1a"),
+    "fontawesome/webfonts/fa-solid-900.woff2": (FONTAWESOME_WHEEL + "webfonts/fa-solid-900.woff2",
+                                                "1f0189e087fcefbf654fad74a3a06668b782c01353a61d5c0b7f0bf23e33c020"),
+    "fontawesome/webfonts/fa-v4compatibility.ttf": (FONTAWESOME_WHEEL + "webfonts/fa-v4compatibility.ttf",
+                                                    "a6274a12fd3f5f1ea05fc9b4677959b31fd101fdac4f0d09c17159c414d36d23"),
+    "fontawesome/webfonts/fa-v4compatibility.woff2": (FONTAWESOME_WHEEL + "webfonts/fa-v4compatibility.woff2",
+                                                      "2aca24b35bd41474dcc5e7fb5f11ec43fa06e3ac1d0035ad41108fa6b30b0871"),
+}
+CSS_URL = re.compile(rb"url\(([^)'\"]+)\)")
+COMPRESSIBLE = (".css", ".js", ".json", ".svg", ".html")
+
+# 尺寸以 2 倍像素密度估算：手牌卡面約 180px 寬，放大檢視約 400px 寬
+VARIANTS = {
+    "thumb": (360, 360),
+    "full": (800, 800),
+}
+FORMATS = {
+    "avif": {"format": "AVIF", "quality": 55},
+    "webp": {"format": "WEBP", "quality": 80, "method": 6},
+    "png": {"format": "PNG", "optimize": True},
+}
+MANIFEST_VERSION = 2
+
+
+def digest(data, length=10):
+    return hashlib.sha256(data).hexdigest()[:length]
+
+def supported_formats():
+    if Image is None:
+        return []
+    return [fmt for fmt in FORMATS if fmt == "png" or pil_features.check(fmt)]
+
+def supported_encodings():
+    # 依偏好排列的 (Content-Encoding, 副檔名)
+    return [("br", ".br")] * (brotli is not None) + [("gzip", ".gz")]
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def replace_file(path, data):
+    # 先寫到同目錄下名稱唯一的暫存檔再改名：多個行程同時建置也不會互相覆寫半成品
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=TMP_SUFFIX)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+def write_file(path, data):
+    if not os.path.exists(path):
+        replace_file(path, data)
+
+def write_hashed(stem, variant, ext, data):
+    name = f"{stem}.{variant}.{digest(data)}.{ext}" if variant else f"{stem}.{digest(data)}.{ext}"
+    path = os.path.join(BUILD_DIR, name)
+    write_file(path, data)
+    if name.endswith(COMPRESSIBLE):
+        for encoding, suffix in supported_encodings():
+            write_file(path + suffix, compress(data, encoding))
+    return URL_PREFIX + name
+
+def encode(img, fmt):
+    buf = io.BytesIO()
+    opts = dict(FORMATS[fmt])
+    img.save(buf, **opts)
+    return buf.getvalue()
+
+def build_image(filename, raw):
+    stem, ext = os.path.splitext(filename)
+    entry = {"source": digest(raw)}
+    if Image is None:
+        # 沒有 Pillow：兩種尺寸都指向加上雜湊的原圖
+        url = write_hashed(stem, "orig", ext.lstrip(".").lower(), raw)
+        for variant in VARIANTS:
+            entry[variant] = {"png": url}
+        return entry
+
+    with Image.open(io.BytesIO(raw)) as src:
+        src.load()
+        has_alpha = src.mode in ("RGBA", "LA") or "transparency" in src.info
+        base = src.convert("RGBA" if has_alpha else "RGB")
+    for variant, box in VARIANTS.items():
+        img = base.copy()
+        img.thumbnail(box, Image.LANCZOS)
+        entry[variant] = {fmt: write_hashed(stem, variant, fmt, encode(img, fmt)) for fmt in supported_formats()}
+    return entry
+
+def check_vendor(name, data):
+    expected = VENDOR[name][1]
+    if hashlib.sha256(data).hexdigest() != expected:
+        raise RuntimeError(f"static/vendor/{name} 與固定版本的 sha256 不符（應為 {expected}）")
+
+def rewrite_css_urls(rel, data, files):
+    # 樣式表以相對路徑引用的資產（字型等）改成它們的雜湊網址；沒有建置的引用維持原樣
+    def sub(m):
+        ref = m.group(1).decode("ascii")
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(rel), ref))
+        url = files.get(target)
+        return b"url(" + url.encode("ascii") + b")" if url else m.group(0)
+    return CSS_URL.sub(sub, data)
+
+def build_files():
+    # 頁面資產與第三方資產：相對路徑 -> 含雜湊的網址。樣式表最後處理，才能改寫其中引用的網址
+    sources = [(rel, os.path.join(STATIC_DIR, rel)) for rel in PAGE_FILES]
+    sources += [("vendor/" + name, os.path.join(VENDOR_DIR, name)) for name in VENDOR]
+    sources.sort(key=lambda source: source[0].endswith(".css"))
+    files = {}
+    for rel, path in sources:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise RuntimeError(f"缺少頁面資產 static/{rel}") from None
+        if rel.startswith("vendor/"):
+            check_vendor(rel[len("vendor/"):], data)
+        if rel.endswith(".css"):
+            data = rewrite_css_urls(rel, data, files)
+        stem, ext = os.path.splitext(os.path.basename(rel))
+        files[rel] = write_hashed(stem, None, ext.lstrip("."), data)
+    return files
+
+def fetch_vendor():
+    archives = {}   # 同一個壓縮檔只下載一次
+    for name, (url, _) in VENDOR.items():
+        url, _, member = url.partition("#")
+        if url not in archives:
+            logger.info("fetching %s", url)
+            with urllib.request.urlopen(url, timeout=30) as resp:
+                archives[url] = resp.read()
+        data = archives[url]
+        if member:
+            with zipfile.ZipFile(io.BytesIO(data)) as z:
+                data = z.read(member)
+        check_vendor(name, data)
+        path = os.path.join(VENDOR_DIR, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        replace_file(path, data)
+
+def asset_url(manifest, rel):
+    # 頁面引用資產：有建置結果就用本機雜湊網址，否則直接指向 static/ 下的原檔
+    return manifest.get("files", {}).get(rel) or "/static/" + rel
+
+def precompressed(manifest):
+    # 建置目錄中的檔名 -> 可用的 [(Content-Encoding, 副檔名)]
+    encodings = supported_encodings()
+    return {url[len(URL_PREFIX):]: encodings for url in manifest.get("files", {}).values()
+            if url.endswith(COMPRESSIBLE)}
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if (manifest.get("version") != MANIFEST_VERSION or manifest.get("formats") != supported_formats()
+            or manifest.get("encodings") != [e for e, _ in supported_encodings()]):
+        return {}
+    return manifest
+
+def build_assets(force=False):
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    old = {} if force else load_manifest().get("images", {})
+    images = {}
+    for filename in sorted(os.listdir(SOURCE_DIR)):
+        path = os.path.join(SOURCE_DIR, filename)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            raw = f.read()
+        prev = old.get(filename)
+        if prev and prev.get("source") == digest(raw):
+            images[filename] = prev
+            continue
+        logger.info("building card image variants for %s", filename)
+        images[filename] = build_image(filename, raw)
+
+    manifest = {"version": MANIFEST_VERSION, "formats": supported_formats(),
+                "encodings": [e for e, _ in supported_encodings()], "images": images, "files": build_files()}
+    if manifest != load_manifest():
+        replace_file(MANIFEST_PATH, json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8"))
+        prune(manifest)
+    return manifest
+
+def prune(manifest):
+    # 移除清單中已不再引用的舊雜湊檔
+    keep = {os.path.basename(MANIFEST_PATH)}
+    for entry in manifest["images"].values():
+        for variant in VARIANTS:
+            keep.update(url[len(URL_PREFIX):] for url in entry.get(variant, {}).values())
+    for url in manifest["files"].values():
+        name = url[len(URL_PREFIX):]
+        keep.add(name)
+        keep.update(name + suffix for _, suffix in supported_encodings())
+    for name in os.listdir(BUILD_DIR):
+        # 暫存檔可能是其他行程正在寫入的，不動
+        if name in keep or name.endswith(TMP_SUFFIX):
+            continue
+        path = os.path.join(BUILD_DIR, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="建置卡圖、頁面資產與預先壓縮檔")
+    parser.add_argument("--fetch-vendor", action="store_true", help="先下載固定版本的第三方資產到 static/vendor")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.fetch_vendor:
+        fetch_vendor()
+    m = build_assets(force=True)
+    print(json.dumps(m, ensure_ascii=False, indent=1))
+
+if __name__ == "__main__":
+    sys.exit(main())
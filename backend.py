@@ -0,0 +1,206 @@
+import uuid
+import zlib
+import queue
+import pickle
+import logging
+import threading
+
+import socketio
+
+try:
+    import redis
+except ImportError:  # 只有 redis:// 匯流排需要
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# ====== 房間狀態與訊息後端 ======
+# memory：單一行程，所有房間都在本機（原本的行為）。
+# cluster：多個 worker 行程，每個房間依 room_id 雜湊固定歸屬一個 worker（owner）；
+#   房間狀態、計時器與日誌只存在 owner。其他 worker 收到的房間事件經匯流排轉送給 owner，
+#   Socket.IO 的 emit 則透過同一條匯流排扇出到所有 worker，再送給各自連線的客戶端。
+# 匯流排只需 publish / subscribe：RedisBus 用於正式部署；LocalBus 只在同一個行程內有效，
+# 供測試把多個 worker 載入同一行程（tests/cluster_harness.py），不能讓兩個行程互通。
+RPC_TIMEOUT_SEC = 2.0
+SOCKETIO_CHANNEL = "birthday-socketio"
+
+
+def owner_of(room_id, workers):
+    return zlib.crc32(room_id.encode("utf-8")) % workers
+
+def inbox(worker_id):
+    return "birthday-worker-%d" % worker_id
+
+
+# ====== 匯流排 ======
+class LocalBus:
+    # 同一行程內的匯流排：每個訂閱者一條佇列與一個遞送執行緒，
+    # 訊息經 pickle 往返，行為與跨行程的佇列一致（不共用物件、非同步遞送）。
+    def __init__(self):
+        self._subs = {}     # channel -> [queue.Queue]
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        raw = pickle.dumps(message)
+        with self._lock:
+            subs = list(self._subs.get(channel, ()))
+        for q in subs:
+            q.put(raw)
+
+    def subscribe(self, channel, callback):
+        q = queue.Queue()
+        with self._lock:
+            self._subs.setdefault(channel, []).append(q)
+
+        def deliver():
+            while True:
+                raw = q.get()
+                try:
+                    callback(pickle.loads(raw))
+                except Exception:
+                    logger.exception("bus subscriber failed on %s", channel)
+        threading.Thread(target=deliver, name="bus-" + channel, daemon=True).start()
+
+
+class RedisBus:
+    def __init__(self, url):
+        if redis is None:
+            raise RuntimeError("redis:// 匯流排需要安裝 redis 套件")
+        self._redis = redis.Redis.from_url(url)
+
+    def publish(self, channel, message):
+        self._redis.publish(channel, pickle.dumps(message))
+
+    def subscribe(self, channel, callback):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(channel)
+
+        def deliver():
+            for item in pubsub.listen():
+                try:
+                    callback(pickle.loads(item["data"]))
+                except Exception:
+                    logger.exception("bus subscriber failed on %s", channel)
+        threading.Thread(target=deliver, name="bus-" + channel, daemon=True).start()
+
+
+def make_bus(url):
+    if url.startswith("redis://") or url.startswith("rediss://"):
+        return RedisBus(url)
+    raise ValueError("unknown bus url: %s" % url)
+
+
+class BusManager(socketio.PubSubManager):
+    # 讓 Socket.IO 的 emit / close_room 經由匯流排扇出到所有 worker
+    name = "birthday-bus"
+
+    def __init__(self, bus, channel=SOCKETIO_CHANNEL, write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.bus = bus
+        self._inbox = queue.Queue()
+        if not write_only:
+            bus.subscribe(channel, self._inbox.put)
+
+    def _publish(self, data):
+        self.bus.publish(self.channel, data)
+
+    def _listen(self):
+        while True:
+            yield self._inbox.get()
+
+
+# ====== 後端 ======
+class MemoryBackend:
+    name = "memory"
+    worker_id = 0
+    workers = 1
+
+    def __init__(self):
+        self._handler = None
+
+    def owner(self, room_id):
+        return 0
+
+    def is_local(self, room_id):
+        return True
+
+    def start(self, handler):
+        self._handler = handler
+
+    def send(self, worker_id, message):
+        self._handler(message)
+
+    def request(self, worker_id, message, timeout=RPC_TIMEOUT_SEC):
+        return self._handler(message)
+
+    def client_manager(self):
+        return socketio.BaseManager()
+
+
+class ClusterBackend:
+    name = "cluster"
+
+    def __init__(self, worker_id, workers, bus):
+        self.worker_id = worker_id
+        self.workers = workers
+        self.bus = bus
+        self._handler = None
+        self._pending = {}      # 請求 id -> [threading.Event, 回覆]
+        self._reply_channel = inbox(worker_id) + "-reply"
+
+    def owner(self, room_id):
+        return owner_of(room_id, self.workers)
+
+    def is_local(self, room_id):
+        return self.owner(room_id) == self.worker_id
+
+    def start(self, handler):
+        self._handler = handler
+        self.bus.subscribe(inbox(self.worker_id), self._on_message)
+        self.bus.subscribe(self._reply_channel, self._on_reply)
+
+    def _on_message(self, message):
+        result = self._handler(message)
+        reply_to = message.get("reply_to")
+        if reply_to:
+            self.bus.publish(reply_to, {"id": message["request_id"], "result": result})
+
+    def _on_reply(self, message):
+        waiter = self._pending.get(message["id"])
+        if waiter:
+            waiter[1] = message["result"]
+            waiter[0].set()
+
+    def send(self, worker_id, message):
+        self.bus.publish(inbox(worker_id), message)
+
+    def request(self, worker_id, message, timeout=RPC_TIMEOUT_SEC):
+        # 向指定 worker 要求回覆；逾時回傳 None
+        request_id = uuid.uuid4().hex
+        waiter = [threading.Event(), None]
+        self._pending[request_id] = waiter
+        try:
+            self.send(worker_id, dict(message, request_id=request_id, reply_to=self._reply_channel))
+            waiter[0].wait(timeout)
+            return waiter[1]
+        finally:
+            self._pending.pop(request_id, None)
+
+    def client_manager(self):
+        return BusManager(self.bus)
+
+
+def make_backend(workers=1, worker_id=0, bus_url=None):
+    if workers <= 1:
+        return MemoryBackend()
+    # 每個 worker 是獨立行程：沒有跨行程匯流排時，其他 worker 持有的房間一律找不到，啟動時就拒絕
+    if not (bus_url or "").startswith(("redis://", "rediss://")):
+        raise RuntimeError("BIRTHDAY_WORKERS=%d 需要跨行程匯流排（BIRTHDAY_BUS=redis://...）" % workers)
+    return ClusterBackend(worker_id, workers, make_bus(bus_url))
+
+def backend_from_env(environ):
+    # BIRTHDAY_WORKERS / BIRTHDAY_WORKER_ID / BIRTHDAY_BUS（例：redis://localhost:6379/0）
+    return make_backend(int(environ.get("BIRTHDAY_WORKERS", "1")),
+                        int(environ.get("BIRTHDAY_WORKER_ID", "0")),
+                        environ.get("BIRTHDAY_BUS"))
+
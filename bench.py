@@ -0,0 +1,344 @@
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+
+import app
+import engine
+from engine import BIRTHDAY, CLOWN, GIFTER, DETECTIVE, GUARDIAN, SNIPER
+from gamelog import LOG_MAXLEN
+from rooms import Room
+
+# ====== 微基準測試：遊戲熱路徑 ======
+# 不開 Socket：房間直接建立（不登記到 app.rooms），app.transport 換成只做 JSON 序列化的假傳輸，
+# 量到的是規則引擎與伺服器端組狀態、序列化、排計時器的成本。
+#   python bench.py                               執行全部，輸出 JSON
+#   python bench.py -k broadcast -k prompt        只跑名稱含這些字的項目
+#   python bench.py --json bench_baseline.json    另存結果（作為之後比較的基準）
+#   python bench.py --baseline bench_baseline.json --threshold 0.25
+# 比較時以每次呼叫時間的中位數（median_us）為準，任一項目慢了超過門檻就以結束碼 1 結束；
+# 基準與檢查請用相同的 --min-time / --repeat 與 BIRTHDAY_METRICS 產生（指標開關不同時拒絕比較）。
+# 基準與機器有關：換機器或升級 Python 後請在同一台機器上重新產生。
+MIN_SAMPLE_SEC = 0.05   # 每個樣本至少跑這麼久（自動決定呼叫次數）
+REPEAT = 5
+THRESHOLD = 0.25
+PLAYER_COUNTS = (2, 3, 4, 5, 6)
+NAMES = ["p%d" % i for i in range(engine.MAX_PLAYERS)]
+LOG_LINE = "p0 使用『海賊王』→ p1 -2，p0 -1"
+
+BENCHMARKS = {}     # 名稱 -> (setup, 參數)；setup(*參數) 回傳無參數的 op()
+
+
+def register(name, setup, *args):
+    BENCHMARKS[name] = (setup, args)
+
+
+class BenchTransport:
+    # 取代 Socket.IO：每次 emit 做一次 JSON 序列化（與送出封包時相同），其餘為空操作。
+    # record=True 時另記下 (事件, 對象)，供測試檢查送出的事件與順序（量測時不開，避免清單無限增長）
+    def __init__(self, record=False):
+        self.emits = 0
+        self.sent = [] if record else None
+
+    def emit(self, event, payload, to):
+        self.emits += 1
+        json.dumps([event, payload], ensure_ascii=False)
+        if self.sent is not None:
+            self.sent.append((event, to))
+
+    def enter_room(self, sid, room_id):
+        pass
+
+    def leave_room(self, sid, room_id):
+        pass
+
+    def close_room(self, room_id):
+        pass
+
+    def is_connected(self, sid):
+        return True
+
+
+def make_room(n, started=True, full_log=True, seed=0):
+    room_id = "bench-%d" % n
+    room = Room(room_id, engine.new_game_state(room_id), seed=seed)
+    room.lock.acquire()     # 與 drain() 相同，房間的處理都在房間鎖內（量測期間一直持有）
+    state = room.state
+    now = time.time()
+    for name in NAMES[:n]:
+        engine.join_game(state, {"player_name": name}, now, room.rng)
+        room.player_sids[name] = "sid-" + name      # 讓 push_hands 也送出私人手牌
+    if started:
+        engine.deal(state, now, room.rng)
+    if full_log:
+        for _ in range(LOG_MAXLEN):
+            engine.add_log(state, LOG_LINE)
+    return room
+
+
+# ====== 項目 ======
+def bench_resolve_effect(role, extra=None, guarded=False):
+    # 攻擊者 p0 → 目標 p1；每次先補回要消耗的牌並重設分數，讓每次呼叫走同一條分支
+    room = make_room(4)
+    state = room.state
+    attacker, target = state["players"]["p0"], state["players"]["p1"]
+    discard = state["discard_pile"]
+    target_name = None if role == GUARDIAN else "p1"
+    now = time.time()
+
+    def op():
+        attacker.roles.append(role)
+        attacker.score = target.score = engine.START_SCORE
+        attacker.guardian_active = False
+        target.guardian_active = guarded
+        engine.resolve_effect(state, [], now, "p0", role, target_name, extra)
+        discard.pop()
+        state["force_choices"].clear()
+    return op
+
+def bench_broadcast_state(n):
+    # 穩定狀態下的一次廣播：一位玩家分數變動 + 一筆新日誌 → 組快照、比對差異、序列化
+    room = make_room(n)
+    app.broadcast_state(room)
+    state = room.state
+    player = state["players"]["p0"]
+
+    def op():
+        player.score = engine.START_SCORE - 1 if player.score == engine.START_SCORE else engine.START_SCORE
+        engine.add_log(state, LOG_LINE)
+        room.state_dirty = True
+        app.broadcast_state(room)
+    return op
+
+def bench_full_state(n):
+    # request_full_state：完整狀態（含 200 筆日誌）送給單一連線
+    room = make_room(n)
+    app.broadcast_state(room)
+    return lambda: app.send_full_state(room, "sid-p0")
+
+def bench_end_game(n):
+    room = make_room(n)
+    state = room.state
+    for i, name in enumerate(NAMES[:n]):
+        state["players"][name].score = engine.START_SCORE - i % 3   # 有同分，排名要比到次要鍵
+
+    def op():
+        state["game_started"] = True
+        engine.end_game(state, [], "bench")
+    return op
+
+def bench_start_game(n):
+    # handle_start 的完整路徑：洗牌發牌 → 事件發送與廣播 → 私人手牌 → 計時器
+    room = make_room(n, started=False)
+    state = room.state
+
+    def op():
+        state["game_started"] = False
+        app.run_command(room, "start_game", {})
+    return op
+
+def bench_admin_reset_game(n):
+    room = make_room(n)
+    room.state["players"]["p0"].is_admin = True
+    data = {"player": "p0"}
+    return lambda: app.run_command(room, "admin_reset_game", data)
+
+def bench_prompt_cycle(n):
+    # 建立拆穿提示（送出 bluff_challenge、排逾時計時器）→ 結束提示（取消計時器）
+    room = make_room(n)
+    state = room.state
+    rng = room.rng
+
+    def op():
+        now = time.time()
+        events = []
+        pid = engine.create_challenge_prompt(state, events, now, rng, "p0", CLOWN, "p1")
+        app.dispatch(room, events)
+        app.sync_timers(room)
+        engine.finish_prompt(state, [], now, rng, pid)
+        app.sync_timers(room)
+    return op
+
+def bench_force_choice_cycle(n):
+    # 偵探：排強制選擇計時器 → 回答（丟一張）→ 取消計時器
+    room = make_room(n)
+    state = room.state
+    target = state["players"]["p1"]
+    data = {"player": "p1", "choice": "discard_one", "discard_role": BIRTHDAY}
+
+    def op():
+        now = time.time()
+        events = []
+        target.roles.append(BIRTHDAY)
+        engine.resolve_effect(state, events, now, "p0", DETECTIVE, "p1", consume_if_has=False)
+        app.dispatch(room, events)
+        app.sync_timers(room)
+        engine.force_choice_answer(state, data, now, room.rng)
+        app.sync_timers(room)
+        state["discard_pile"].clear()
+    return op
+
+
+for card, role, extra, guarded in (("birthday", BIRTHDAY, None, False), ("clown", CLOWN, None, False),
+                                   ("gifter_a", GIFTER, {"mode": "A"}, False),
+                                   ("gifter_b", GIFTER, {"mode": "B", "second_target": "p2"}, False),
+                                   ("detective", DETECTIVE, None, False), ("guardian", GUARDIAN, None, False),
+                                   ("sniper", SNIPER, None, False), ("guardian_counter", SNIPER, None, True)):
+    register("resolve_effect/" + card, bench_resolve_effect, role, extra, guarded)
+for prefix, setup, counts in (("broadcast_state", bench_broadcast_state, PLAYER_COUNTS),
+                              ("full_state", bench_full_state, PLAYER_COUNTS),
+                              ("end_game", bench_end_game, (2, 4, 6)),
+                              ("start_game", bench_start_game, (2, 4, 6)),
+                              ("admin_reset_game", bench_admin_reset_game, (2, 4, 6)),
+                              ("prompt_cycle", bench_prompt_cycle, (2, 4, 6)),
+                              ("force_choice_cycle", bench_force_choice_cycle, (2, 4, 6))):
+    for n in counts:
+        register("%s/%dp" % (prefix, n), setup, n)
+
+
+# ====== 計時 ======
+def run_loop(op, number):
+    # 同 timeit：計時期間關閉 GC，避免回收時機造成的雜訊
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            op()
+        return time.perf_counter() - t0
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+def measure(op, min_sample_sec=MIN_SAMPLE_SEC, repeat=REPEAT):
+    number = 1
+    while True:
+        elapsed = run_loop(op, number)
+        if elapsed >= min_sample_sec:
+            break
+        number = max(number * 2, int(number * min_sample_sec / max(elapsed, 1e-9) * 1.1))
+    samples = sorted(run_loop(op, number) / number * 1e6 for _ in range(repeat))
+    return {
+        "best_us": round(samples[0], 3),
+        "median_us": round(statistics.median(samples), 3),
+        "number": number,
+        "repeat": repeat,
+    }
+
+def select(patterns=()):
+    return [name for name in BENCHMARKS if not patterns or any(p in name for p in patterns)]
+
+def run(names, min_sample_sec=MIN_SAMPLE_SEC, repeat=REPEAT, progress=None):
+    results = {}
+    for name in names:
+        setup, args = BENCHMARKS[name]
+        results[name] = measure(setup(*args), min_sample_sec, repeat)
+        if progress:
+            progress(name, results[name])
+    return results
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "metrics": app.metrics.ENABLED,
+        "hash_seed": os.environ.get("PYTHONHASHSEED"),
+    }
+
+
+# ====== 與基準比較 ======
+def compare(results, baseline, threshold=THRESHOLD):
+    # 回傳 {名稱: {baseline_us, median_us, ratio, regressed}}；基準中沒有的項目不比較
+    report = {}
+    base = baseline.get("results", {})
+    for name, r in results.items():
+        b = base.get(name)
+        if not b:
+            continue
+        ratio = r["median_us"] / b["median_us"] if b["median_us"] else 1.0
+        report[name] = {"baseline_us": b["median_us"], "median_us": r["median_us"], "ratio": round(ratio, 3),
+                        "regressed": ratio > 1.0 + threshold}
+    return report
+
+def recheck(results, names, min_sample_sec, repeat, progress=None):
+    # 疑似變慢的項目重量一次，取兩次中較快者：排除其他行程搶 CPU 造成的誤報
+    for name, r in run(names, min_sample_sec, repeat, progress).items():
+        if r["median_us"] < results[name]["median_us"]:
+            results[name] = r
+
+def format_table(results, comparison):
+    lines = ["%-32s %12s %12s %10s" % ("benchmark", "best_us", "median_us", "vs base")]
+    for name, r in results.items():
+        c = comparison.get(name)
+        delta = ""
+        if c:
+            delta = "%+.1f%%%s" % ((c["ratio"] - 1.0) * 100, " !" if c["regressed"] else "")
+        lines.append("%-32s %12.3f %12.3f %10s" % (name, r["best_us"], r["median_us"], delta))
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="壽星陰謀熱路徑微基準測試")
+    parser.add_argument("-k", dest="patterns", action="append", default=[], help="只跑名稱含此字串的項目（可重複）")
+    parser.add_argument("--min-time", type=float, default=MIN_SAMPLE_SEC, help="每個樣本最少秒數")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="樣本數")
+    parser.add_argument("--json", help="結果另存為 JSON 檔（可作為基準）")
+    parser.add_argument("--baseline", help="與此基準檔比較")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="容許變慢的比例（0.25 = 25%%）")
+    parser.add_argument("--list", action="store_true", help="列出項目後結束")
+    args = parser.parse_args(argv)
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        # 指標開關會改變熱路徑的成本：與基準不同時比較沒有意義
+        if baseline.get("environment", {}).get("metrics") != app.metrics.ENABLED:
+            print("基準的 metrics=%s 與目前（BIRTHDAY_METRICS）不同" % baseline.get("environment", {}).get("metrics"),
+                  file=sys.stderr)
+            return 2
+    progress = lambda name, r: print("%-32s %10.3f us" % (name, r["best_us"]), file=sys.stderr)
+    original = app.transport
+    app.transport = BenchTransport()
+    try:
+        results = run(select(args.patterns), args.min_time, args.repeat, progress)
+        if baseline:
+            regressed = [name for name, c in compare(results, baseline, args.threshold).items() if c["regressed"]]
+            if regressed:
+                recheck(results, regressed, args.min_time, args.repeat, progress)
+    finally:
+        app.transport = original
+        app.scheduler.stop()
+
+    output = {"environment": environment(), "results": results}
+    comparison = {}
+    if baseline:
+        comparison = compare(results, baseline, args.threshold)
+        output["comparison"] = {"baseline": args.baseline, "threshold": args.threshold, "results": comparison}
+    text = json.dumps(output, ensure_ascii=False, indent=2, sort_keys=True)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    if args.baseline:
+        print(format_table(results, comparison), file=sys.stderr)
+        regressed = sorted(name for name, c in comparison.items() if c["regressed"])
+        if regressed:
+            print("變慢超過 %d%%：%s" % (args.threshold * 100, ", ".join(regressed)), file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    # 固定雜湊種子：字串雜湊每個行程不同會改變 dict 的排列，跨次執行的數字才可比
+    if os.environ.get("PYTHONHASHSEED") is None:
+        os.environ["PYTHONHASHSEED"] = "0"
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+    sys.exit(main())
@@ -0,0 +1,307 @@
+import math
+import time
+import random
+
+import engine
+from engine import CARD_TYPES, ROLE_POOL_30, GUARDIAN, GIFTER, Hand, Player
+from gamelog import GameLog
+
+# ====== 電腦玩家：資訊集蒙地卡羅樹搜尋（ISMCTS）======
+# 機器人只根據 observe() 的內容決策：自己的手牌，以及所有人都看得到的公開狀態
+# （分數、手牌張數、牌堆張數、待回應的提示但不含對方是否真的有牌）。
+# 每次迭代先把看不到的牌依張數隨機重發（determinize），再沿著以「行動」為邊的樹往下選：
+# UCB1 的分母用「這個行動可用的次數」，因此同一棵樹能涵蓋不同的發牌結果。
+# 新節點之後以簡單的隨機策略模擬到對局結束，依最終名次回傳每位玩家的得分；
+# 每個節點只累計當時行動者的得分，對手也會在樹裡挑對自己最好的走法。
+# decide() 是純函數（觀察 → 指令），可以送進行程池；時間到就回傳目前訪問次數最多的行動。
+UCB_C = 0.7
+ROLLOUT_MAX_STEPS = 80
+MAX_ITERATIONS = 50000
+TURN, CALL, FORCE = "turn", "call", "force"
+
+
+# ====== 觀察與重新發牌 ======
+def observe(state, me, now):
+    players = state["players"]
+    prompts = {}
+    for pid, info in state["pending_prompts"].items():
+        prompt = {k: info[k] for k in ("player", "target", "role", "extra")}
+        if info["player"] == me:
+            prompt["had_card"] = info["had_card"]     # 自己出的牌，自己知道真假
+        prompts[pid] = prompt
+    return {
+        "me": me,
+        "hand": players[me].roles.to_list(),
+        "players": {name: {"score": p.score, "guardian_active": p.guardian_active,
+                           "mark_target": p.mark_target, "mark_used_turn": p.mark_used_turn,
+                           "is_admin": p.is_admin, "hand_count": len(p.roles)}
+                    for name, p in players.items()},
+        "player_order": list(state["player_order"]),
+        "current_turn": state["current_turn"],
+        "turn_pos": state["turn_pos"],
+        "turn_index": state["turn_index"],
+        "turn_marker": state["turn_marker"],
+        "max_rounds": state["max_rounds"],
+        "max_players": state["max_players"],
+        "draw_count": len(state["draw_pile"]),
+        "pending_prompts": prompts,
+        "pending_prompt_id": state["pending_prompt_id"],
+        "force_choices": dict(state["force_choices"]),
+        "game_started": state["game_started"],
+        "start_ts": state["start_ts"],
+        "deadline_ts": state["deadline_ts"],
+        "now": now,
+    }
+
+def determinize(obs, rng):
+    # 依觀察建立一份完整狀態：看不到的牌（他人手牌、牌堆）從剩下的牌隨機重發，張數不變
+    me = obs["me"]
+    unknown = list(ROLE_POOL_30)
+    for card in obs["hand"]:
+        unknown.remove(card)
+    rng.shuffle(unknown)
+
+    state = engine.new_game_state("bot")
+    state["logs"] = GameLog(1)      # 模擬不需要日誌
+    pos = 0
+    for name, info in obs["players"].items():
+        p = Player(name)
+        if name == me:
+            p.roles = Hand(obs["hand"])
+        else:
+            n = info["hand_count"]
+            p.roles = Hand(unknown[pos:pos + n])
+            pos += n
+        p.score = info["score"]
+        p.guardian_active = info["guardian_active"]
+        p.mark_target = info["mark_target"]
+        p.mark_used_turn = info["mark_used_turn"]
+        p.is_admin = info["is_admin"]
+        state["players"][name] = p
+    state["draw_pile"].extend(unknown[pos:pos + obs["draw_count"]])
+    state["discard_pile"] = unknown[pos + obs["draw_count"]:]
+
+    for key in ("player_order", "current_turn", "turn_pos", "turn_index", "turn_marker", "max_rounds",
+                "max_players", "pending_prompt_id", "game_started", "start_ts", "deadline_ts"):
+        state[key] = obs[key]
+    state["player_order"] = list(obs["player_order"])
+    state["force_choices"] = dict(obs["force_choices"])
+    for pid, prompt in obs["pending_prompts"].items():
+        info = dict(prompt, deadline=None)
+        if "had_card" not in info:
+            attacker = state["players"][info["player"]]
+            info["had_card"] = attacker.is_admin or info["role"] in attacker.roles
+        state["pending_prompts"][pid] = info
+    return state
+
+
+# ====== 決策點與行動 ======
+def next_decision(state):
+    # 模擬時的決策順序：偵探的強制選擇 → 待回應的拆穿提示 → 目前回合
+    if not state["game_started"]:
+        return None, None
+    if state["force_choices"]:
+        return min(state["force_choices"]), FORCE
+    pid = state["pending_prompt_id"]
+    if pid and pid in state["pending_prompts"]:
+        return state["pending_prompts"][pid]["target"], CALL
+    return state["current_turn"], TURN
+
+def prompt_for(state, me):
+    for pid, info in state["pending_prompts"].items():
+        if info["target"] == me:
+            return pid
+    return None
+
+def legal_actions(state, me, kind):
+    hand = state["players"][me].roles
+    held = [c for c in CARD_TYPES if c in hand]
+    if kind == FORCE:
+        return [("lose_one", None)] + [("discard_one", c) for c in held]
+    if kind == CALL:
+        return [("call",), ("pass",)]
+    others = [n for n in state["player_order"] if n != me]
+    actions = [("end", "")] + [("end", c) for c in held]
+    for role in CARD_TYPES:
+        if role == GUARDIAN:
+            if role in hand:
+                actions.append(("play", role, None))
+        else:
+            actions.extend(("play", role, t) for t in others)
+    return actions
+
+def to_command(state, me, kind, action):
+    if kind == FORCE:
+        return "force_choice_answer", {"player": me, "choice": action[0], "discard_role": action[1] or ""}
+    if kind == CALL:
+        pid = prompt_for(state, me)
+        return ("call_bluff" if action[0] == "call" else "not_call_bluff"), {"prompt_id": pid, "player": me}
+    if action[0] == "end":
+        return "end_turn_discard_draw", {"player": me, "discard_role": action[1]}
+    role = action[1]
+    data = {"player": me, "role": role, "target": action[2], "is_bluff": role not in state["players"][me].roles}
+    if role == GIFTER:
+        data["extra"] = {"mode": "A"}
+    return "play_card", data
+
+def apply_action(state, me, kind, action, now, rng):
+    name, data = to_command(state, me, kind, action)
+    events = engine.COMMANDS[name](state, data, now, rng)
+    if kind == TURN and events and events[0][0] == engine.REPLY:
+        engine.end_turn_discard_draw(state, {"player": me}, now, rng)
+    if kind == FORCE:
+        state["force_choices"].pop(me, None)
+
+def rollout_action(state, me, kind, rng):
+    hand = state["players"][me].roles
+    if kind == FORCE:
+        return ("discard_one", rng.choice(hand.to_list())) if hand and rng.random() < 0.7 else ("lose_one", None)
+    if kind == CALL:
+        return ("call",) if rng.random() < 0.3 else ("pass",)
+    others = [n for n in state["player_order"] if n != me]
+    if not others or rng.random() < 0.1:
+        return ("end", rng.choice(hand.to_list()) if hand and rng.random() < 0.5 else "")
+    if not hand or rng.random() < 0.2:
+        role = rng.choice(CARD_TYPES[:4] + CARD_TYPES[5:])
+    else:
+        role = rng.choice(hand.to_list())
+    return ("play", role, None if role == GUARDIAN else rng.choice(others))
+
+def rewards(state):
+    # 結束：依名次線性給分（第一名 1、最後一名 0）；尚未結束時依分數差估計
+    results = engine.ranking(state)
+    n = len(results)
+    if not state["game_started"] or n < 2:
+        return {r["player"]: 1.0 - i / max(1, n - 1) for i, r in enumerate(results)}
+    best = results[0]["score"]
+    return {r["player"]: 1.0 / (1.0 + math.exp((best - r["score"]) / 5.0)) for r in results}
+
+
+# ====== 搜尋 ======
+class Node:
+    __slots__ = ("children", "visits", "total", "avail")
+
+    def __init__(self):
+        self.children = {}      # 行動 -> Node
+        self.visits = 0
+        self.total = 0.0
+        self.avail = 1
+
+def select(node, actions, rng):
+    log_avail = {}
+    best, best_value = None, -1.0
+    for a in actions:
+        child = node.children[a]
+        la = log_avail.get(child.avail)
+        if la is None:
+            la = log_avail[child.avail] = math.log(child.avail)
+        value = child.total / child.visits + UCB_C * math.sqrt(la / child.visits) + rng.random() * 1e-6
+        if value > best_value:
+            best, best_value = a, value
+    return best
+
+def iterate(root, obs, kind, rng):
+    me, now = obs["me"], obs["now"]
+    state = determinize(obs, rng)
+    node, actor, node_kind = root, me, kind
+    path = []
+    while actor is not None:
+        actions = legal_actions(state, actor, node_kind)
+        untried = []
+        for a in actions:
+            child = node.children.get(a)
+            if child is None:
+                untried.append(a)
+            else:
+                child.avail += 1
+        if untried:
+            action = rng.choice(untried)
+            node.children[action] = child = Node()
+            apply_action(state, actor, node_kind, action, now, rng)
+            path.append((child, actor))
+            break
+        action = select(node, actions, rng)
+        node = node.children[action]
+        apply_action(state, actor, node_kind, action, now, rng)
+        path.append((node, actor))
+        actor, node_kind = next_decision(state)
+
+    for _ in range(ROLLOUT_MAX_STEPS):
+        actor, node_kind = next_decision(state)
+        if actor is None:
+            break
+        apply_action(state, actor, node_kind, rollout_action(state, actor, node_kind, rng), now, rng)
+
+    scores = rewards(state)
+    for child, actor in path:
+        child.visits += 1
+        child.total += scores.get(actor, 0.0)
+
+def decide(obs, kind, budget_sec, seed, max_iterations=MAX_ITERATIONS):
+    # 回傳 (指令名稱, 資料, 迭代次數)；可在其他行程執行
+    rng = random.Random(seed)
+    me = obs["me"]
+    sample = determinize(obs, rng)
+    actions = legal_actions(sample, me, kind)
+    if len(actions) == 1:
+        name, data = to_command(sample, me, kind, actions[0])
+        return name, data, 0
+    deadline = time.perf_counter() + budget_sec
+    root = Node()
+    iterations = 0
+    while iterations < max_iterations and time.perf_counter() < deadline:
+        iterate(root, obs, kind, rng)
+        iterations += 1
+    best = max(actions, key=lambda a: root.children[a].visits if a in root.children else -1)
+    name, data = to_command(sample, me, kind, best)
+    return name, data, iterations
+
+def fallback(state, me, kind, rng):
+    # 搜尋逾時的備案：立即以隨機策略決定
+    return to_command(state, me, kind, rollout_action(state, me, kind, rng))
+
+
+# ====== 伺服器用：目前等待哪些機器人決策 ======
+def pending_decisions(state):
+    # [(玩家, 類型, 決策鍵)]；決策鍵在該決策完成前不變，用來避免重複思考
+    if not state["game_started"]:
+        return []
+    decisions = [(name, FORCE, (FORCE, name, deadline)) for name, deadline in state["force_choices"].items()]
+    for pid, info in state["pending_prompts"].items():
+        decisions.append((info["target"], CALL, (CALL, pid)))
+    if not state["pending_prompt_id"] and state["current_turn"]:
+        decisions.append((state["current_turn"], TURN, (TURN, state["turn_marker"])))
+    return decisions
+
+def still_pending(state, key):
+    if not state["game_started"]:
+        return False
+    if key[0] == FORCE:
+        return state["force_choices"].get(key[1]) == key[2]
+    if key[0] == CALL:
+        return key[1] in state["pending_prompts"]
+    return state["turn_marker"] == key[1] and not state["pending_prompt_id"]
+
+
+# ====== 模擬器策略：python simulate.py --policies bots:ISMCTSPolicy,random ======
+class ISMCTSPolicy:
+    def __init__(self, iterations=300, budget_sec=5.0):
+        self.iterations = iterations
+        self.budget_sec = budget_sec
+
+    def _decide(self, state, me, kind, rng):
+        obs = observe(state, me, 0.0)
+        return decide(obs, kind, self.budget_sec, rng.getrandbits(32), self.iterations)
+
+    def choose_action(self, state, me, rng):
+        name, data, _ = self._decide(state, me, TURN, rng)
+        return name, data
+
+    def should_call(self, state, me, prompt, rng):
+        name, _, _ = self._decide(state, me, CALL, rng)
+        return name == "call_bluff"
+
+    def force_choice(self, state, me, rng):
+        _, data, _ = self._decide(state, me, FORCE, rng)
+        del data["player"]
+        return data
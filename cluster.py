@@ -0,0 +1,53 @@
+import os
+import sys
+import signal
+import argparse
+import subprocess
+
+import assets
+
+# ====== 多 worker 啟動器 ======
+# 每個 worker 是一個獨立的伺服器行程（server.py），監聽 base_port + worker_id。
+# 前端負載平衡需以連線黏著（sticky session）轉發；若再依 ?room= 雜湊到 owner_of(room, N)
+# 對應的埠，房間事件就不必經匯流排轉送。用法：
+#   python cluster.py -w 4 --bus redis://localhost:6379/0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以多個 worker 行程啟動遊戲伺服器")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=5000, help="第一個 worker 的埠")
+    parser.add_argument("--bus", default=os.environ.get("BIRTHDAY_BUS"),
+                        help="跨行程匯流排，例如 redis://localhost:6379/0")
+    args = parser.parse_args(argv)
+    if args.workers > 1 and not (args.bus or "").startswith(("redis://", "rediss://")):
+        parser.error("多個 worker 需要跨行程匯流排（--bus redis://...）")
+
+    # 資產先在這裡建好：worker 啟動時 build_assets() 看到清單與檔案都已是最新，只讀不寫
+    assets.build_assets()
+
+    procs = []
+    for worker_id in range(args.workers):
+        env = dict(os.environ,
+                   BIRTHDAY_WORKERS=str(args.workers),
+                   BIRTHDAY_WORKER_ID=str(worker_id),
+                   BIRTHDAY_PORT=str(args.port + worker_id))
+        if args.bus:
+            env["BIRTHDAY_BUS"] = args.bus
+        procs.append(subprocess.Popen([sys.executable, "server.py"], env=env,
+                                      cwd=os.path.dirname(os.path.abspath(__file__))))
+        print("worker %d → :%d" % (worker_id, args.port + worker_id))
+
+    def stop(*_):
+        for p in procs:
+            p.terminate()
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for p in procs:
+            p.wait()
+    except KeyboardInterrupt:
+        stop()
+    return max((p.returncode or 0) for p in procs)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# ====== 狀態差異（delta）編碼 ======
+# 比對前後兩份快照，只輸出有變動與被移除的欄位；players 逐人逐欄位比對。
+# 每次變更都會帶出的欄位（例如倒數剩餘時間）不算變動。
+VOLATILE_FIELDS = ("time_remaining_ms",)
+
+
+def diff_players(prev, cur):
+    changed = {}
+    for name, p in cur.items():
+        old = prev.get(name)
+        if old is None:
+            changed[name] = p
+            continue
+        fields = {k: v for k, v in p.items() if old.get(k) != v}
+        if fields:
+            changed[name] = fields
+    removed = [name for name in prev if name not in cur]
+    return changed, removed
+
+
+def diff_snapshot(prev, cur):
+    patch = {}
+    fields = {}
+    for k, v in cur.items():
+        if k == "players" or k in VOLATILE_FIELDS:
+            continue
+        if prev.get(k) != v:
+            fields[k] = v
+    if fields:
+        patch["set"] = fields
+    unset = [k for k in prev if k not in cur and k != "players" and k not in VOLATILE_FIELDS]
+    if unset:
+        patch["unset"] = unset
+    players, removed = diff_players(prev.get("players", {}), cur.get("players", {}))
+    if players:
+        patch["players"] = players
+    if removed:
+        patch["players_removed"] = removed
+    return patch
+
+
+def apply_patch(prev, patch):
+    # 與客戶端 applyStatePatch 相同的套用規則（不含日誌與版本欄位）：apply_patch(prev, diff_snapshot(prev, cur)) == cur
+    state = dict(prev)
+    state.update(patch.get("set", {}))
+    for k in patch.get("unset", ()):
+        state.pop(k, None)
+    if "players" in patch or "players_removed" in patch:
+        players = dict(state.get("players", {}))
+        for name, fields in patch.get("players", {}).items():
+            players[name] = {**players.get(name, {}), **fields}
+        for name in patch.get("players_removed", ()):
+            players.pop(name, None)
+        state["players"] = players
+    return state
@@ -0,0 +1,677 @@
+from collections import deque
+
+from gamelog import GameLog
+
+# ====== 規則引擎（無 I/O）======
+# 所有規則都在這裡：只讀寫狀態 dict，並把要通知客戶端的事件附加到 events。
+# 亂數一律由呼叫端傳入的 rng（random.Random）提供，時間由 now 傳入，
+# 因此同一個種子與同一串指令必定得到相同結果；Socket 處理器與模擬器共用。
+#
+# 指令函數簽名一致：cmd(state, data, now, rng) -> events
+# events 為 [(事件名稱, payload), ...]；STATE 標記代表「此處廣播一次狀態」，
+# REPLY 事件只回給送出指令的連線，HISTORY 是結構化的出牌紀錄（寫入歷史庫，不送給客戶端）。
+
+# ====== 常數與卡池 ======
+MAX_PLAYERS = 6
+CARDS_PER_PLAYER = 5
+MAX_ROUNDS = 3
+START_SCORE = 100
+GAME_TIME_LIMIT_SEC = 30 * 60
+BLUFF_TIMEOUT_MS = 5000
+FORCE_CHOICE_TIMEOUT_MS = 5000
+TURN_TIMEOUT_SEC = 0        # 每回合時限；0 表示不限時
+
+# 注意：鍵名需與前端一致（包含空白/特殊字元）
+CARD_TYPES = [" 壽星", " 小丑", " 贈禮者", "️ 偵探", " 守護者", " 狙擊手"]
+ROLE_POOL_30 = []
+for c in CARD_TYPES:
+    ROLE_POOL_30 += [c] * 5  # 6 種 x 5 = 30
+
+ROLE_DISPLAY_NAMES = {
+    " 壽星": "斬魂米娜",
+    " 小丑": "海賊王",
+    " 贈禮者": "假純愛戰士",
+    "️ 偵探": "小菊獸",
+    " 守護者": "烈焰雯の魂",
+    " 狙擊手": "祖濕爺",
+}
+
+BIRTHDAY, CLOWN, GIFTER, DETECTIVE, GUARDIAN, SNIPER = CARD_TYPES
+
+STATE = "game_state"
+REPLY = "error"
+HISTORY = "history"
+
+CARD_IDS = {card: i for i, card in enumerate(CARD_TYPES)}
+
+
+# ====== 資料模型 ======
+# 手牌是以卡牌索引為位置的張數向量：查詢、加入、移除都是 O(1)，每人固定 6 格。
+# 玩家以 __slots__ 儲存欄位，比 dict 省記憶體；to_wire() 產生公開狀態，to_dict() 供快照。
+class Hand:
+    __slots__ = ("counts", "size")
+
+    def __init__(self, cards=()):
+        self.counts = [0] * len(CARD_TYPES)
+        self.size = 0
+        for card in cards:
+            self.append(card)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, card):
+        i = CARD_IDS.get(card)
+        return i is not None and self.counts[i] > 0
+
+    def __iter__(self):
+        for i, n in enumerate(self.counts):
+            for _ in range(n):
+                yield CARD_TYPES[i]
+
+    def __eq__(self, other):
+        return isinstance(other, Hand) and self.counts == other.counts
+
+    def append(self, card):
+        self.counts[CARD_IDS[card]] += 1
+        self.size += 1
+
+    def remove(self, card):
+        i = CARD_IDS.get(card)
+        if i is None or not self.counts[i]:
+            raise ValueError(card)
+        self.counts[i] -= 1
+        self.size -= 1
+
+    def to_list(self):
+        return list(self)
+
+
+class Player:
+    __slots__ = ("roles", "score", "guardian_active", "mark_target", "mark_used_turn", "is_admin",
+                 "call_bluff_success", "bluff_success", "turns_taken")
+
+    def __init__(self, name):
+        self.roles = Hand()
+        self.score = START_SCORE
+        self.guardian_active = False
+        self.mark_target = None
+        self.mark_used_turn = None
+        self.is_admin = name.lower() == "admin"
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.call_bluff_success = 0
+        self.bluff_success = 0
+        self.turns_taken = 0
+
+    def stats(self):
+        return {"call_bluff_success": self.call_bluff_success, "bluff_success": self.bluff_success,
+                "turns_taken": self.turns_taken}
+
+    def to_wire(self):
+        # 公開欄位：不含手牌內容，只有張數
+        return {
+            "score": self.score,
+            "guardian_active": self.guardian_active,
+            "mark_target": self.mark_target,
+            "mark_used_turn": self.mark_used_turn,
+            "is_admin": self.is_admin,
+            "stats": self.stats(),
+            "hand_count": self.roles.size,
+        }
+
+    def to_dict(self):
+        d = self.to_wire()
+        del d["hand_count"]
+        d["roles"] = self.roles.to_list()
+        return d
+
+    @classmethod
+    def from_dict(cls, name, d):
+        p = cls(name)
+        p.roles = Hand(d["roles"])
+        p.score = d["score"]
+        p.guardian_active = d["guardian_active"]
+        p.mark_target = d["mark_target"]
+        p.mark_used_turn = d["mark_used_turn"]
+        p.is_admin = d["is_admin"]
+        stats = d.get("stats", {})
+        p.call_bluff_success = stats.get("call_bluff_success", 0)
+        p.bluff_success = stats.get("bluff_success", 0)
+        p.turns_taken = stats.get("turns_taken", 0)
+        return p
+
+
+def new_game_state(room_id="main"):
+    return {
+        "room_id": room_id,
+        "players": {},          # name -> Player
+        "player_order": [],     # 出手順序
+        "current_turn": None,
+        "turn_pos": 0,          # current_turn 在 player_order 中的位置
+        "draw_pile": deque(),
+        "discard_pile": [],
+        "logs": GameLog(),      # 環狀緩衝區，每筆帶序號
+        "game_started": False,
+        "max_players": MAX_PLAYERS,
+        "turn_index": 0,        # 累計已進行的出手次數
+        "max_rounds": MAX_ROUNDS,
+        "start_ts": None,
+        "deadline_ts": None,
+        "turn_deadline": None,
+        "pending_prompt_id": None,
+        "pending_prompts": {},  # prompt_id -> {player, target, role, extra, had_card, deadline}
+        "force_choices": {},    # player_name -> deadline
+        "turn_marker": None,
+    }
+
+
+def dump_state(state):
+    # 轉為可 JSON 序列化的 dict（快照用）
+    d = dict(state)
+    d["players"] = {name: p.to_dict() for name, p in state["players"].items()}
+    d["draw_pile"] = list(state["draw_pile"])
+    d["logs"] = state["logs"].to_dict()
+    return d
+
+def load_state(d):
+    state = new_game_state(d["room_id"])
+    state.update(d)
+    state["players"] = {name: Player.from_dict(name, p) for name, p in d["players"].items()}
+    state["draw_pile"] = deque(d["draw_pile"])
+    state["logs"] = GameLog.from_dict(d["logs"])
+    if state["current_turn"] in state["player_order"]:
+        state["turn_pos"] = state["player_order"].index(state["current_turn"])
+    return state
+
+
+# ====== 工具函數 ======
+def new_marker(rng):
+    return "%032x" % rng.getrandbits(128)
+
+def time_remaining_ms(state, now):
+    if not state["game_started"] or not state["deadline_ts"]:
+        return None
+    remain = max(0, int(state["deadline_ts"] - now))
+    return remain * 1000
+
+def round_number(state):
+    n = len(state["player_order"])
+    if not state["game_started"] or n == 0:
+        return 0
+    # 以「每人一次出手」為 1 輪
+    return (state["turn_index"] // max(1, n)) + 1
+
+def add_log(state, text):
+    state["logs"].append(text)
+
+def advance_turn_pos(state):
+    # 以快取的位置前進一位。快取失效（有人離開、順序變動）時重新找目前玩家；
+    # 目前玩家已不在順序中時從第一位開始
+    order = state["player_order"]
+    if not order:
+        state["current_turn"] = None
+        return
+    current = state["current_turn"]
+    pos = state["turn_pos"]
+    if pos >= len(order) or order[pos] != current:
+        pos = order.index(current) if current in order else -1
+    pos = (pos + 1) % len(order)
+    state["turn_pos"] = pos
+    state["current_turn"] = order[pos]
+
+def scores_of(state, *names):
+    players = state["players"]
+    return [players[n].score if n in players else 0 for n in names]
+
+def record_action(state, events, now, attacker, role, target, bluff, called_by, before):
+    # before：出牌結算前 [出牌者分數, 目標分數]（scores_of）
+    after = scores_of(state, attacker, target)
+    events.append((HISTORY, {
+        "ts": now,
+        "turn": state["turn_index"],
+        "actor": attacker,
+        "card": role,
+        "target": target,
+        "bluff": bluff,
+        "called_by": called_by,
+        "actor_delta": after[0] - before[0],
+        "target_delta": after[1] - before[1] if target else 0,
+    }))
+
+def is_admin(state, name):
+    p = state["players"].get(name)
+    return p.is_admin if p else False
+
+def ranking(state):
+    # 排名：分數降序；同分 → 成功拆穿 > 成功虛張 > 剩餘手牌多
+    results = []
+    for name, p in state["players"].items():
+        results.append({
+            "player": name,
+            "score": p.score,
+            "call_bluff_success": p.call_bluff_success,
+            "bluff_success": p.bluff_success,
+            "hand_count": len(p.roles),
+        })
+    results.sort(key=lambda r: (-r["score"], -r["call_bluff_success"], -r["bluff_success"], -r["hand_count"]))
+    return results
+
+
+# ====== 回合與結束 ======
+def end_game(state, events, reason=""):
+    results = ranking(state)
+    state["game_started"] = False
+    state["pending_prompts"].clear()
+    state["force_choices"].clear()
+    state["pending_prompt_id"] = None
+    state["turn_deadline"] = None
+    add_log(state, f"【遊戲結束】{reason or '條件達成'}")
+    events.append((STATE, None))
+    events.append(("game_over", {
+        "reason": reason or "條件達成",
+        "results": results,
+    }))
+
+def check_end_conditions(state, events, now):
+    # 提前結束：有人 <= 0
+    for name, p in state["players"].items():
+        if p.score <= 0:
+            end_game(state, events, f"{name} 分數歸零")
+            return True
+    # 輪數上限
+    if round_number(state) > state["max_rounds"]:
+        end_game(state, events, "超過最大輪數")
+        return True
+    # 時限
+    if state["deadline_ts"] and now >= state["deadline_ts"]:
+        end_game(state, events, "超過 30 分鐘時限")
+        return True
+    return False
+
+def advance_turn(state, events, now, rng, advance_from=None):
+    # 計入當前玩家已出手次數
+    if advance_from and advance_from in state["players"]:
+        state["players"][advance_from].turns_taken += 1
+
+    advance_turn_pos(state)
+    state["turn_index"] += 1
+    state["turn_marker"] = new_marker(rng)
+    state["turn_deadline"] = now + TURN_TIMEOUT_SEC if TURN_TIMEOUT_SEC else None
+    events.append((STATE, None))
+    check_end_conditions(state, events, now)
+
+def deal(state, now, rng):
+    state["pending_prompts"].clear()
+    state["force_choices"].clear()
+    deck = ROLE_POOL_30.copy()
+    rng.shuffle(deck)
+
+    names = list(state["players"].keys())
+    rng.shuffle(names)
+    state["player_order"] = names
+
+    for i, name in enumerate(names):
+        start = i * CARDS_PER_PLAYER
+        end = start + CARDS_PER_PLAYER
+        p = state["players"][name]
+        p.roles = Hand(deck[start:end])
+        p.score = START_SCORE
+        p.guardian_active = False
+        p.mark_target = None
+        p.mark_used_turn = None
+        p.reset_stats()
+
+    state["draw_pile"] = deque(deck[len(names) * CARDS_PER_PLAYER:])
+    state["discard_pile"] = []
+    state["current_turn"] = names[0] if names else None
+    state["turn_pos"] = 0
+    state["turn_index"] = 0
+    state["game_started"] = True
+    state["start_ts"] = now
+    state["deadline_ts"] = now + GAME_TIME_LIMIT_SEC
+    state["turn_deadline"] = now + TURN_TIMEOUT_SEC if TURN_TIMEOUT_SEC else None
+    state["turn_marker"] = new_marker(rng)
+    state["pending_prompt_id"] = None
+    state["logs"].clear()
+
+
+# ====== 牌效 ======
+def apply_guardian_counter(state, attacker_name, target_name, role_used):
+    # 擋下攻擊，反擊；若擋祖濕爺，反擊 -2，其他 -1
+    atk = state["players"].get(attacker_name)
+    tgt = state["players"].get(target_name)
+    if not atk or not tgt:
+        return
+    dmg = 2 if role_used == SNIPER else 1
+    atk.score -= dmg
+    tgt.guardian_active = False
+    add_log(state, f"{target_name} 的『{ROLE_DISPLAY_NAMES[GUARDIAN]}』觸發，{attacker_name} 受到 -{dmg}")
+
+def resolve_effect(state, events, now, attacker, role, target, extra=None, consume_if_has=True):
+    players = state["players"]
+    # 管理員：不消耗手牌
+    if consume_if_has and not players[attacker].is_admin:
+        roles = players[attacker].roles
+        try:
+            roles.remove(role)
+            state["discard_pile"].append(role)
+        except ValueError:
+            pass
+
+    A = players.get(attacker)
+    T = players.get(target) if target else None
+    if not A:
+        return
+
+    # 守護者：啟動（隱形啟動，不寫入公開日誌）
+    if role == GUARDIAN:
+        A.guardian_active = True
+        return
+
+    # 需要目標的卡，先判斷守護者是否擋下（流程：先處理拆穿 → 若行動生效才判定守護者）
+    if T and T.guardian_active:
+        apply_guardian_counter(state, attacker, target, role)
+        return
+
+    # 斬魂米娜：標記
+    if role == BIRTHDAY and T:
+        A.mark_target = target
+        A.mark_used_turn = round_number(state)
+        add_log(state, f"{attacker} 使用『{ROLE_DISPLAY_NAMES[BIRTHDAY]}』標記了 {target}")
+
+    # 偵探：強制選擇（公開/棄1或-1）；逾時未回覆視為扣 1 分
+    elif role == DETECTIVE and T:
+        add_log(state, f"{attacker} 對 {target} 使用『{ROLE_DISPLAY_NAMES[DETECTIVE]}』")
+        state["force_choices"][target] = now + FORCE_CHOICE_TIMEOUT_MS / 1000.0
+        events.append(("force_choice", {"timeout_ms": FORCE_CHOICE_TIMEOUT_MS, "target": target}))
+
+    # 小丑：-2，自身 -1；若被標記者為目標，總傷害不超過 -3（此處保守處理）
+    elif role == CLOWN and T:
+        dmg = 2
+        if A.mark_target == target and A.mark_used_turn == round_number(state):
+            dmg = min(3, dmg + 1)  # 額外 -1，但上限 -3
+        T.score -= dmg
+        A.score -= 1
+        add_log(state, f"{attacker} 使用『{ROLE_DISPLAY_NAMES[CLOWN]}』→ {target} -{dmg}，{attacker} -1")
+
+    # 贈禮者：A 自+1目標-1；B 兩個不同目標各-1
+    elif role == GIFTER and T:
+        mode = (extra or {}).get("mode", "A")
+        second_target = (extra or {}).get("second_target")
+        if mode == "B" and second_target and second_target != target and second_target in players:
+            players[target].score -= 1
+            players[second_target].score -= 1
+            add_log(state, f"{attacker} 使用『{ROLE_DISPLAY_NAMES[GIFTER]}』(B) → {target} -1、{second_target} -1")
+        else:
+            # 模式 A；B 參數無效時也降級為 A
+            players[attacker].score += 1
+            players[target].score -= 1
+            add_log(state, f"{attacker} 使用『{ROLE_DISPLAY_NAMES[GIFTER]}』(A) → {attacker} +1、{target} -1")
+
+    # 祖濕爺：目標 -3，自損 -1；若目標分數>80 則改為 -2
+    elif role == SNIPER and T:
+        dmg = 3
+        if T.score > 80:
+            dmg = 2
+        T.score -= dmg
+        A.score -= 1
+        add_log(state, f"{attacker} 使用『{ROLE_DISPLAY_NAMES[SNIPER]}』→ {target} -{dmg}，{attacker} -1")
+
+
+# ====== Bluff（虛張）處理 ======
+def create_challenge_prompt(state, events, now, rng, attacker, role, target, extra=None, had_card=None):
+    # had_card = None → 由手牌判斷；管理員必定 True
+    if had_card is None:
+        if is_admin(state, attacker):
+            had_card = True
+        else:
+            p = state["players"].get(attacker)
+            had_card = bool(p) and role in p.roles
+
+    prompt_id = new_marker(rng)
+    state["pending_prompts"][prompt_id] = {
+        "player": attacker,
+        "target": target,
+        "role": role,
+        "extra": extra,
+        "had_card": had_card,
+        "deadline": now + BLUFF_TIMEOUT_MS / 1000.0,
+    }
+    state["pending_prompt_id"] = prompt_id
+    events.append(("bluff_challenge", {
+        "prompt_id": prompt_id,
+        "player": attacker,
+        "target": target,
+        "role": role,
+        "timeout_ms": BLUFF_TIMEOUT_MS
+    }))
+    return prompt_id
+
+def finish_prompt(state, events, now, rng, prompt_id, advance_from_player=None):
+    state["pending_prompts"].pop(prompt_id, None)
+    state["pending_prompt_id"] = None
+    events.append((STATE, None))
+    if advance_from_player:
+        advance_turn(state, events, now, rng, advance_from_player)
+
+def on_not_call_internal(state, events, now, rng, prompt_id):
+    info = state["pending_prompts"].get(prompt_id)
+    if not info:
+        return
+    attacker = info["player"]
+    role = info["role"]
+    target = info["target"]
+    extra = info.get("extra")
+
+    # 不揭穿：若有牌 → 效果生效；若無牌 → 虛張成功，行動同樣生效但不消耗手牌
+    before = scores_of(state, attacker, target)
+    if info["had_card"]:
+        resolve_effect(state, events, now, attacker, role, target, extra, consume_if_has=not is_admin(state, attacker))
+        msg = f"{attacker} 的行動生效：{ROLE_DISPLAY_NAMES.get(role, role)}"
+    else:
+        state["players"][attacker].bluff_success += 1
+        resolve_effect(state, events, now, attacker, role, target, extra, consume_if_has=False)
+        msg = f"{attacker} 的虛張成功，行動生效：{ROLE_DISPLAY_NAMES.get(role, role)}"
+
+    record_action(state, events, now, attacker, role, target, not info["had_card"], None, before)
+    events.append(("bluff_result", {"success": True, "message": msg}))
+    finish_prompt(state, events, now, rng, prompt_id, advance_from_player=attacker)
+
+
+# ====== 指令 ======
+def join_game(state, data, now, rng):
+    name = (data or {}).get("player_name", "").strip()
+    if not name:
+        return [(REPLY, {"message": "請提供玩家名稱"})]
+    if state["game_started"]:
+        return [(REPLY, {"message": "遊戲已開始，暫不接受新玩家"})]
+    if len(state["players"]) >= state["max_players"]:
+        return [(REPLY, {"message": "玩家已滿"})]
+    if name in state["players"]:
+        return [(REPLY, {"message": "名稱已存在"})]
+
+    state["players"][name] = Player(name)
+    state["player_order"].append(name)
+    add_log(state, f"{name} 加入了遊戲")
+    return [
+        ("player_joined", {"player": name, "total_players": len(state["players"])}),
+        (STATE, None),
+    ]
+
+def start_game(state, data, now, rng):
+    if state["game_started"]:
+        return []
+    if len(state["players"]) < 2:
+        return [(REPLY, {"message": "至少需要 2 位玩家"})]
+    deal(state, now, rng)
+    add_log(state, "遊戲開始！")
+    return [("game_started", {"message": "遊戲已開始"}), (STATE, None)]
+
+def admin_reset_game(state, data, now, rng):
+    player = (data or {}).get("player")
+    if not player or not is_admin(state, player):
+        return [(REPLY, {"message": "你不是管理員"})]
+    deal(state, now, rng)
+    return [("game_started", {"message": "管理員已重啟遊戲"}), (STATE, None)]
+
+def play_card(state, data, now, rng):
+    if not state["game_started"]:
+        return [(REPLY, {"message": "遊戲未開始"})]
+    attacker = (data or {}).get("player")
+    role = (data or {}).get("role")
+    target = (data or {}).get("target")
+    is_bluff = bool((data or {}).get("is_bluff"))
+    extra = (data or {}).get("extra") or {}
+
+    if attacker != state["current_turn"]:
+        return [(REPLY, {"message": "不是你的回合"})]
+    if attacker not in state["players"]:
+        return []
+
+    events = []
+    admin = is_admin(state, attacker)
+    # 管理員使用守護者可跳過手牌檢查
+    has_card = True
+    if not admin or role != GUARDIAN:
+        has_card = role in state["players"][attacker].roles
+
+    # 先建立拆穿提示（所有有目標的卡都能被拆穿；守護者無目標，直接生效）
+    if role == GUARDIAN:
+        before = scores_of(state, attacker, None)
+        resolve_effect(state, events, now, attacker, role, None, extra, consume_if_has=not admin)
+        record_action(state, events, now, attacker, role, None, not has_card, None, before)
+        events.append((STATE, None))
+        advance_turn(state, events, now, rng, advance_from=attacker)
+        return events
+
+    if not target or target not in state["players"]:
+        return [(REPLY, {"message": "請選擇有效目標"})]
+
+    # 一律發出拆穿提示（守護者已排除）
+    create_challenge_prompt(state, events, now, rng, attacker, role, target, extra, had_card=has_card if not is_bluff else False)
+    events.append((STATE, None))
+    return events
+
+def call_bluff(state, data, now, rng):
+    pid = (data or {}).get("prompt_id")
+    player = (data or {}).get("player")  # 誰按揭穿
+    info = state["pending_prompts"].get(pid)
+    if not info or player not in state["players"]:
+        return []
+    attacker = info["player"]
+    events = []
+    before = scores_of(state, attacker, info["target"])
+
+    # 揭穿：若對方無牌 → 揭穿成功，對方 -5；若對方有牌 → 揭穿失敗，自己 -2，效果生效
+    if not info["had_card"]:
+        state["players"][attacker].score -= 5
+        state["players"][player].call_bluff_success += 1
+        events.append(("bluff_result", {"success": True, "message": f"{player} 成功揭穿 {attacker}！{attacker} -5"}))
+    else:
+        state["players"][player].score -= 2
+        resolve_effect(state, events, now, attacker, info["role"], info["target"], info.get("extra"),
+                       consume_if_has=not is_admin(state, attacker))
+        events.append(("bluff_result", {"success": False, "message": f"{player} 揭穿失敗！{player} -2，{attacker} 的行動生效"}))
+    record_action(state, events, now, attacker, info["role"], info["target"], not info["had_card"], player, before)
+    finish_prompt(state, events, now, rng, pid, advance_from_player=attacker)
+    return events
+
+def not_call_bluff(state, data, now, rng):
+    events = []
+    on_not_call_internal(state, events, now, rng, (data or {}).get("prompt_id"))
+    return events
+
+def prompt_timeout(state, data, now, rng):
+    # 超時視為不揭穿
+    return not_call_bluff(state, data, now, rng)
+
+def force_choice_answer(state, data, now, rng):
+    # 偵探的強制選擇回覆
+    player = (data or {}).get("player")
+    choice = (data or {}).get("choice")
+    if not player or player not in state["players"]:
+        return []
+    # 只接受尚在等待中的強制選擇（已逾時者由排程處理過）
+    if state["force_choices"].pop(player, None) is None:
+        return []
+    p = state["players"][player]
+    if choice == "discard_one":
+        role = (data or {}).get("discard_role")
+        if role and role in p.roles:
+            p.roles.remove(role)
+            state["discard_pile"].append(role)
+            add_log(state, f"{player} 丟棄了一張手牌")
+        else:
+            add_log(state, f"{player} 未選擇有效手牌，視為 -1")
+            p.score -= 1
+    elif choice == "lose_one":
+        p.score -= 1
+        add_log(state, f"{player} 選擇扣 1 分")
+    events = [(STATE, None)]
+    check_end_conditions(state, events, now)
+    return events
+
+def force_choice_timeout(state, data, now, rng):
+    player = (data or {}).get("player")
+    if state["force_choices"].pop(player, None) is None:
+        return []
+    if player not in state["players"] or not state["game_started"]:
+        return []
+    state["players"][player].score -= 1
+    add_log(state, f"{player} 未在時限內選擇，視為 -1")
+    events = [(STATE, None)]
+    check_end_conditions(state, events, now)
+    return events
+
+def end_turn_discard_draw(state, data, now, rng):
+    player = (data or {}).get("player")
+    discard_role = (data or {}).get("discard_role")
+    if player != state["current_turn"] or player not in state["players"]:
+        return [(REPLY, {"message": "不是你的回合"})]
+    roles = state["players"][player].roles
+    if discard_role and discard_role in roles:
+        roles.remove(discard_role)
+        state["discard_pile"].append(discard_role)
+    # 抽一張
+    if state["draw_pile"]:
+        roles.append(state["draw_pile"].popleft())
+    events = [(STATE, None)]
+    advance_turn(state, events, now, rng, advance_from=player)
+    return events
+
+def turn_timeout(state, data, now, rng):
+    # 回合已前進或仍在等待拆穿 → 忽略
+    if not state["game_started"] or state["turn_marker"] != (data or {}).get("turn_marker"):
+        return []
+    if state["pending_prompt_id"]:
+        return []
+    player = state["current_turn"]
+    add_log(state, f"{player} 行動逾時，自動結束回合")
+    events = []
+    advance_turn(state, events, now, rng, advance_from=player)
+    return events
+
+def game_deadline(state, data, now, rng):
+    if not state["game_started"] or state["start_ts"] != (data or {}).get("start_ts"):
+        return []
+    events = []
+    end_game(state, events, "超過 30 分鐘時限")
+    return events
+
+
+COMMANDS = {
+    "join_game": join_game,
+    "start_game": start_game,
+    "admin_reset_game": admin_reset_game,
+    "play_card": play_card,
+    "call_bluff": call_bluff,
+    "not_call_bluff": not_call_bluff,
+    "prompt_timeout": prompt_timeout,
+    "force_choice_answer": force_choice_answer,
+    "force_choice_timeout": force_choice_timeout,
+    "end_turn_discard_draw": end_turn_discard_draw,
+    "turn_timeout": turn_timeout,
+    "game_deadline": game_deadline,
+}
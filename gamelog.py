@@ -0,0 +1,59 @@
+from collections import deque
+from itertools import islice
+
+# ====== 遊戲日誌（環狀緩衝區 + 序號）======
+# 每筆日誌有遞增序號 seq（從 1 開始）；只保留最近 maxlen 筆。
+# since(seq) 從尾端往回取，成本只和新增筆數有關；seq 之後的日誌已被擠出緩衝區時回傳 None，
+# 呼叫端要改送完整日誌（並標記 logs_reset），不能把剩下的部分當成增量。
+LOG_MAXLEN = 200
+
+
+class GameLog:
+    def __init__(self, maxlen=LOG_MAXLEN):
+        self._entries = deque(maxlen=maxlen)
+        self.seq = 0            # 最新一筆的序號
+        self.reset_seq = 0      # 最近一次 clear() 時的序號
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    @property
+    def first_seq(self):
+        return self.seq - len(self._entries) + 1
+
+    def append(self, text):
+        self._entries.append(text)
+        self.seq += 1
+        return self.seq
+
+    def clear(self):
+        self._entries.clear()
+        self.reset_seq = self.seq
+
+    def since(self, seq):
+        # seq 之後的日誌（不含 seq 本身）；中間有筆數已被丟棄時回傳 None
+        if seq < self.first_seq - 1:
+            return None
+        return self.tail(self.seq - seq)
+
+    def tail(self, count):
+        # 最近 count 筆（不足時回傳全部）
+        count = min(count, len(self._entries))
+        if count <= 0:
+            return []
+        return list(islice(reversed(self._entries), count))[::-1]
+
+    def to_dict(self):
+        return {"entries": list(self._entries), "seq": self.seq, "reset_seq": self.reset_seq,
+                "maxlen": self._entries.maxlen}
+
+    @classmethod
+    def from_dict(cls, d):
+        log = cls(d.get("maxlen") or LOG_MAXLEN)
+        log._entries.extend(d["entries"])
+        log.seq = d["seq"]
+        log.reset_seq = d["reset_seq"]
+        return log
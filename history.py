@@ -0,0 +1,403 @@
+import os
+import sys
+import json
+import time
+import array
+import queue
+import random
+import struct
+import logging
+import argparse
+import threading
+from collections import Counter
+
+from engine import CARD_TYPES, ROLE_DISPLAY_NAMES, HISTORY
+
+try:
+    import numpy as np
+except ImportError:  # 未安裝 numpy 時查詢改走純 Python（計數仍是 C 速度）
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# ====== 對局歷史：欄式儲存 ======
+# 兩張表：actions（每次出牌結算一列）與 games（每局一列）。寫入端先在記憶體累積成欄，
+# 滿 BATCH_ROWS 列或超過 FLUSH_SEC 才寫成一個區塊檔 <表>-<時間>-<pid>-<序號>.bhc：
+#   b"BHC1" | uint32 標頭長度 | 標頭 JSON | 各欄原始位元組（array 的機器格式，8 位元組對齊）
+# 標頭記錄列數、各欄型別碼與位置，以及字串欄的字典（玩家、房間名稱以 uint16 編碼）。
+# actions 區塊依 card_flags 排序後才寫入（標頭記錄每個代碼的列範圍），
+# 查詢時整個檔案讀成一個 bytes，各欄是其上的 memoryview，不會為每一列建立 Python 物件；
+# 計數直接看列範圍或用 bytes.count，分組加總是對連續切片 sum()，有 numpy 時改用 bincount。
+#   寫入（伺服器）：start_background_jobs() 啟用，存在 data/history/
+#   產生模擬資料：python simulate.py -n 100000 -w 8 --history /tmp/hist
+#   查詢：        python history.py /tmp/hist --json report.json
+MAGIC = b"BHC1"
+SUFFIX = ".bhc"
+BATCH_ROWS = 65536
+FLUSH_SEC = 60
+NONE16 = 0xFFFF
+NO_CARD = len(CARD_TYPES)
+REASONS = ("max_rounds", "score_zero", "time_limit", "other")
+
+# 欄位：(名稱, array 型別碼, 字典編碼)
+# card_flags = 卡牌索引 << 2 | 虛張 << 1 | 被揭穿：卡牌、虛張與揭穿的組合只有 24 種，一次掃描就能全部計數
+ACTION_COLUMNS = (
+    ("game_id", "q", False), ("ts", "d", False), ("turn", "H", False),
+    ("actor", "H", True), ("target", "H", True), ("called_by", "H", True),
+    ("card_flags", "B", False), ("actor_delta", "h", False), ("target_delta", "h", False),
+)
+GAME_COLUMNS = (
+    ("game_id", "q", False), ("room", "H", True), ("start_ts", "d", False), ("end_ts", "d", False),
+    ("players", "B", False), ("turns", "H", False), ("reason", "B", False), ("tie_break", "B", False),
+    ("winner", "H", True), ("winner_score", "h", False),
+)
+TABLES = {"actions": ACTION_COLUMNS, "games": GAME_COLUMNS}
+SORT_KEYS = {"actions": "card_flags"}
+
+
+def reason_code(reason):
+    if reason.endswith("分數歸零"):
+        return REASONS.index("score_zero")
+    if "最大輪數" in reason:
+        return REASONS.index("max_rounds")
+    if "時限" in reason:
+        return REASONS.index("time_limit")
+    return REASONS.index("other")
+
+def card_flags(card, bluff, called):
+    card_id = CARD_TYPES.index(card) if card in CARD_TYPES else NO_CARD
+    return card_id << 2 | bool(bluff) << 1 | bool(called)
+
+def clamp16(v):
+    return max(-32768, min(32767, v))
+
+
+# ====== 區塊檔 ======
+def write_chunk(path, table, columns, dicts):
+    # columns：名稱 -> array.array；dicts：名稱 -> [字串, ...]（代碼即索引）
+    rows = len(next(iter(columns.values())))
+    ranges = None
+    key = SORT_KEYS.get(table)
+    if key:
+        keys = columns[key]
+        order = sorted(range(rows), key=keys.__getitem__)
+        columns = {name: array.array(col.typecode, map(col.__getitem__, order)) for name, col in columns.items()}
+        ranges = {}
+        for i, k in enumerate(columns[key]):
+            ranges.setdefault(k, [i, i])[1] = i + 1
+    layout = []
+    offset = 0
+    for name, typecode, _ in TABLES[table]:
+        nbytes = len(columns[name]) * columns[name].itemsize
+        layout.append([name, typecode, offset, nbytes])
+        offset += nbytes + (-nbytes % 8)
+    header = json.dumps({"table": table, "rows": rows, "byteorder": sys.byteorder, "columns": layout,
+                         "dicts": dicts, "sorted_by": key, "ranges": ranges}, ensure_ascii=False).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for name, _, _, nbytes in layout:
+            f.write(columns[name].tobytes())
+            f.write(b"\0" * (-nbytes % 8))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class Chunk:
+    # 一個區塊檔：data 是整個檔案；column() 回傳零複製的 memoryview
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = f.read()
+        if self.data[:4] != MAGIC:
+            raise ValueError("not a history chunk: %s" % path)
+        (n,) = struct.unpack_from("<I", self.data, 4)
+        self.header = json.loads(self.data[8:8 + n])
+        self.base = 8 + n
+        self.rows = self.header["rows"]
+        self.dicts = self.header["dicts"]
+        self.columns = {name: (typecode, self.base + offset, nbytes)
+                        for name, typecode, offset, nbytes in self.header["columns"]}
+        self.swapped = self.header["byteorder"] != sys.byteorder
+        # 排序鍵的每個值 -> [起始列, 結束列)
+        self.ranges = {int(k): v for k, v in (self.header.get("ranges") or {}).items()}
+
+    def column(self, name):
+        typecode, start, nbytes = self.columns[name]
+        view = memoryview(self.data)[start:start + nbytes]
+        if self.swapped and typecode not in "bB":
+            arr = array.array(typecode, view)
+            arr.byteswap()
+            return memoryview(arr)
+        return view.cast(typecode)
+
+    def count(self, name, value):
+        # uint8 欄位中等於 value 的列數（bytes.count，不經過 Python 物件）
+        _, start, nbytes = self.columns[name]
+        return self.data.count(bytes((value,)), start, start + nbytes)
+
+    def numpy(self, name):
+        typecode, start, nbytes = self.columns[name]
+        arr = np.frombuffer(self.data, dtype=np.dtype(typecode), count=nbytes // array.array(typecode).itemsize,
+                            offset=start)
+        return arr.byteswap() if self.swapped else arr
+
+def list_chunks(path, table):
+    if not os.path.isdir(path):
+        return []
+    return sorted(os.path.join(path, n) for n in os.listdir(path) if n.startswith(table + "-") and n.endswith(SUFFIX))
+
+
+# ====== 寫入端 ======
+class TableBuffer:
+    def __init__(self, table):
+        self.table = table
+        self.spec = TABLES[table]
+        self.reset()
+
+    def reset(self):
+        self.columns = {name: array.array(typecode) for name, typecode, _ in self.spec}
+        self.dicts = {name: {} for name, _, encoded in self.spec if encoded}
+        self.rows = 0
+
+    def append(self, row):
+        for name, _, encoded in self.spec:
+            value = row[name]
+            if encoded:
+                if value is None:
+                    value = NONE16
+                else:
+                    codes = self.dicts[name]
+                    value = codes.setdefault(value, len(codes))
+            self.columns[name].append(value)
+        self.rows += 1
+
+    def write(self, path, seq):
+        if not self.rows:
+            return
+        name = "%s-%d-%d-%d%s" % (self.table, time.time_ns(), os.getpid(), seq, SUFFIX)
+        dicts = {col: list(codes) for col, codes in self.dicts.items()}
+        write_chunk(os.path.join(path, name), self.table, self.columns, dicts)
+        self.reset()
+
+
+class HistoryWriter:
+    # 同步寫入：模擬器與 HistoryStore 的寫入執行緒共用
+    _id_source = random.SystemRandom()
+
+    def __init__(self, path, batch_rows=BATCH_ROWS):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.batch_rows = batch_rows
+        self.tables = {t: TableBuffer(t) for t in TABLES}
+        self.games = {}         # (房間, 開局時間) -> game_id；該局結束、中途重開或房間關閉時移除
+        self.seq = 0
+        self.last_flush = time.monotonic()
+
+    def game_id(self, room_id, start_ts):
+        key = (room_id, start_ts)
+        gid = self.games.get(key)
+        if gid is None:
+            gid = self.games[key] = self._id_source.getrandbits(63)
+        return gid
+
+    def action(self, room_id, start_ts, a):
+        self.tables["actions"].append({
+            "game_id": self.game_id(room_id, start_ts),
+            "ts": a["ts"], "turn": a["turn"],
+            "actor": a["actor"], "target": a["target"], "called_by": a["called_by"],
+            "card_flags": card_flags(a["card"], a["bluff"], a["called_by"] is not None),
+            "actor_delta": clamp16(a["actor_delta"]), "target_delta": clamp16(a["target_delta"]),
+        })
+        self.maybe_flush()
+
+    def game(self, room_id, start_ts, end_ts, turns, game_over):
+        results = game_over["results"]
+        gid = self.game_id(room_id, start_ts)
+        del self.games[(room_id, start_ts)]
+        self.tables["games"].append({
+            "game_id": gid, "room": room_id, "start_ts": start_ts or 0.0, "end_ts": end_ts,
+            "players": len(results), "turns": turns, "reason": reason_code(game_over["reason"]),
+            "tie_break": int(len(results) > 1 and results[0]["score"] == results[1]["score"]),
+            "winner": results[0]["player"] if results else None,
+            "winner_score": clamp16(results[0]["score"]) if results else 0,
+        })
+        self.maybe_flush()
+
+    def abandon(self, room_id, start_ts):
+        # 沒有打完的對局（管理員重開、房間關閉）：不寫 games 列，只放掉 game_id
+        self.games.pop((room_id, start_ts), None)
+
+    def events(self, room_id, start_ts, now, turns, events):
+        # 從引擎的事件串取出 HISTORY 與 game_over
+        for name, payload in events:
+            if name == HISTORY:
+                self.action(room_id, start_ts, payload)
+            elif name == "game_over":
+                self.game(room_id, start_ts, now, turns, payload)
+
+    def maybe_flush(self):
+        if any(t.rows >= self.batch_rows for t in self.tables.values()):
+            self.flush()
+
+    def flush(self):
+        for t in self.tables.values():
+            self.seq += 1
+            t.write(self.path, self.seq)
+        self.last_flush = time.monotonic()
+
+
+class HistoryStore:
+    # 伺服器用：record_*() 只入列，由背景執行緒寫入，寫檔不在房間執行者的延遲路徑上
+    def __init__(self, path, batch_rows=BATCH_ROWS, flush_sec=FLUSH_SEC):
+        self.writer = HistoryWriter(path, batch_rows)
+        self.flush_sec = flush_sec
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def record_action(self, room_id, start_ts, payload):
+        self._queue.put(("action", (room_id, start_ts, payload)))
+
+    def record_game(self, room_id, start_ts, end_ts, turns, game_over):
+        self._queue.put(("game", (room_id, start_ts, end_ts, turns, game_over)))
+
+    def record_abandon(self, room_id, start_ts):
+        self._queue.put(("abandon", (room_id, start_ts)))
+
+    def flush(self):
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait(10)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+    def _run(self):
+        writer = self.writer
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_sec)
+            except queue.Empty:
+                item = ()
+            try:
+                if item is None:
+                    writer.flush()
+                    return
+                if item and item[0] == "flush":
+                    writer.flush()
+                    item[1].set()
+                    continue
+                if item:
+                    getattr(writer, item[0])(*item[1])
+                if time.monotonic() - writer.last_flush >= self.flush_sec:
+                    writer.flush()
+            except Exception:
+                logger.exception("history write failed")
+
+
+# ====== 查詢 ======
+def ratio(a, b):
+    return round(a / b, 4) if b else None
+
+def percentile_from_counts(counts, q):
+    total = sum(counts.values())
+    if not total:
+        return None
+    rank = q / 100.0 * total
+    seen = 0
+    for value in sorted(counts):
+        seen += counts[value]
+        if seen >= rank:
+            return value
+    return value
+
+def summarize(path):
+    t0 = time.perf_counter()
+    games = 0
+    tie_breaks = 0
+    turn_counts = Counter()
+    duration = 0.0
+    reasons = [0] * len(REASONS)
+    for chunk in map(Chunk, list_chunks(path, "games")):
+        games += chunk.rows
+        tie_breaks += chunk.count("tie_break", 1)
+        for i in range(len(REASONS)):
+            reasons[i] += chunk.count("reason", i)
+        turn_counts.update(chunk.column("turns"))
+        duration += sum(chunk.column("end_ts")) - sum(chunk.column("start_ts"))
+
+    n_codes = (NO_CARD + 1) << 2
+    code_counts = [0] * n_codes
+    actor_delta = [0] * n_codes
+    target_delta = [0] * n_codes
+    actions = 0
+    for chunk in map(Chunk, list_chunks(path, "actions")):
+        actions += chunk.rows
+        if np is not None:
+            codes = chunk.numpy("card_flags")
+            for i, v in enumerate(np.bincount(codes, minlength=n_codes)):
+                code_counts[i] += int(v)
+            for sums, col in ((actor_delta, "actor_delta"), (target_delta, "target_delta")):
+                for i, v in enumerate(np.bincount(codes, weights=chunk.numpy(col), minlength=n_codes)):
+                    sums[i] += int(v)
+        else:
+            columns = (chunk.column("actor_delta"), chunk.column("target_delta"))
+            for code, (start, end) in chunk.ranges.items():
+                code_counts[code] += end - start
+                actor_delta[code] += sum(columns[0][start:end])
+                target_delta[code] += sum(columns[1][start:end])
+
+    def bucket(card_id, bluff, called):
+        return card_id << 2 | bluff << 1 | called
+
+    cards = {}
+    total_calls = called_bluffs = 0
+    for card_id, card in enumerate(CARD_TYPES):
+        n = {(b, c): code_counts[bucket(card_id, b, c)] for b in (0, 1) for c in (0, 1)}
+        plays = sum(n.values())
+        bluffs = n[1, 0] + n[1, 1]
+        honest = n[0, 0] + n[0, 1]
+        codes = [bucket(card_id, b, c) for b in (0, 1) for c in (0, 1)]
+        total_calls += n[0, 1] + n[1, 1]
+        called_bluffs += n[1, 1]
+        cards[ROLE_DISPLAY_NAMES[card]] = {
+            "card": card.strip("\ufe0f "),
+            "plays": plays,
+            "usage_share": ratio(plays, actions),
+            "bluffs": bluffs,
+            "bluff_rate": ratio(bluffs, plays),
+            "bluff_called_rate": ratio(n[1, 1], bluffs),
+            "bluff_success_rate": ratio(n[1, 0], bluffs),      # 虛張沒被揭穿
+            "honest_called_rate": ratio(n[0, 1], honest),
+            "avg_actor_delta": ratio(sum(actor_delta[c] for c in codes), plays),
+            "avg_target_delta": ratio(sum(target_delta[c] for c in codes), plays),
+        }
+    return {
+        "games": games,
+        "actions": actions,
+        "avg_turns": ratio(sum(v * n for v, n in turn_counts.items()), games),
+        "turns_p50": percentile_from_counts(turn_counts, 50),
+        "turns_p95": percentile_from_counts(turn_counts, 95),
+        "avg_duration_sec": ratio(duration, games),
+        "tie_break_rate": ratio(tie_breaks, games),
+        "end_reasons": {r: reasons[i] for i, r in enumerate(REASONS) if reasons[i]},
+        "cards": cards,
+        "call": {"count": total_calls, "success_rate": ratio(called_bluffs, total_calls)},
+        "elapsed_sec": round(time.perf_counter() - t0, 3),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="對局歷史查詢：卡牌使用、虛張成功率、同分率與對局長度")
+    parser.add_argument("path", nargs="?", default=os.path.join("data", "history"), help="歷史區塊檔所在目錄")
+    parser.add_argument("--json", help="結果另存為 JSON 檔")
+    args = parser.parse_args(argv)
+    text = json.dumps(summarize(args.path), ensure_ascii=False, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# ====== 指令日誌（append-only）與快照 ======
+# 每筆被接受的指令寫成一行 JSON：{"s": 序號, "r": 房間, "c": 指令, "d": 資料, "t": 時間}。
+# append() 只把紀錄放進佇列；背景寫入執行緒一次取出一批、寫入後只 fsync 一次
+# （group commit），寫檔與 fsync 不在事件處理的延遲路徑上。
+#
+# 日誌分段存放：journal-<起始序號>.jsonl。建立快照時切到新段，
+# 快照寫好後，完全早於快照起點的舊段即可刪除。
+GROUP_COMMIT_SEC = 0.02
+MAX_BATCH = 1024
+SNAPSHOT_NAME = "snapshot.json"
+
+
+def segment_name(start_seq):
+    return "journal-%012d.jsonl" % start_seq
+
+def list_segments(path):
+    names = sorted(n for n in os.listdir(path) if n.startswith("journal-") and n.endswith(".jsonl"))
+    return [(int(n[len("journal-"):-len(".jsonl")]), os.path.join(path, n)) for n in names]
+
+
+class Journal:
+    def __init__(self, path, group_commit_sec=GROUP_COMMIT_SEC):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._group_commit_sec = group_commit_sec
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.seq = self._last_seq_on_disk()
+        self.durable_seq = self.seq
+        self._file = None
+        self._rotate_to = None
+        self._thread = None
+
+    # ---- 讀取 ----
+    def _last_seq_on_disk(self):
+        last = 0
+        snap = self.load_snapshot()
+        if snap:
+            last = snap["journal_seq"]
+        for rec in self.read():
+            last = max(last, rec["s"])
+        return last
+
+    def read(self, after=0):
+        for start, seg in list_segments(self.path):
+            with open(seg, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        break   # 當機時寫到一半的最後一行
+                    if rec["s"] > after:
+                        yield rec
+
+    def load_snapshot(self):
+        try:
+            with open(os.path.join(self.path, SNAPSHOT_NAME), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # ---- 寫入 ----
+    def append(self, room_id, cmd, data, now):
+        # 只配號與入列；回傳序號供房間記錄「已套用到哪一筆」
+        with self._lock:
+            self.seq += 1
+            seq = self.seq
+            self._queue.put({"s": seq, "r": room_id, "c": cmd, "d": data, "t": now})
+        self._ensure_thread()
+        return seq
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+                    self._thread.start()
+
+    def _open_segment(self, start_seq):
+        if self._file:
+            self._file.close()
+        self._file = open(os.path.join(self.path, segment_name(start_seq)), "a", encoding="utf-8")
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # 湊一小段時間的紀錄一起寫，再 fsync 一次
+            deadline = time.monotonic() + self._group_commit_sec
+            while len(batch) < MAX_BATCH:
+                remain = deadline - time.monotonic()
+                if remain <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remain))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except Exception:
+                logger.exception("journal write failed")
+            if any(rec is None for rec in batch):
+                return
+
+    def _write_batch(self, batch):
+        lines = []
+        last_seq = None
+        for rec in batch:
+            if rec is None:
+                continue
+            if self._file is None or (self._rotate_to is not None and rec["s"] >= self._rotate_to):
+                if lines:
+                    self._file.write("\n".join(lines) + "\n")
+                    lines = []
+                self._open_segment(rec["s"])
+                if self._rotate_to is not None and rec["s"] >= self._rotate_to:
+                    self._rotate_to = None
+            lines.append(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+            last_seq = rec["s"]
+        if last_seq is None:
+            return
+        if lines:
+            self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.durable_seq = last_seq
+
+    def rotate(self):
+        # 下一筆紀錄開始寫入新段；回傳切點（此序號以前的紀錄都已套用）
+        with self._lock:
+            self._rotate_to = self.seq + 1
+            return self.seq
+
+    def close(self):
+        if self._thread:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    # ---- 快照 ----
+    def write_snapshot(self, snapshot):
+        path = os.path.join(self.path, SNAPSHOT_NAME)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        # 快照已落地：刪除所有紀錄都早於快照起點的舊段
+        segments = list_segments(self.path)
+        for i, (start, seg) in enumerate(segments):
+            nxt = segments[i + 1][0] if i + 1 < len(segments) else None
+            if nxt is not None and nxt - 1 <= snapshot["journal_seq"]:
+                os.remove(seg)
@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+
+# ====== 連線層防護：速率限制與資料檢查 ======
+# 每條連線（sid）每種事件一個權杖桶，另有一個所有事件共用的連線總桶；兩個都要有權杖才放行。
+# 資料檢查只看形狀：必須是 dict（或不帶資料）、只能有該事件列出的欄位、型別正確、字串不超長，
+# 巢狀只有 play_card 的 extra 一層。全部在進入房間佇列之前完成，不碰房間狀態。
+# BIRTHDAY_RATE_LIMIT=0 關閉速率限制（壓力測試用）；資料檢查一律進行。
+RATE_LIMIT_ENABLED = os.environ.get("BIRTHDAY_RATE_LIMIT", "1") != "0"
+NOTICE_INTERVAL_SEC = 1.0       # 被拒絕時最多每秒回一次錯誤，避免洪水反過來塞滿回應
+
+# (每秒補充的權杖, 桶容量)
+CONNECTION_LIMIT = (20.0, 40)
+DEFAULT_LIMIT = (5.0, 10)
+EVENT_LIMITS = {
+    "create_room": (0.2, 3),
+    "enter_room": (1.0, 5),
+    "list_rooms": (1.0, 5),
+    "join_game": (1.0, 5),
+    "add_bot": (1.0, 6),
+    "start_game": (1.0, 5),
+    "get_my_cards": (2.0, 5),
+    "request_full_state": (2.0, 5),
+    "admin_reset_game": (0.5, 3),
+    "close_room": (0.5, 3),
+}
+
+# 欄位檢查：(允許的型別, 最大長度)；dict 代表巢狀欄位
+NONE = type(None)
+NAME = ((str,), 32)
+OPTIONAL_NAME = ((str, NONE), 32)
+ROLE = ((str, NONE), 16)
+PROMPT_ID = ((str,), 64)
+FLAG = ((bool, int), None)
+COMMON_FIELDS = {
+    "room_id": ((str, NONE), 64),
+    "cmd_id": ((str, int), 128),
+}
+SCHEMAS = {
+    "create_room": {},
+    "enter_room": {},
+    "list_rooms": {},
+    "request_full_state": {},
+    "add_bot": {},
+    "start_game": {},
+    "join_game": {"player_name": NAME},
+    "get_my_cards": {"player": NAME},
+    "close_room": {"player": NAME},
+    "admin_reset_game": {"player": NAME},
+    "play_card": {"player": NAME, "role": ROLE, "target": OPTIONAL_NAME, "is_bluff": FLAG,
+                  "extra": {"mode": ((str,), 2), "second_target": OPTIONAL_NAME}},
+    "call_bluff": {"prompt_id": PROMPT_ID, "player": NAME},
+    "not_call_bluff": {"prompt_id": PROMPT_ID, "player": NAME},
+    "force_choice_answer": {"player": NAME, "choice": ((str,), 16), "discard_role": ROLE},
+    "end_turn_discard_draw": {"player": NAME, "discard_role": ROLE},
+}
+
+
+def check_fields(data, fields):
+    for key, value in data.items():
+        spec = fields.get(key) or COMMON_FIELDS.get(key)
+        if spec is None:
+            return False
+        if type(spec) is dict:
+            if value is not None and not (type(value) is dict and check_fields(value, spec)):
+                return False
+            continue
+        types, max_len = spec
+        if not isinstance(value, types):
+            return False
+        if max_len is not None and type(value) is str and len(value) > max_len:
+            return False
+    return True
+
+def valid_payload(event, data):
+    # 沒有列出的事件不檢查（交給處理器自己判斷）
+    fields = SCHEMAS.get(event)
+    if fields is None or data is None:
+        return True
+    return type(data) is dict and check_fields(data, fields)
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "stamp")
+
+    def __init__(self, burst, now):
+        self.tokens = float(burst)
+        self.stamp = now
+
+    def take(self, rate, burst, now):
+        self.tokens = min(burst, self.tokens + (now - self.stamp) * rate)
+        self.stamp = now
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class RateLimiter:
+    def __init__(self, event_limits=EVENT_LIMITS, default=DEFAULT_LIMIT, connection=CONNECTION_LIMIT):
+        self.event_limits = event_limits
+        self.default = default
+        self.connection = connection
+        self._buckets = {}      # sid -> {事件名稱或 None（連線總桶）: TokenBucket}
+        self._notices = {}      # sid -> 上次回覆「太頻繁」的時間
+        self._lock = threading.Lock()
+
+    def allow(self, sid, event, now=None):
+        now = time.monotonic() if now is None else now
+        rate, burst = self.event_limits.get(event, self.default)
+        with self._lock:
+            buckets = self._buckets.get(sid)
+            if buckets is None:
+                buckets = self._buckets[sid] = {None: TokenBucket(self.connection[1], now)}
+            bucket = buckets.get(event)
+            if bucket is None:
+                bucket = buckets[event] = TokenBucket(burst, now)
+            # 先看事件桶：被事件上限擋下的請求不消耗連線總桶
+            if not bucket.take(rate, burst, now):
+                return False
+            return buckets[None].take(self.connection[0], self.connection[1], now)
+
+    def should_notify(self, sid, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now - self._notices.get(sid, -NOTICE_INTERVAL_SEC) < NOTICE_INTERVAL_SEC:
+                return False
+            self._notices[sid] = now
+            return True
+
+    def forget(self, sid):
+        with self._lock:
+            self._buckets.pop(sid, None)
+            self._notices.pop(sid, None)
+
+    def __len__(self):
+        return len(self._buckets)
@@ -0,0 +1,274 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+
+import engine
+import wire
+from engine import CARD_TYPES, GIFTER, GUARDIAN
+
+# ====== 壓力測試：機器人玩家走真實事件協定 ======
+# 每桌 P 位機器人各自連一條 Socket.IO 連線，依序 join_game → start_game → 輪到自己時
+# play_card / end_turn_discard_draw，被指名時 call_bluff / not_call_bluff，被偵探點名時
+# force_choice_answer；遊戲結束由桌長重新開局，直到時間到。
+#   行程內（Flask-SocketIO 測試客戶端）：python loadtest.py -t 20 -p 4 -d 30 --json out.json
+#   連線到伺服器（socket.io 客戶端）：  python loadtest.py --url http://localhost:5000 -t 20 -p 4
+# 延遲量測：play_card → 出牌者收到 bluff_result；任一動作 → 該玩家收到下一次狀態更新。
+# 流量以收到的 [事件, 資料] JSON 長度估算，兩種模式的數字可互相比較。
+# 機器人出手遠快於真人，會被每連線的速率限制擋下：行程內模式自動關閉限制（資料檢查照常），
+# 連線到伺服器時請以 BIRTHDAY_RATE_LIMIT=0 啟動伺服器。
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[idx]
+
+def latency_summary(samples):
+    values = sorted(s * 1000.0 for s in samples)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50), 3) if values else None,
+        "p95_ms": round(percentile(values, 95), 3) if values else None,
+        "p99_ms": round(percentile(values, 99), 3) if values else None,
+        "max_ms": round(values[-1], 3) if values else None,
+    }
+
+
+class Bot:
+    def __init__(self, table, table_size, name, host, rng, stats, bluff_rate=0.2, call_rate=0.3):
+        self.table = table
+        self.table_size = table_size
+        self.name = name
+        self.host = host                # 桌長：人到齊後開局，結束後重開
+        self.rng = rng
+        self.stats = stats
+        self.bluff_rate = bluff_rate
+        self.call_rate = call_rate
+        self.send = None                # fn(event, data)，由連線端設定
+        self.state = None
+        self.hand = []                  # 伺服器以 my_cards 私下推送
+        self.acted_marker = None
+        self.play_sent = None           # 送出 play_card 的時間
+        self.action_sent = None         # 最近一次動作的時間，等下一次狀態更新
+        self.received = 0
+        self.bytes = 0
+        self.running = True
+        self.cmd_seq = 0
+
+    # ---- 收到事件 ----
+    def on_event(self, event, data, ts):
+        self.received += 1
+        if isinstance(data, bytes):
+            self.bytes += len(event) + len(data)
+            data = wire.decode(data)
+        else:
+            self.bytes += len(json.dumps([event, data], ensure_ascii=False, separators=(",", ":")))
+        if event == "game_state":
+            self.state = data
+            self.on_state(ts)
+        elif event == "game_state_patch":
+            if not self.state or self.state.get("version") != data.get("base"):
+                self.send("request_full_state", {})
+                return
+            self.apply_patch(data)
+            self.on_state(ts)
+        elif event == "my_cards":
+            self.hand = data["cards"]
+        elif event == "bluff_challenge":
+            if data.get("target") == self.name and self.running:
+                if self.rng.random() < self.call_rate:
+                    self.act("call_bluff", {"prompt_id": data["prompt_id"], "player": self.name})
+                else:
+                    self.act("not_call_bluff", {"prompt_id": data["prompt_id"]})
+        elif event == "bluff_result":
+            if self.play_sent is not None:
+                self.stats["play_to_bluff_result"].append(ts - self.play_sent)
+                self.play_sent = None
+        elif event == "force_choice":
+            if data.get("target") == self.name and self.running:
+                self.act("force_choice_answer", self.force_choice())
+        elif event == "game_over":
+            self.stats["games"] += self.host
+            self.acted_marker = None
+            if self.host and self.running:
+                self.send("start_game", {})
+        elif event == "error":
+            self.stats["errors"] += 1
+            self.action_sent = self.play_sent = None
+
+    def apply_patch(self, patch):
+        state = self.state
+        state.update(patch.get("set", {}))
+        players = state.setdefault("players", {})
+        for name, fields in patch.get("players", {}).items():
+            players.setdefault(name, {}).update(fields)
+        for name in patch.get("players_removed", ()):
+            players.pop(name, None)
+        state["version"] = patch["v"]
+
+    def on_state(self, ts):
+        if self.action_sent is not None:
+            self.stats["action_to_state"].append(ts - self.action_sent)
+            self.action_sent = None
+        st = self.state
+        if not self.running:
+            return
+        if not st["game_started"]:
+            if self.host and len(st["players"]) == self.table_size and self.acted_marker != "start":
+                self.acted_marker = "start"
+                self.send("start_game", {})
+            return
+        if st["current_turn"] == self.name and self.acted_marker != st["turn_marker"]:
+            self.acted_marker = st["turn_marker"]
+            self.take_turn()
+
+    # ---- 決策 ----
+    def take_turn(self):
+        hand = self.hand
+        others = [n for n in self.state["player_order"] if n != self.name]
+        if not others or self.rng.random() < 0.1:
+            discard = self.rng.choice(hand) if hand and self.rng.random() < 0.5 else ""
+            self.act("end_turn_discard_draw", {"player": self.name, "discard_role": discard})
+            return
+        if not hand or self.rng.random() < self.bluff_rate:
+            role, is_bluff = self.rng.choice(CARD_TYPES), True
+        else:
+            role, is_bluff = self.rng.choice(hand), False
+        data = {"player": self.name, "role": role, "target": self.rng.choice(others), "is_bluff": is_bluff}
+        if role == GIFTER:
+            data["extra"] = {"mode": "A"}
+        if role == GUARDIAN:
+            data["target"] = None       # 守護者沒有目標，不會有拆穿提示
+        else:
+            self.play_sent = time.perf_counter()
+        self.act("play_card", data)
+
+    def force_choice(self):
+        hand = self.hand
+        if hand and self.rng.random() < 0.7:
+            return {"player": self.name, "choice": "discard_one", "discard_role": self.rng.choice(hand)}
+        return {"player": self.name, "choice": "lose_one"}
+
+    def act(self, event, data):
+        self.cmd_seq += 1
+        data["cmd_id"] = "%s/%s-%d" % (self.table, self.name, self.cmd_seq)
+        self.stats["actions"] += 1
+        self.action_sent = time.perf_counter()
+        self.send(event, data)
+
+
+def new_stats():
+    return {"play_to_bluff_result": [], "action_to_state": [], "actions": 0, "games": 0, "errors": 0}
+
+def make_bots(tables, players, seed, stats):
+    rng = random.Random(seed)
+    bots = []
+    for t in range(tables):
+        for p in range(players):
+            bots.append(Bot("lt-%d" % t, players, "bot%d" % p, p == 0, random.Random(rng.getrandbits(64)), stats))
+    return bots
+
+
+# ====== 執行方式 ======
+def run_inprocess(bots, duration, enc):
+    # 測試客戶端的 emit 是同步處理；單一驅動迴圈輪流取出各連線收到的事件
+    os.environ.setdefault("BIRTHDAY_RATE_LIMIT", "0")
+    import app
+    clients = []
+    for bot in bots:
+        client = app.socketio.test_client(app.app, query_string="room=%s&enc=%s" % (bot.table, enc))
+        bot.send = lambda event, data, c=client: c.emit(event, data)
+        clients.append(client)
+    for bot in bots:
+        bot.send("join_game", {"player_name": bot.name})
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        idle = True
+        for bot, client in zip(bots, clients):
+            for msg in client.get_received():
+                idle = False
+                bot.on_event(msg["name"], msg["args"][0] if msg["args"] else None, time.perf_counter())
+        if idle:
+            time.sleep(0.001)
+    for bot in bots:
+        bot.running = False
+    for client in clients:
+        client.disconnect()
+
+def run_remote(bots, duration, url, enc):
+    import socketio
+    clients = []
+    for bot in bots:
+        client = socketio.Client(reconnection=False)
+        client.on("*", lambda event, data=None, *seq, b=bot: b.on_event(event, data, time.perf_counter()))
+        bot.send = client.emit
+        client.connect("%s?room=%s&enc=%s" % (url, bot.table, enc), transports=["websocket"])
+        clients.append(client)
+    for bot in bots:
+        bot.send("join_game", {"player_name": bot.name})
+    time.sleep(duration)
+    for bot in bots:
+        bot.running = False
+    for client in clients:
+        threading.Thread(target=client.disconnect, daemon=True).start()
+
+
+def report(bots, stats, elapsed, config):
+    received = [b.received for b in bots]
+    traffic = [b.bytes for b in bots]
+    return {
+        "config": config,
+        "elapsed_sec": round(elapsed, 3),
+        "clients": len(bots),
+        "games_finished": stats["games"],
+        "actions": stats["actions"],
+        "actions_per_sec": round(stats["actions"] / elapsed, 1),
+        "errors": stats["errors"],
+        "emits_received": sum(received),
+        "emits_per_sec": round(sum(received) / elapsed, 1),
+        "bytes_per_client": {
+            "mean": round(sum(traffic) / len(traffic), 1) if traffic else 0,
+            "max": max(traffic) if traffic else 0,
+        },
+        "latency": {
+            "play_card_to_bluff_result": latency_summary(stats["play_to_bluff_result"]),
+            "action_to_game_state": latency_summary(stats["action_to_state"]),
+        },
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="壽星陰謀伺服器壓力測試")
+    parser.add_argument("-t", "--tables", type=int, default=10)
+    parser.add_argument("-p", "--players", type=int, default=4, help="每桌人數（2–6）")
+    parser.add_argument("-d", "--duration", type=float, default=20.0, help="秒")
+    parser.add_argument("--url", help="伺服器網址；未指定時在行程內測試")
+    parser.add_argument("--enc", choices=(wire.JSON, wire.COMPACT), default=wire.JSON, help="線路編碼")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="結果另存為 JSON 檔")
+    args = parser.parse_args(argv)
+    if not 2 <= args.players <= engine.MAX_PLAYERS:
+        parser.error("每桌需要 2–6 人")
+
+    stats = new_stats()
+    bots = make_bots(args.tables, args.players, args.seed, stats)
+    t0 = time.perf_counter()
+    if args.url:
+        run_remote(bots, args.duration, args.url.rstrip("/"), args.enc)
+    else:
+        run_inprocess(bots, args.duration, args.enc)
+    config = {"mode": "remote" if args.url else "inprocess", "url": args.url, "enc": args.enc, "tables": args.tables,
+              "players": args.players, "duration": args.duration, "seed": args.seed}
+    result = report(bots, stats, time.perf_counter() - t0, config)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+if __name__ == "__main__":
+    sys.exit(main())
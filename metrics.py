@@ -0,0 +1,136 @@
+import os
+import time
+import bisect
+import functools
+import threading
+
+# ====== 執行期指標（Prometheus 文字格式）======
+# 不依賴 prometheus_client：只需要計數器、即時量測值與固定區間的直方圖。
+# 以 BIRTHDAY_METRICS=0 關閉；關閉時 timed() 直接回傳原函數，熱路徑上沒有任何額外成本，
+# inc() / observe() 也只剩一次旗標判斷。
+ENABLED = os.environ.get("BIRTHDAY_METRICS", "1") != "0"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+BYTES_BUCKETS = (256, 512, 1024, 2048, 4096, 8192, 16384, 65536)
+DURATION_BUCKETS = (60, 120, 300, 600, 900, 1200, 1800, 2400)
+
+_metrics = []           # 依註冊順序輸出
+
+
+def _labels_text(names, values):
+    if not names:
+        return ""
+    pairs = ('%s="%s"' % (n, str(v).replace("\\", "\\\\").replace('"', '\\"')) for n, v in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+def _num(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {} if labels else {(): 0}    # 標籤值 tuple -> 數值；無標籤時一開始就輸出 0
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, *label_values, amount=1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, v in items:
+            yield self.name, _labels_text(self.labels, values), v
+
+
+class Gauge:
+    # 即時量測值：抓取時才呼叫 fn()，回傳數值或 {標籤值 tuple: 數值}
+    kind = "gauge"
+
+    def __init__(self, name, help_text, fn, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.fn = fn
+        _metrics.append(self)
+
+    def samples(self):
+        value = self.fn()
+        if isinstance(value, dict):
+            for values, v in sorted(value.items()):
+                yield self.name, _labels_text(self.labels, values), v
+        else:
+            yield self.name, "", value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {} if labels else {(): [0] * (len(self.buckets) + 2)}   # 標籤值 tuple -> [各區間計數..., 總和, 次數]
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, *label_values):
+        if not ENABLED:
+            return
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(label_values)
+            if s is None:
+                s = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        names = self.labels + ("le",)
+        for values, s in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, s):
+                cumulative += n
+                yield self.name + "_bucket", _labels_text(names, values + (_num(bound),)), cumulative
+            yield self.name + "_bucket", _labels_text(names, values + ("+Inf",)), s[-1]
+            yield self.name + "_sum", _labels_text(self.labels, values), s[-2]
+            yield self.name + "_count", _labels_text(self.labels, values), s[-1]
+
+
+def timed(histogram, *label_values):
+    # 裝飾器：把函數的執行時間記進直方圖；關閉指標時原樣回傳
+    def deco(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - t0, *label_values)
+        return wrapper
+    return deco
+
+def render():
+    lines = []
+    for m in _metrics:
+        lines.append("# HELP %s %s" % (m.name, m.help))
+        lines.append("# TYPE %s %s" % (m.name, m.kind))
+        for name, labels, value in m.samples():
+            lines.append("%s%s %s" % (name, labels, _num(value)))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,211 @@
+import time
+import uuid
+import random
+import threading
+from collections import deque
+
+from gamelog import GameLog
+
+# ====== 房間登錄表 ======
+# 每個房間各自持有遊戲狀態、亂數來源與計時器；處理器只做 dict 查找，
+# 成本不隨房間數量增加。
+DEFAULT_ROOM_ID = "main"
+ROOM_IDLE_TTL_SEC = 30 * 60
+ROOM_QUEUE_MAX = 64             # 每個房間等待執行的客戶端指令上限，超過就拒絕
+RECENT_COMMAND_IDS = 256        # 每個房間記住最近幾個指令 ID，用來丟掉重送或連點的重複指令
+EVENT_BUFFER_MAX = 256          # 每個房間保留最近幾筆房間事件，供斷線重連補送
+
+
+_seed_source = random.SystemRandom()
+
+
+class Room:
+    def __init__(self, room_id, state, seed=None):
+        self.room_id = room_id
+        self.state = state
+        # 以種子建立亂數來源：同一種子 + 同一串指令可重播出相同結果
+        self.seed = _seed_source.getrandbits(64) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.journal_seq = 0            # 已套用的最後一筆日誌指令序號
+        # 計時器不可放進可序列化狀態；截止時間記在 state，這裡只放排程 handle
+        self.prompt_timers = {}         # prompt_id -> TimerHandle
+        self.force_choice_timers = {}   # player_name -> TimerHandle
+        self.turn_timer = None
+        self.turn_timer_key = None
+        self.game_timer = None
+        self.game_timer_key = None
+        self.lock = threading.RLock()   # 房間的執行環境：事件處理與逾時回呼互斥
+        self.state_changed = threading.Condition(self.lock)    # 版本號變動時通知（長輪詢、SSE）
+        self.watchers = set()           # 不佔執行緒的等待者（asyncio 模式）：版本變動或房間關閉時呼叫
+        self.epoch = "%08x" % _seed_source.getrandbits(32)     # 房間重建或重啟後版本號不再可比
+        self.commands = deque()         # 待執行的 (fn, args)；同一時間只有一個執行者在取
+        self.draining = False           # 是否已有執行者在取 commands
+        self.queue_lock = threading.Lock()
+        self.inflight = set()           # 已在佇列中的唯讀請求 (處理器, sid)，重複的直接合併
+        self.recent_command_ids = {}    # 指令 ID -> None（依加入順序，超過上限丟最舊的）
+        self.members = set()            # 目前在房內的 sid
+        self.sessions = {}              # 重連憑證 -> 玩家名稱
+        self.event_seq = 0              # 房間事件序號（每次 emit_room +1）
+        self.event_buffer = deque(maxlen=EVENT_BUFFER_MAX)  # (序號, 事件, 資料)
+        self.spectators = {}            # 觀戰者 sid -> 編碼
+        self.spectator_joins = deque()  # 剛加入、等待送出完整畫面的觀戰者 sid
+        self.spectator_feed = deque()   # (時間, 快照, 新日誌, 日誌是否清空)：延遲期間內的狀態
+        self.spectator_log = GameLog()  # 觀戰者目前看到的日誌（延遲後）
+        self.spectator_view = None      # 觀戰者目前看到的快照（延遲後）
+        self.spectator_timer = None
+        self.player_sids = {}           # 玩家名稱 -> 私人頻道（該玩家目前的 sid）
+        self.bots = {}                  # 電腦控制的玩家名稱 -> "bot"（電腦玩家）或 "takeover"（斷線代打）
+        self.bot_thinking = {}          # 決策鍵 -> (玩家, future, 硬性截止計時器, 開始時間)
+        self.hands_sent = {}            # 玩家名稱 -> 上次送出的手牌
+        self.compact_sids = set()       # 協商為精簡編碼的 sid
+        self.version = 0                # 每次廣播狀態變更 +1
+        self.last_snapshot = None       # 上一版已廣播的快照（不含日誌）
+        self.last_log_seq = 0
+        self.last_log_reset_seq = 0
+        self.state_dirty = False        # 有尚未廣播的狀態變更
+        self.last_broadcast = 0.0       # 上次廣播的 time.monotonic()
+        self.flush_timer = None         # 最小間隔內延後的廣播
+        self.created_ts = time.time()
+        self.last_active = self.created_ts
+
+    def touch(self):
+        self.last_active = time.time()
+
+    def remember_command(self, cmd_id):
+        # 第一次看到回傳 True；重複的指令回傳 False
+        if cmd_id in self.recent_command_ids:
+            return False
+        self.recent_command_ids[cmd_id] = None
+        if len(self.recent_command_ids) > RECENT_COMMAND_IDS:
+            del self.recent_command_ids[next(iter(self.recent_command_ids))]
+        return True
+
+    def state_tag(self):
+        return "%s.%d" % (self.epoch, self.version)
+
+    def notify_watchers(self):
+        for fn in list(self.watchers):
+            fn()
+
+    def forget_sid(self, sid):
+        self.compact_sids.discard(sid)
+        self.spectators.pop(sid, None)
+        for name in [n for n, s in self.player_sids.items() if s == sid]:
+            del self.player_sids[name]
+            self.hands_sent.pop(name, None)
+
+    def summary(self):
+        st = self.state
+        return {
+            "room_id": self.room_id,
+            "players": len(st["players"]),
+            "max_players": st["max_players"],
+            "game_started": st["game_started"],
+            "members": len(self.members),
+        }
+
+
+class RoomRegistry:
+    def __init__(self, state_factory, idle_ttl_sec=ROOM_IDLE_TTL_SEC):
+        self._state_factory = state_factory
+        self._idle_ttl_sec = idle_ttl_sec
+        self.on_create = None   # callback(room)：新房間建立後
+        self.on_close = None    # callback(room)：房間關閉後
+        self._rooms = {}        # room_id -> Room
+        self._sid_rooms = {}    # sid -> room_id
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def get(self, room_id):
+        return self._rooms.get(room_id)
+
+    def create(self, room_id=None, seed=None):
+        with self._lock:
+            room_id = room_id or uuid.uuid4().hex[:8]
+            if room_id in self._rooms:
+                raise KeyError(room_id)
+            room = Room(room_id, self._state_factory(room_id), seed)
+            self._rooms[room_id] = room
+        if self.on_create:
+            self.on_create(room)
+        return room
+
+    def get_or_create(self, room_id):
+        room = self._rooms.get(room_id)
+        if room:
+            return room
+        with self._lock:
+            room = self._rooms.get(room_id)
+            created = room is None
+            if created:
+                room = Room(room_id, self._state_factory(room_id))
+                self._rooms[room_id] = room
+        if created and self.on_create:
+            self.on_create(room)
+        return room
+
+    def add(self, room):
+        # 還原用：直接放入既有的 Room，不觸發 on_create
+        with self._lock:
+            self._rooms[room.room_id] = room
+        return room
+
+    def close(self, room_id):
+        with self._lock:
+            room = self._rooms.pop(room_id, None)
+            if room:
+                for sid in room.members:
+                    self._sid_rooms.pop(sid, None)
+        if room:
+            room.notify_watchers()
+        if room and self.on_close:
+            self.on_close(room)
+        return room
+
+    def all(self):
+        return list(self._rooms.values())
+
+    def list(self):
+        return [r.summary() for r in list(self._rooms.values())]
+
+    # ---- sid 與房間的對應 ----
+    def bind_sid(self, sid, room_id):
+        # 叢集模式下 sid 可能指向由其他 worker 持有的房間：只記錄對應，不加入成員
+        old_id = self._sid_rooms.get(sid)
+        if old_id and old_id != room_id:
+            old = self._rooms.get(old_id)
+            if old:
+                old.members.discard(sid)
+                old.forget_sid(sid)
+        self._sid_rooms[sid] = room_id
+        room = self._rooms.get(room_id)
+        if room:
+            room.members.add(sid)
+            room.touch()
+
+    def unbind_sid(self, sid, room_id=None):
+        # 指定 room_id 時，只在 sid 仍對應該房間時解除
+        if room_id and self._sid_rooms.get(sid) != room_id:
+            return None
+        room_id = self._sid_rooms.pop(sid, None)
+        room = self._rooms.get(room_id) if room_id else None
+        if room:
+            room.members.discard(sid)
+            room.forget_sid(sid)
+            room.touch()
+        return room
+
+    def room_id_for_sid(self, sid):
+        return self._sid_rooms.get(sid)
+
+    def room_for_sid(self, sid):
+        room_id = self._sid_rooms.get(sid)
+        return self._rooms.get(room_id) if room_id else None
+
+    # ---- 閒置回收：無人連線且超過 TTL 的房間 ----
+    def idle_rooms(self, now=None):
+        now = now or time.time()
+        return [r for r in list(self._rooms.values())
+                if not r.members and now - r.last_active >= self._idle_ttl_sec]
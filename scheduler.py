@@ -0,0 +1,141 @@
+import heapq
+import asyncio
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ====== 單一排程執行緒（最小堆積）======
+# 取代「每個提示一條 threading.Timer」：所有逾時都放進同一個堆積，
+# 由一條背景執行緒依到期時間執行。取消只標記旗標（O(1)），
+# 過期項目在彈出時略過；被取消的項目過多時才整理堆積。
+
+
+class TimerHandle:
+    __slots__ = ("when", "fn", "args", "cancelled", "_scheduler")
+
+    def __init__(self, when, fn, args, scheduler):
+        self.when = when
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+        self._scheduler = scheduler
+
+    def cancel(self):
+        # 檢查與設定都在排程器的鎖內：同時取消兩次、或和彈出撞在一起時，計數只會加一次
+        with self._scheduler._cond:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            self._scheduler._on_cancel()
+
+    def remaining(self):
+        return max(0.0, self.when - time.monotonic())
+
+
+class Scheduler:
+    def __init__(self, name="scheduler"):
+        self._name = name
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._cancelled = 0
+        self._thread = None
+        self._stopped = False
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    def call_later(self, delay, fn, *args):
+        return self.call_at(time.monotonic() + max(0.0, delay), fn, *args)
+
+    def call_soon_threadsafe(self, fn, *args):
+        # 從其他執行緒（例如行程池的回呼）交回排程執行緒執行
+        return self.call_later(0, fn, *args)
+
+    def call_at(self, when, fn, *args):
+        handle = TimerHandle(when, fn, args, self)
+        with self._cond:
+            heapq.heappush(self._heap, (when, next(self._counter), handle))
+            if self._heap[0][2] is handle:
+                self._cond.notify()
+        self._ensure_thread()
+        return handle
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _on_cancel(self):
+        # 呼叫端已持有 self._cond；_cancelled 只計還留在堆積裡的已取消項目
+        self._cancelled += 1
+        if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+            self._heap = [e for e in self._heap if not e[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._cond:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                    self._thread.start()
+
+    def _pop_due(self):
+        with self._cond:
+            while not self._stopped:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                when, _, handle = self._heap[0]
+                if handle.cancelled:
+                    heapq.heappop(self._heap)
+                    self._cancelled -= 1
+                    continue
+                delay = when - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                # 仍在鎖內標記為已執行：已離開堆積的項目不能再被取消，否則 _cancelled 會多算而提早整理
+                handle.cancelled = True
+                return handle
+            return None
+
+    def _run(self):
+        while True:
+            handle = self._pop_due()
+            if handle is None:
+                return
+            try:
+                handle.fn(*handle.args)
+            except Exception:
+                logger.exception("scheduled callback failed: %r", handle.fn)
+
+
+class AsyncioScheduler:
+    # asyncio 模式：逾時直接排在事件迴圈上，回呼在迴圈內執行，不另開執行緒。
+    # 回傳的 asyncio.TimerHandle 同樣提供 cancel()；只能在迴圈所在的執行緒呼叫。
+    def __init__(self, loop=None):
+        self._loop = loop
+
+    def call_later(self, delay, fn, *args):
+        loop = self._loop or asyncio.get_running_loop()
+        return loop.call_later(max(0.0, delay), self._run, fn, args)
+
+    def call_soon_threadsafe(self, fn, *args):
+        # 唯一可從其他執行緒呼叫的入口：交回事件迴圈執行
+        return self._loop.call_soon_threadsafe(self._run, fn, args)
+
+    def stop(self):
+        pass
+
+    @staticmethod
+    def _run(fn, args):
+        try:
+            fn(*args)
+        except Exception:
+            logger.exception("scheduled callback failed: %r", fn)
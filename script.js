@@ -1,16 +1,36 @@
+let lastLogSeq = null;
+let lastEtag = null;
+let logLines = [];
+
 async function refreshState() {
-  let res = await fetch("/state");
+  // 長輪詢：帶上次的 ETag，伺服器在狀態變動前不回應（最多 wait 秒），沒變動回 304
+  let url = lastLogSeq === null ? "/state?wait=25" : `/state?since=${lastLogSeq}&wait=25`;
+  let res = await fetch(url, { headers: lastEtag ? { "If-None-Match": lastEtag } : {} });
+  if (res.status === 304) return;
+  if (!res.ok) throw new Error(res.status);
+  lastEtag = res.headers.get("ETag");
   let state = await res.json();
 
   let playersDiv = document.getElementById("players");
   playersDiv.innerHTML = "<h2>玩家狀態</h2>";
   for (let [name, info] of Object.entries(state.players)) {
-    playersDiv.innerHTML += `<p>${name} - 分數: ${info.score} - 角色: ${info.roles.join(", ")}</p>`;
+    playersDiv.innerHTML += `<p>${name} - 分數: ${info.score} - 手牌: ${info.hand_count} 張</p>`;
   }
 
+  logLines = state.logs_reset ? state.logs : logLines.concat(state.logs).slice(-200);
+  lastLogSeq = state.log_seq;
   let logsDiv = document.getElementById("logs");
-  logsDiv.innerHTML = "<h2>遊戲紀錄</h2>" + state.logs.map(l => `<p>${l}</p>`).join("");
+  logsDiv.innerHTML = "<h2>遊戲紀錄</h2>" + logLines.map(l => `<p>${l}</p>`).join("");
+}
+
+async function pollState() {
+  for (;;) {
+    try {
+      await refreshState();
+    } catch (e) {
+      await new Promise(r => setTimeout(r, 2000));
+    }
+  }
 }
 
-setInterval(refreshState, 2000);
-refreshState();
+pollState();
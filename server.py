@@ -0,0 +1,33 @@
+import os
+import sys
+import argparse
+
+# ====== 伺服器入口 ======
+# app.py / asgi.py 在匯入時就建立 Socket.IO、排程器並連上匯流排。電腦玩家的行程池（forkserver / spawn）
+# 會在子行程以 __mp_main__ 重新執行啟動腳本：這個入口在模組層級只定義函數，伺服器在 main() 裡才匯入，
+# 子行程重跑它時什麼都不做，行程池只載入 bots。用法：
+#   python server.py            執行緒模式（Flask-SocketIO）
+#   python server.py --asgi     asyncio 模式（uvicorn）；也可以 uvicorn asgi:application --port 5000
+SERVER_PATH = os.path.abspath(__file__)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="啟動遊戲伺服器")
+    parser.add_argument("--asgi", action="store_true", help="asyncio 模式（只支援單一行程）")
+    args = parser.parse_args(argv)
+    port = int(os.environ.get("BIRTHDAY_PORT", "5000"))
+    if args.asgi:
+        import uvicorn
+        import asgi
+        uvicorn.run(asgi.application, host="0.0.0.0", port=port, ws="auto", log_level="info")
+    else:
+        import app
+        app.serve(port)
+    return 0
+
+def exec_main(*argv):
+    # 直接執行 app.py / asgi.py 時換成這個入口，讓 __main__ 不是伺服器模組本身
+    os.execv(sys.executable, [sys.executable, SERVER_PATH] + list(argv) + sys.argv[1:])
+
+if __name__ == "__main__":
+    sys.exit(main())
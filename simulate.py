@@ -0,0 +1,283 @@
+import sys
+import json
+import time
+import random
+import argparse
+import importlib
+from concurrent.futures import ProcessPoolExecutor
+
+import engine
+from engine import CARD_TYPES, GUARDIAN, GIFTER, ROLE_DISPLAY_NAMES
+from history import HistoryWriter
+
+# ====== 批次蒙地卡羅模擬器 ======
+# 直接驅動 engine 的指令函數，不經過 Socket；每個工作行程以自己的種子跑一批對局，
+# 回傳計數後在主行程合併。用法：
+#   python simulate.py -n 1000000 -w 8 --policies random,random,honest,bluffer
+# 加上 --history DIR 會把每局的出牌紀錄與結果寫成歷史庫（history.py），可再用 history.py 查詢。
+
+
+# ====== 玩家策略 ======
+# 策略需實作三個決策：choose_action / should_call / force_choice。
+class RandomPolicy:
+    def __init__(self, bluff_rate=0.2, call_rate=0.3, pass_rate=0.1):
+        self.bluff_rate = bluff_rate
+        self.call_rate = call_rate
+        self.pass_rate = pass_rate
+
+    def choose_action(self, state, me, rng):
+        hand = state["players"][me].roles.to_list()
+        others = [n for n in state["player_order"] if n != me]
+        if not others or rng.random() < self.pass_rate:
+            discard = rng.choice(hand) if hand and rng.random() < 0.5 else ""
+            return "end_turn_discard_draw", {"player": me, "discard_role": discard}
+        if not hand or rng.random() < self.bluff_rate:
+            role, is_bluff = rng.choice(CARD_TYPES[:4] + CARD_TYPES[5:]), True
+        else:
+            role, is_bluff = rng.choice(hand), False
+        data = {"player": me, "role": role, "target": rng.choice(others), "is_bluff": is_bluff}
+        if role == GIFTER:
+            if len(others) > 1 and rng.random() < 0.5:
+                second = rng.choice([n for n in others if n != data["target"]])
+                data["extra"] = {"mode": "B", "second_target": second}
+            else:
+                data["extra"] = {"mode": "A"}
+        elif role == GUARDIAN:
+            data["target"] = None
+        return "play_card", data
+
+    def should_call(self, state, me, prompt, rng):
+        return rng.random() < self.call_rate
+
+    def force_choice(self, state, me, rng):
+        hand = state["players"][me].roles.to_list()
+        if hand and rng.random() < 0.7:
+            return {"choice": "discard_one", "discard_role": rng.choice(hand)}
+        return {"choice": "lose_one"}
+
+
+POLICIES = {
+    "random": lambda: RandomPolicy(),
+    "honest": lambda: RandomPolicy(bluff_rate=0.0, call_rate=0.0),
+    "bluffer": lambda: RandomPolicy(bluff_rate=0.6, call_rate=0.1),
+    "skeptic": lambda: RandomPolicy(bluff_rate=0.1, call_rate=0.8),
+}
+
+def load_policy(spec):
+    # 內建名稱，或「模組:類別」形式的自訂策略
+    if spec in POLICIES:
+        return POLICIES[spec]()
+    module, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module), attr)()
+
+
+# ====== 統計 ======
+def new_stats():
+    return {
+        "games": 0,
+        "turns": 0,
+        "end_reasons": {},
+        "tie_breaks": 0,                # 第一名與第二名同分，需靠同分規則分出勝負
+        "policy_seats": {},
+        "policy_wins": {},
+        "cards": {c: {"plays": 0, "winner_plays": 0, "dealt": 0, "dealt_wins": 0,
+                      "bluffs": 0, "actor_delta": 0} for c in CARD_TYPES},
+        "bluff": {"count": 0, "called": 0, "payoff_called": 0, "payoff_uncalled": 0},
+        "honest": {"count": 0, "called": 0, "payoff_called": 0, "payoff_uncalled": 0},
+        "call": {"count": 0, "success": 0, "payoff": 0},
+    }
+
+def merge_stats(total, part):
+    for k, v in part.items():
+        if isinstance(v, dict):
+            merge_stats(total.setdefault(k, {}), v)
+        else:
+            total[k] = total.get(k, 0) + v
+    return total
+
+
+# ====== 單局 ======
+def play_game(policies, rng, stats, history=None):
+    state = engine.new_game_state("sim")
+    names = ["P%d" % i for i in range(len(policies))]
+    for name in names:
+        engine.join_game(state, {"player_name": name}, 0, rng)
+    seat_policy = dict(zip(names, policies))
+    now = 0.0
+    engine.start_game(state, None, now, rng)
+    players = state["players"]
+    dealt = {n: set(players[n].roles) for n in names}
+    plays = []      # (actor, role)
+
+    def run(cmd, data):
+        events = cmd(state, data, now, rng)
+        if history is not None:
+            # 模擬的對局依序進行，開局時間固定為 0 也不會混在一起
+            history.events("sim", 0.0, now, state["turn_index"], events)
+        return events
+
+    while state["game_started"]:
+        now += 1.0
+        actor = state["current_turn"]
+        policy, _ = seat_policy[actor]
+        kind, data = policy.choose_action(state, actor, rng)
+        events = run(engine.COMMANDS[kind], data)
+        rejected = bool(events) and events[0][0] == engine.REPLY
+        if rejected:
+            run(engine.end_turn_discard_draw, {"player": actor})
+        stats["turns"] += 1
+        if kind != "play_card" or rejected:
+            continue
+
+        role = data["role"]
+        plays.append((actor, role))
+        card = stats["cards"][role]
+        card["plays"] += 1
+        pid = state["pending_prompt_id"]
+        if pid:
+            prompt = state["pending_prompts"][pid]
+            target = prompt["target"]
+            bluff = not prompt["had_card"]
+            before_actor = players[actor].score
+            before_target = players[target].score
+            called = seat_policy[target][0].should_call(state, target, prompt, rng)
+            if called:
+                run(engine.call_bluff, {"prompt_id": pid, "player": target})
+            else:
+                run(engine.not_call_bluff, {"prompt_id": pid})
+            delta = players[actor].score - before_actor
+            card["actor_delta"] += delta
+            bucket = stats["bluff" if bluff else "honest"]
+            bucket["count"] += 1
+            if called:
+                bucket["called"] += 1
+                bucket["payoff_called"] += delta
+                stats["call"]["count"] += 1
+                stats["call"]["success"] += bluff
+                stats["call"]["payoff"] += players[target].score - before_target
+            else:
+                bucket["payoff_uncalled"] += delta
+            if bluff:
+                card["bluffs"] += 1
+        for name in list(state["force_choices"]):
+            answer = seat_policy[name][0].force_choice(state, name, rng)
+            answer["player"] = name
+            run(engine.force_choice_answer, answer)
+
+    results = engine.ranking(state)
+    winner = results[0]["player"]
+    reason = list(state["logs"])[-1] if len(state["logs"]) else ""
+    stats["games"] += 1
+    stats["end_reasons"][reason] = stats["end_reasons"].get(reason, 0) + 1
+    if len(results) > 1 and results[0]["score"] == results[1]["score"]:
+        stats["tie_breaks"] += 1
+    for name in names:
+        pname = seat_policy[name][1]
+        stats["policy_seats"][pname] = stats["policy_seats"].get(pname, 0) + 1
+        for role in dealt[name]:
+            stats["cards"][role]["dealt"] += 1
+            if name == winner:
+                stats["cards"][role]["dealt_wins"] += 1
+    wname = seat_policy[winner][1]
+    stats["policy_wins"][wname] = stats["policy_wins"].get(wname, 0) + 1
+    for actor, role in plays:
+        if actor == winner:
+            stats["cards"][role]["winner_plays"] += 1
+
+
+def run_batch(args):
+    specs, n_games, seed, history_dir = args
+    rng = random.Random(seed)
+    policies = [(load_policy(s), s) for s in specs]
+    stats = new_stats()
+    history = HistoryWriter(history_dir) if history_dir else None
+    for _ in range(n_games):
+        play_game(policies, rng, stats, history)
+    if history:
+        history.flush()
+    return stats
+
+def simulate(n_games, specs, seed=0, workers=1, batch_size=20000, history_dir=None):
+    batches = []
+    remaining, i = n_games, 0
+    while remaining > 0:
+        n = min(batch_size, remaining)
+        batches.append((specs, n, seed * 1000003 + i, history_dir))
+        remaining -= n
+        i += 1
+    total = new_stats()
+    if workers <= 1:
+        for b in batches:
+            merge_stats(total, run_batch(b))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for part in pool.map(run_batch, batches):
+                merge_stats(total, part)
+    return total
+
+
+# ====== 報表 ======
+def ratio(a, b):
+    return round(a / b, 4) if b else None
+
+def summarize(stats):
+    games = stats["games"]
+    cards = {}
+    for role, c in stats["cards"].items():
+        cards[ROLE_DISPLAY_NAMES[role]] = {
+            "card": role.strip("\ufe0f "),
+            "plays_per_game": ratio(c["plays"], games),
+            "play_win_rate": ratio(c["winner_plays"], c["plays"]),      # 這張牌的出牌中由最終贏家打出的比例
+            "dealt_win_rate": ratio(c["dealt_wins"], c["dealt"]),       # 起手有這張牌的玩家勝率
+            "bluff_share": ratio(c["bluffs"], c["plays"]),
+            "avg_actor_delta": ratio(c["actor_delta"], c["plays"]),
+        }
+    def payoff(b):
+        return {
+            "count": b["count"],
+            "called_rate": ratio(b["called"], b["count"]),
+            "avg_payoff_called": ratio(b["payoff_called"], b["called"]),
+            "avg_payoff_uncalled": ratio(b["payoff_uncalled"], b["count"] - b["called"]),
+        }
+    return {
+        "games": games,
+        "avg_turns": ratio(stats["turns"], games),
+        "tie_break_rate": ratio(stats["tie_breaks"], games),
+        "end_reasons": stats["end_reasons"],
+        "policy_win_rate": {p: ratio(stats["policy_wins"].get(p, 0), n) for p, n in stats["policy_seats"].items()},
+        "cards": cards,
+        "bluff": payoff(stats["bluff"]),
+        "honest": payoff(stats["honest"]),
+        "call": {
+            "count": stats["call"]["count"],
+            "success_rate": ratio(stats["call"]["success"], stats["call"]["count"]),
+            "avg_payoff": ratio(stats["call"]["payoff"], stats["call"]["count"]),
+        },
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="壽星陰謀卡牌平衡模擬")
+    parser.add_argument("-n", "--games", type=int, default=10000)
+    parser.add_argument("-w", "--workers", type=int, default=1)
+    parser.add_argument("--policies", default="random,random,random,random",
+                        help="以逗號分隔，每個座位一個策略（2–6 人）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=20000)
+    parser.add_argument("--json", help="結果另存為 JSON 檔")
+    parser.add_argument("--history", help="把每局紀錄寫入這個歷史庫目錄（供 history.py 查詢）")
+    args = parser.parse_args(argv)
+
+    specs = args.policies.split(",")
+    if not 2 <= len(specs) <= engine.MAX_PLAYERS:
+        parser.error("需要 2–6 個策略")
+    t0 = time.perf_counter()
+    report = summarize(simulate(args.games, specs, args.seed, args.workers, args.batch_size, args.history))
+    report["elapsed_sec"] = round(time.perf_counter() - t0, 2)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,831 @@
+const roomId = new URLSearchParams(window.location.search).get('room') || 'main';
+// ?watch=1：觀戰模式，只收延遲後的公開狀態
+const watching = new URLSearchParams(window.location.search).get('watch') === '1';
+
+// 精簡線路編碼：伺服器支援且 MessagePack 載入成功時協商使用，否則維持 JSON
+const wireTable = pageConfig.wireTable;
+const useCompact = !!(wireTable && window.MessagePack);
+const wireCardFields = new Set(wireTable ? wireTable.card_fields : []);
+const wireNameMaps = new Set(wireTable ? wireTable.name_maps : []);
+function wireCard(id) { return typeof id === 'number' ? wireTable.cards[id] : id; }
+function expandWire(obj, key) {
+  if (Array.isArray(obj)) return wireCardFields.has(key) ? obj.map(wireCard) : obj.map(v => expandWire(v));
+  if (obj && typeof obj === 'object') {
+    const out = {};
+    const nameMap = wireNameMaps.has(key);
+    Object.entries(obj).forEach(([k, v]) => {
+      out[nameMap ? k : (wireTable.keys[k] || k)] = expandWire(v, nameMap ? undefined : k);
+    });
+    return out;
+  }
+  return wireCardFields.has(key) ? wireCard(obj) : obj;
+}
+function fromWire(data) {
+  if (data instanceof ArrayBuffer || ArrayBuffer.isView(data)) return expandWire(MessagePack.decode(data));
+  return data;
+}
+
+// 重連續玩：加入後伺服器發的憑證存在 sessionStorage；重連時帶上憑證與最後收到的房間事件序號
+const sessionKey = `birthday-session:${roomId}`;
+let session = watching ? null : JSON.parse(sessionStorage.getItem(sessionKey) || 'null');
+let lastEventSeq = null;
+let acceptedSeq = null;
+const query = { room: roomId, enc: useCompact ? 'msgpack' : 'json' };
+if (watching) query.role = 'spectator';
+else if (session) query.resume = session.token;
+
+const socket = io(window.location.origin, {
+  path: '/socket.io/',
+  query,
+  transports: ['websocket','polling'],
+  timeout: 20000,
+  withCredentials: true,
+});
+// 所有事件先還原精簡編碼，其餘處理函數不需改動
+// 房間事件的第二個參數是序號：重複的（重連補送與即時事件重疊）略過，跳號時要求完整狀態
+socket.onAny((event, data, seq) => {
+  if (typeof seq !== 'number') return;
+  if (lastEventSeq !== null && seq <= lastEventSeq) { acceptedSeq = null; return; }
+  if (lastEventSeq !== null && seq > lastEventSeq + 1) socket.emit('request_full_state');
+  lastEventSeq = acceptedSeq = seq;
+});
+const socketOn = socket.on.bind(socket);
+socket.on = (event, fn) => socketOn(event, (data, ...rest) => {
+  if (typeof rest[0] === 'number' && rest[0] !== acceptedSeq) return;
+  fn(fromWire(data), ...rest);
+});
+socket.io.on('reconnect_attempt', () => {
+  if (session) {
+    socket.io.opts.query.resume = session.token;
+    if (lastEventSeq !== null) socket.io.opts.query.seq = lastEventSeq;
+  }
+});
+
+// 遊戲指令帶 cmd_id：伺服器對同一個 ID 只執行一次（連點、重送）
+const cmdPrefix = Math.random().toString(36).slice(2, 10);
+let cmdSeq = 0;
+function sendCommand(event, payload, key) {
+  payload.cmd_id = key ? `${event}:${key}:${currentPlayer}` : `${cmdPrefix}-${++cmdSeq}`;
+  socket.emit(event, payload);
+}
+
+let currentPlayer = '';
+let currentGameState = null;
+let selectedCard = null;
+let pendingPrompt = null;
+let countdownInterval = null;
+let countdownTimeout = null;
+let lastAction = null;
+let lastPrompt = null;
+let myHandCards = [];
+let forceInterval = null, forceTimeout = null;
+let timerTick = null;
+
+// 卡牌 → { thumb: {avif, webp, png}, full: {...} }，由伺服器依資產清單產生
+const cardImages = pageConfig.cardImages;
+const supportsWebP = document.createElement('canvas').toDataURL('image/webp').startsWith('data:image/webp');
+const roleDisplayNames = {
+  " 壽星": "斬魂米娜",
+  " 小丑": "海賊王",
+  " 贈禮者": "假純愛戰士",
+  "️ 偵探": "小菊獸",
+  " 守護者": "烈焰雯の魂",
+  " 狙擊手": "祖濕爺"
+};
+const cardEffects = {
+  " 壽星": "偷看目標 + 對該目標本回合你的第一張攻擊額外 -1",
+  " 小丑": "目標 -2，自己 -1（被斬魂米娜標記則至多 -3）",
+  " 贈禮者": "A: 自 +1、目標 -1；B: 兩個不同目標各 -1（不自補）",
+  "️ 偵探": "公開目標一張牌，並強制其丟1張或 -1 分（5秒）",
+  " 守護者": "下次針對自己的攻擊無效，反擊；擋祖濕爺反擊 -2",
+  " 狙擊手": "目標 -3、自己 -1；目標分數>80 時改 -2"
+};
+const cardTypes = {
+  " 壽星": "技能卡",
+  " 小丑": "攻擊卡",
+  " 贈禮者": "攻擊卡",
+  "️ 偵探": "技能卡",
+  " 守護者": "防禦卡",
+  " 狙擊手": "攻擊卡"
+};
+const cardCosts = { " 壽星": 1, " 小丑": 2, " 贈禮者": 1, "️ 偵探": 1, " 守護者": 1, " 狙擊手": 3 };
+
+window.addEventListener('load', async () => {
+  if (watching) return;   // 觀戰畫面只用延遲後的 spectator_state
+  try {
+    const res = await fetch(`/state?room=${encodeURIComponent(roomId)}`);
+    const state = await res.json();
+    handleGameState(state);
+  } catch {}
+});
+window.addEventListener('resize', () => layoutHand());
+
+// 重連時由伺服器依連線帶的憑證綁回座位（見 session），不再以名稱要求手牌
+socket.on('connect', () => updateConnectionStatus(true));
+socket.on('disconnect', () => updateConnectionStatus(false));
+socket.on('connect_error', (err) => {
+  console.error('connect_error', err);
+  updateConnectionStatus(false);
+});
+socket.on('reconnect_attempt', () => updateConnectionStatus(false));
+
+socket.on('game_started', (d) => {
+  showNotification(d.message, 'success');
+  document.getElementById('waitingArea').classList.remove('show');
+  document.getElementById('gameArea').classList.add('show');
+});
+socket.on('game_state', (state) => {
+  if (typeof state.event_seq === 'number') lastEventSeq = Math.max(lastEventSeq ?? -1, state.event_seq);
+  handleGameState(state);
+});
+socket.on('session', (d) => {
+  if (!d.token) {
+    session = null;
+    sessionStorage.removeItem(sessionKey);
+    delete socket.io.opts.query.resume;
+    delete socket.io.opts.query.seq;
+    return;
+  }
+  session = { token: d.token, player: d.player };
+  sessionStorage.setItem(sessionKey, JSON.stringify(session));
+  if (!currentPlayer) {
+    currentPlayer = d.player;
+    document.getElementById('joinForm').style.display = 'none';
+    if (!(currentGameState && currentGameState.game_started)) document.getElementById('waitingArea').classList.add('show');
+  }
+});
+socket.on('game_state_patch', (patch) => applyStatePatch(patch));
+socket.on('spectator_state', (view) => {
+  const state = Object.assign({}, view);
+  const logs = view.logs_reset ? [] : ((currentGameState && currentGameState.logs) || []);
+  state.logs = logs.concat(view.logs_new || []).slice(-200);
+  handleGameState(state);
+});
+socket.on('my_cards', (data) => {
+  myHandCards = data.cards || [];
+  displayMyCards(myHandCards);
+});
+socket.on('player_joined', (d) => showNotification(`${d.player} 加入了遊戲 (${d.total_players}/6)`, 'success'));
+socket.on('bot_takeover', (d) => showNotification(`${d.player} 斷線，由電腦代打`, 'warning'));
+socket.on('player_left', (d) => showNotification(`${d.player} 離開了遊戲`, 'warning'));
+socket.on('error', (d) => showNotification(d.message, 'error'));
+
+socket.on('game_over', (d) => {
+  stopClientTimer();
+  const modal = document.getElementById('gameOverModal');
+  document.getElementById('gameOverReason').textContent = `原因：${d.reason || '條件達成'}`;
+  const box = document.getElementById('gameOverList');
+  box.innerHTML = '';
+  (d.results || []).forEach((r, idx) => {
+    const div = document.createElement('div');
+    div.style.background = 'rgba(0,0,0,.5)';
+    div.style.border = '1px solid #34495e';
+    div.style.borderRadius = '10px';
+    div.style.padding = '10px';
+    div.innerHTML = `
+      <div style="display:flex;justify-content:space-between;align-items:center;">
+        <div style="font-weight:bold;">#${idx+1} ${r.player}</div>
+        <div style="color:#e74c3c;font-weight:bold;">分數：${r.score}</div>
+      </div>
+      <div style="margin-top:6px;font-size:13px;opacity:.9;">
+        成功拆穿：${r.call_bluff_success}　成功虛張：${r.bluff_success}　剩餘手牌：${r.hand_count}
+      </div>
+    `;
+    box.appendChild(div);
+  });
+  modal.style.display = 'block';
+});
+
+// 拆穿
+socket.on('bluff_challenge', onChallengePrompt);
+socket.on('bluff_result', (data) => {
+  clearChallengeTimers();
+  hideBluffConfirmation();
+
+  const info = lastPrompt || lastAction;
+  if (info) {
+    const succeeded = data && data.message && (data.message.includes('行動生效') || data.message.includes('效果生效'));
+    triggerCardFX(info.attacker, info.target, info.role, succeeded);
+  }
+  lastPrompt = null; lastAction = null;
+
+  showNotification(data.message, data.success ? 'success' : 'error');
+});
+
+// 偵探強制選擇（前端倒數顯示）
+socket.on('force_choice', (data) => {
+  openForceChoiceModal(data.timeout_ms || 5000);
+});
+
+function onChallengePrompt(data) {
+  if (!data || data.target !== currentPlayer) return;
+  pendingPrompt = data;
+  lastPrompt = { attacker: data.player, role: data.role, target: data.target };
+  showBluffConfirmation(data);
+  startChallengeCountdown(typeof data.timeout_ms === 'number' ? data.timeout_ms : 5000);
+}
+
+// 卡圖：<picture> 讓瀏覽器自行挑選 AVIF/WebP，否則退回 PNG
+function cardPictureHTML(card, variant, cls, alt) {
+  const v = (cardImages[card] || {})[variant];
+  if (!v) return '';
+  const sources = ['avif', 'webp'].filter(f => v[f])
+    .map(f => `<source type="image/${f}" srcset="${v[f]}">`).join('');
+  return `<picture>${sources}<img src="${v.png}" alt="${alt}" class="${cls}" decoding="async"></picture>`;
+}
+function cardImageURL(card, variant) {
+  const v = (cardImages[card] || {})[variant];
+  if (!v) return '';
+  return (supportsWebP && v.webp) || v.png;
+}
+
+// 狀態處理與回合/倒數
+function handleGameState(state) {
+  if (!state) return;
+  currentGameState = state;
+
+  renderWaitingArea(state);
+  updateTurnIndicator(state.current_turn);
+  updateRoundAndTimer(state);
+
+  const me = state.players ? state.players[currentPlayer] : null;
+  updatePlayerInfo(me);
+  updateEnemiesInfo(state.players || {}, state.current_turn);
+  displayLogs(state.logs || []);
+
+  if (state.game_started && currentPlayer) {
+    document.getElementById('openBluffButton').style.display =
+      state.current_turn === currentPlayer ? 'inline-block' : 'none';
+  }
+
+  const isAdmin = (currentPlayer || '').toLowerCase() === 'admin';
+  const adminTools = document.getElementById('adminTools');
+  if (adminTools) adminTools.style.display = isAdmin ? 'block' : 'none';
+
+  requestAnimationFrame(layoutHand);
+}
+
+// 差異更新：版本不連續時向伺服器要求完整狀態
+function applyStatePatch(patch) {
+  if (!currentGameState || currentGameState.version !== patch.base) {
+    socket.emit('request_full_state');
+    return;
+  }
+  const state = Object.assign({}, currentGameState, patch.set || {});
+  (patch.unset || []).forEach(key => { delete state[key]; });
+  if (patch.players || patch.players_removed) {
+    const players = Object.assign({}, state.players);
+    Object.entries(patch.players || {}).forEach(([name, fields]) => {
+      players[name] = Object.assign({}, players[name], fields);
+    });
+    (patch.players_removed || []).forEach(name => { delete players[name]; });
+    state.players = players;
+  }
+  if (patch.logs_reset) {
+    state.logs = patch.logs_new || [];
+  } else if (patch.logs_new) {
+    state.logs = (state.logs || []).concat(patch.logs_new).slice(-200);
+  }
+  state.version = patch.v;
+  if (patch.log_seq !== undefined) state.log_seq = patch.log_seq;
+  state.time_remaining_ms = patch.time_remaining_ms;
+  handleGameState(state);
+}
+
+function updateRoundAndTimer(state) {
+  const rEl = document.getElementById('roundInfo');
+  const tEl = document.getElementById('timerInfo');
+  if (rEl) rEl.textContent = `第 ${state.round_number || 0}/${state.max_rounds || 3} 輪`;
+  if (tEl) startClientTimer(state.time_remaining_ms);
+}
+
+function formatMMSS(ms) {
+  if (ms == null) return "--:--";
+  const sec = Math.max(0, Math.floor(ms/1000));
+  const m = Math.floor(sec/60), s = sec%60;
+  return `${String(m).padStart(2,'0')}:${String(s).padStart(2,'0')}`;
+}
+function startClientTimer(ms) {
+  stopClientTimer();
+  const timerEl = document.getElementById('timerInfo');
+  let remain = typeof ms === 'number' ? ms : 0;
+  timerEl.textContent = `剩餘 ${formatMMSS(remain)}`;
+  timerTick = setInterval(() => {
+    remain -= 1000;
+    if (remain < 0) remain = 0;
+    timerEl.textContent = `剩餘 ${formatMMSS(remain)}`;
+  }, 1000);
+}
+function stopClientTimer() {
+  if (timerTick) clearInterval(timerTick);
+  timerTick = null;
+}
+
+// 連線與加入
+function updateConnectionStatus(connected) {
+  const status = document.getElementById('connectionStatus');
+  status.className = 'connection-status ' + (connected ? 'connected' : 'disconnected');
+  status.innerHTML = `<i class="fas fa-wifi"></i> ${connected ? '已連線' : '連線中...'}`;
+}
+function joinGame() {
+  const playerName = document.getElementById('playerNameInput').value.trim();
+  if (!playerName) return showNotification('請輸入玩家名稱', 'error');
+  currentPlayer = playerName;
+  socket.emit('join_game', { player_name: playerName });
+  document.getElementById('joinForm').style.display = 'none';
+  document.getElementById('waitingArea').classList.add('show');
+}
+function startGame() { socket.emit('start_game'); }
+function addBot() { socket.emit('add_bot'); }
+
+function renderWaitingArea(state) {
+  const list = document.getElementById('playersList');
+  list.innerHTML = '';
+  const players = Object.keys(state.players || {});
+  players.forEach(name => {
+    const div = document.createElement('div');
+    div.className = 'player-item';
+    div.textContent = name;
+    list.appendChild(div);
+  });
+  const btn = document.getElementById('startGameButton');
+  btn.disabled = players.length < 2;
+  if (state.game_started) {
+    document.getElementById('waitingArea').classList.remove('show');
+    document.getElementById('gameArea').classList.add('show');
+  }
+}
+
+// 介面資訊
+function updatePlayerInfo(player) {
+  document.getElementById('playerName').textContent = currentPlayer || '玩家';
+  document.getElementById('playerScore').textContent = player ? player.score : 100;
+  document.getElementById('playerHealth').textContent = player ? player.score : 100;
+  document.getElementById('playerCardsCount').textContent = player ? player.hand_count : 0;
+}
+function updateEnemiesInfo(players, currentTurn) {
+  const enemiesList = document.getElementById('enemiesList');
+  enemiesList.innerHTML = '';
+  Object.keys(players).forEach(name => {
+    if (name === currentPlayer) return;
+    const p = players[name];
+    const div = document.createElement('div');
+    if (name === currentTurn) div.className = 'player-info current-turn';
+    else div.className = 'player-info';
+    div.innerHTML = `
+      <div class="player-name"><i class="fas fa-user"></i>${name}</div>
+      <div class="player-score"><i class="fas fa-heart"></i>${p.score}</div>
+      <div class="player-cards-count"><i class="fas fa-clone"></i>${p.hand_count || 0}</div>
+    `;
+    enemiesList.appendChild(div);
+  });
+}
+function updateTurnIndicator(currentTurn) {
+  const turnText = document.getElementById('turnText');
+  if (currentTurn === currentPlayer) {
+    turnText.innerHTML = '<i class="fas fa-star"></i> 輪到你了！';
+    turnText.style.color = '#4caf50';
+  } else if (currentTurn) {
+    turnText.innerHTML = `<i class="fas fa-clock"></i> 等待 ${currentTurn} 行動...`;
+    turnText.style.color = '#ff6b6b';
+  } else {
+    turnText.innerHTML = '等待遊戲開始...';
+    turnText.style.color = '#bdc3c7';
+  }
+}
+
+// 手牌與選擇
+function displayMyCards(cards) {
+  const myCards = document.getElementById('myCards');
+  myCards.innerHTML = '';
+  if (!cards || cards.length === 0) {
+    myCards.innerHTML = '<div style="text-align:center;color:#7f8c8d;padding:20px;">沒有手牌</div>';
+    layoutHand();
+    return;
+  }
+  cards.forEach((card) => {
+    const div = document.createElement('div');
+    div.className = 'card';
+    div.onclick = () => selectCard(card, div);
+    div.ondblclick = () => showCardModal(card);
+    const displayName = roleDisplayNames[card] || card;
+    const picture = cardPictureHTML(card, 'thumb', 'card-image', displayName);
+    const effect = cardEffects[card] || '';
+    const type = cardTypes[card] || '';
+    const cost = cardCosts[card] || 0;
+    div.innerHTML = `
+      <div class="card-cost">${cost}</div>
+      ${picture}
+      <div class="card-name">${displayName}</div>
+      <div class="card-type">${type}</div>
+      <div class="card-effect">${effect}</div>
+    `;
+    myCards.appendChild(div);
+  });
+  layoutHand();
+}
+function layoutHand() {
+  const container = document.getElementById('myCards');
+  if (!container) return;
+  const cards = Array.from(container.querySelectorAll('.card'));
+  const n = cards.length;
+  if (n === 0) return;
+
+  const isNarrow = window.matchMedia('(max-width: 768px)').matches;
+  const maxTotalAngle = isNarrow ? Math.min(50, 6 * n) : Math.min(70, 8 * n);
+  const angleStep = n > 1 ? maxTotalAngle / (n - 1) : 0;
+  const startAngle = -maxTotalAngle / 2;
+  const mid = (n - 1) / 2;
+  const baseLift = isNarrow ? 24 : 30;
+  const liftDecay = isNarrow ? 5 : 6;
+  const xSpread = isNarrow ? 8 : 10;
+
+  cards.forEach((card, i) => {
+    const angle = startAngle + i * angleStep;
+    const dx = (i - mid) * xSpread;
+    const lift = Math.max(0, baseLift - Math.abs(i - mid) * liftDecay);
+    card.style.setProperty('--pose', `translateX(${dx}px) translateY(${-lift}px) rotate(${angle}deg)`);
+    card.style.zIndex = String(100 + i);
+  });
+}
+function selectCard(card, element) {
+  document.querySelectorAll('.card').forEach(c => c.classList.remove('selected'));
+  element.classList.add('selected');
+  selectedCard = card;
+  showTargetSelection();
+}
+function showTargetSelection() {
+  if (!currentGameState) return;
+  const targetSel = document.getElementById('targetSelection');
+  const targetSelect = document.getElementById('targetSelect');
+  const giftBox = document.getElementById('giftModeBox');
+  const giftSecondRow = document.getElementById('giftSecondTargetRow');
+  const giftSecondSelect = document.getElementById('giftSecondTargetSelect');
+
+  targetSel.style.display = 'block';
+  document.getElementById('bluffSelection').style.display = 'none';
+
+  targetSelect.innerHTML = '<option value="">請選擇目標</option>';
+  giftSecondSelect.innerHTML = '<option value="">請選擇第二目標</option>';
+
+  Object.keys(currentGameState.players || {}).forEach(name => {
+    if (name !== currentPlayer) {
+      const opt = document.createElement('option');
+      opt.value = name; opt.textContent = name;
+      targetSelect.appendChild(opt);
+
+      const opt2 = document.createElement('option');
+      opt2.value = name; opt2.textContent = name;
+      giftSecondSelect.appendChild(opt2);
+    }
+  });
+
+  if (selectedCard === ' 贈禮者') {
+    giftBox.style.display = 'block';
+  } else {
+    giftBox.style.display = 'none';
+    giftSecondRow.style.display = 'none';
+  }
+
+  document.querySelectorAll('input[name="giftMode"]').forEach(r => {
+    r.onchange = () => {
+      if (r.value === 'B' && r.checked) {
+        giftSecondRow.style.display = 'inline-block';
+      } else if (r.value === 'A' && r.checked) {
+        giftSecondRow.style.display = 'none';
+      }
+      refreshPlayButtonEnable();
+    };
+  });
+
+  targetSelect.onchange = refreshPlayButtonEnable;
+  giftSecondSelect.onchange = refreshPlayButtonEnable;
+
+  function refreshPlayButtonEnable() {
+    const mode = (document.querySelector('input[name="giftMode"]:checked') || {}).value || 'A';
+    const t1 = targetSelect.value;
+    const t2 = giftSecondSelect.value;
+    let enable = !!t1;
+    if (selectedCard === ' 贈禮者' && mode === 'B') {
+      enable = enable && !!t2 && t1 !== t2;
+    }
+    document.getElementById('playButton').disabled = !enable;
+  }
+  document.getElementById('playButton').disabled = true;
+}
+function playSelectedCard() {
+  const target = document.getElementById('targetSelect').value;
+  if (!selectedCard || !target) return;
+
+  let extra = undefined;
+  if (selectedCard === ' 贈禮者') {
+    const mode = (document.querySelector('input[name="giftMode"]:checked') || {}).value || 'A';
+    if (mode === 'B') {
+      const second_target = document.getElementById('giftSecondTargetSelect').value;
+      if (!second_target || second_target === target) {
+        showNotification('模式B需要不同的第二目標', 'error');
+        return;
+      }
+      extra = { mode: 'B', second_target };
+    } else {
+      extra = { mode: 'A' };
+    }
+  }
+
+  lastAction = { attacker: currentPlayer, role: selectedCard, target };
+  sendCommand('play_card', { player: currentPlayer, role: selectedCard, target, is_bluff: false, extra });
+  hideAllSelections();
+  selectedCard = null;
+}
+function cancelCardSelection() { hideAllSelections(); selectedCard = null; }
+
+// 虛張
+function openBluffUI() {
+  if (!currentGameState) return;
+  const bluffSel = document.getElementById('bluffSelection');
+  const bluffCardSelect = document.getElementById('bluffCardSelect');
+  const bluffTargetSelect = document.getElementById('bluffTargetSelect');
+  const giftBoxB = document.getElementById('giftModeBoxBluff');
+  const giftRowB = document.getElementById('giftSecondTargetRowBluff');
+  const giftSecondB = document.getElementById('giftSecondTargetSelectBluff');
+
+  bluffSel.style.display = 'block';
+  document.getElementById('targetSelection').style.display = 'none';
+
+  bluffCardSelect.innerHTML = '<option value="">請選擇卡片</option>';
+  Object.keys(roleDisplayNames)
+    .filter(card => card !== ' 守護者')
+    .forEach(card => {
+      const opt = document.createElement('option');
+      opt.value = card; opt.textContent = roleDisplayNames[card];
+      bluffCardSelect.appendChild(opt);
+    });
+
+  bluffTargetSelect.innerHTML = '<option value="">請選擇目標</option>';
+  giftSecondB.innerHTML = '<option value="">請選擇第二目標</option>';
+  Object.keys(currentGameState.players || {}).forEach(name => {
+    if (name !== currentPlayer) {
+      const opt1 = document.createElement('option');
+      opt1.value = name; opt1.textContent = name;
+      bluffTargetSelect.appendChild(opt1);
+      const opt2 = document.createElement('option');
+      opt2.value = name; opt2.textContent = name;
+      giftSecondB.appendChild(opt2);
+    }
+  });
+
+  const refresh = () => {
+    const card = bluffCardSelect.value;
+    const t1 = bluffTargetSelect.value;
+    let ok = !!card && !!t1;
+    if (card === ' 贈禮者') {
+      giftBoxB.style.display = 'block';
+      const mode = (document.querySelector('input[name="giftModeBluff"]:checked') || {}).value || 'A';
+      if (mode === 'B') {
+        giftRowB.style.display = 'inline-block';
+        const t2 = giftSecondB.value;
+        ok = ok && !!t2 && t1 !== t2;
+      } else {
+        giftRowB.style.display = 'none';
+      }
+    } else {
+      giftBoxB.style.display = 'none';
+      giftRowB.style.display = 'none';
+    }
+    document.getElementById('confirmBluffButton').disabled = !ok;
+  };
+
+  bluffCardSelect.onchange = refresh;
+  bluffTargetSelect.onchange = refresh;
+  document.querySelectorAll('input[name="giftModeBluff"]').forEach(r => r.onchange = refresh);
+  giftSecondB.onchange = refresh;
+  refresh();
+}
+function confirmBluff() {
+  const bluffCard = document.getElementById('bluffCardSelect').value;
+  const bluffTarget = document.getElementById('bluffTargetSelect').value;
+  if (!bluffCard || !bluffTarget) return;
+
+  let extra = undefined;
+  if (bluffCard === ' 贈禮者') {
+    const mode = (document.querySelector('input[name="giftModeBluff"]:checked') || {}).value || 'A';
+    if (mode === 'B') {
+      const second_target = document.getElementById('giftSecondTargetSelectBluff').value;
+      if (!second_target || second_target === bluffTarget) {
+        showNotification('模式B需要不同的第二目標', 'error');
+        return;
+      }
+      extra = { mode: 'B', second_target };
+    } else {
+      extra = { mode: 'A' };
+    }
+  }
+
+  lastAction = { attacker: currentPlayer, role: bluffCard, target: bluffTarget };
+  sendCommand('play_card', { player: currentPlayer, role: bluffCard, target: bluffTarget, is_bluff: true, extra });
+  hideAllSelections();
+  showNotification(`已對 ${bluffTarget} 發動 ${roleDisplayNames[bluffCard] || bluffCard}（虛張聲勢）`, 'warning');
+}
+function cancelBluff() { hideAllSelections(); }
+
+// 拆穿提示
+function showBluffConfirmation(data) {
+  const box = document.getElementById('bluffConfirmation');
+  const text = document.getElementById('bluffConfirmationText');
+  const roleName = roleDisplayNames[data.role] || data.role;
+  text.textContent = `${data.player} 對你使用了 ${roleName}，是否揭穿虛張聲勢？`;
+  box.style.display = 'block';
+}
+function hideBluffConfirmation() {
+  clearChallengeTimers();
+  document.getElementById('bluffConfirmation').style.display = 'none';
+}
+function callBluff() {
+  if (!pendingPrompt) return;
+  sendCommand('call_bluff', { prompt_id: pendingPrompt.prompt_id, player: currentPlayer }, pendingPrompt.prompt_id);
+  hideBluffConfirmation();
+  pendingPrompt = null;
+}
+function notCallBluff() {
+  if (!pendingPrompt) return;
+  sendCommand('not_call_bluff', { prompt_id: pendingPrompt.prompt_id, player: currentPlayer }, pendingPrompt.prompt_id);
+  hideBluffConfirmation();
+  pendingPrompt = null;
+}
+function startChallengeCountdown(ms) {
+  clearChallengeTimers();
+  const timerEl = document.getElementById('bluffTimer');
+  let remain = ms;
+  timerEl.textContent = (remain / 1000).toFixed(1);
+  countdownInterval = setInterval(() => {
+    remain -= 100;
+    if (remain < 0) remain = 0;
+    timerEl.textContent = (remain / 1000).toFixed(1);
+  }, 100);
+  countdownTimeout = setTimeout(() => { notCallBluff(); }, ms);
+}
+function clearChallengeTimers() {
+  if (countdownInterval) clearInterval(countdownInterval);
+  if (countdownTimeout) clearTimeout(countdownTimeout);
+  countdownInterval = null; countdownTimeout = null;
+}
+
+// 雜項
+function hideAllSelections() {
+  document.getElementById('targetSelection').style.display = 'none';
+  document.getElementById('bluffSelection').style.display = 'none';
+  document.querySelectorAll('.card').forEach(c => c.classList.remove('selected'));
+}
+function displayLogs(logs) {
+  const box = document.getElementById('gameLogs');
+  box.innerHTML = '';
+  (logs || []).forEach(line => {
+    const d = document.createElement('div');
+    d.className = 'log-entry';
+    d.textContent = line;
+    box.appendChild(d);
+  });
+  box.scrollTop = box.scrollHeight;
+}
+
+// 卡片放大
+function showCardModal(card) {
+  const modal = document.getElementById('cardModal');
+  const displayName = roleDisplayNames[card] || card;
+  document.getElementById('modalCardImage').src = cardImageURL(card, 'full');
+  document.getElementById('modalCardImage').alt = displayName;
+  document.getElementById('modalCardName').textContent = displayName;
+  document.getElementById('modalCardType').textContent = cardTypes[card] || '';
+  document.getElementById('modalCardEffect').textContent = cardEffects[card] || '';
+  modal.style.display = 'block';
+}
+function closeCardModal() { document.getElementById('cardModal').style.display = 'none'; }
+window.addEventListener('keydown', (e) => { if (e.key === 'Escape') closeCardModal(); });
+document.getElementById('cardModal').addEventListener('click', (e) => { if (e.target.id === 'cardModal') closeCardModal(); });
+
+// 結束回合 / 棄1抽1
+function openEndTurnModal() {
+  if (!currentGameState || currentGameState.current_turn !== currentPlayer) {
+    return showNotification('現在不是你的回合', 'error');
+  }
+  const sel = document.getElementById('discardSelect');
+  sel.innerHTML = '<option value="">（不丟牌）</option>';
+  (myHandCards || []).forEach((c) => {
+    const opt = document.createElement('option');
+    opt.value = c;
+    opt.textContent = `${roleDisplayNames[c] || c}`;
+    sel.appendChild(opt);
+  });
+  document.getElementById('endTurnModal').style.display = 'block';
+}
+function closeEndTurnModal() { document.getElementById('endTurnModal').style.display = 'none'; }
+function submitEndTurn(withDiscard) {
+  const discard_role = withDiscard ? document.getElementById('discardSelect').value : '';
+  sendCommand('end_turn_discard_draw', { player: currentPlayer, discard_role });
+  closeEndTurnModal();
+}
+
+// 偵探 強制選擇
+function openForceChoiceModal(timeoutMs) {
+  const sel = document.getElementById('forceDiscardSelect');
+  sel.innerHTML = '<option value="">選擇要丟的手牌</option>';
+  (myHandCards || []).forEach((c) => {
+    const opt = document.createElement('option');
+    opt.value = c;
+    opt.textContent = `${roleDisplayNames[c] || c}`;
+    sel.appendChild(opt);
+  });
+
+  const modal = document.getElementById('forceChoiceModal');
+  modal.style.display = 'block';
+
+  clearForceTimers();
+  const timerEl = document.getElementById('forceTimer');
+  let remain = timeoutMs || 5000;
+  timerEl.textContent = (remain/1000).toFixed(1);
+  forceInterval = setInterval(() => {
+    remain -= 100;
+    if (remain < 0) remain = 0;
+    timerEl.textContent = (remain/1000).toFixed(1);
+  }, 100);
+  forceTimeout = setTimeout(() => { closeForceChoiceModal(); }, timeoutMs || 5000);
+}
+function closeForceChoiceModal() { clearForceTimers(); document.getElementById('forceChoiceModal').style.display = 'none'; }
+function clearForceTimers() { if (forceInterval) clearInterval(forceInterval); if (forceTimeout) clearTimeout(forceTimeout); forceInterval = null; forceTimeout = null; }
+function answerForceChoice(choice) {
+  let payload = { player: currentPlayer, choice };
+  if (choice === 'discard_one') {
+    const pick = document.getElementById('forceDiscardSelect').value;
+    if (!pick) return showNotification('請先選擇要丟的手牌', 'error');
+    payload.discard_role = pick;
+  }
+  sendCommand('force_choice_answer', payload);
+  closeForceChoiceModal();
+}
+
+// 動畫
+function findPanelByName(name){
+  if (!name) return null;
+  if (name === currentPlayer) return document.getElementById('playerInfo');
+  const items = Array.from(document.querySelectorAll('#enemiesList .player-info'));
+  for (const el of items){
+    const txt = el.querySelector('.player-name')?.textContent?.trim() || '';
+    if (txt === name) return el;
+  }
+  return null;
+}
+function centerOf(el){ const r = el.getBoundingClientRect(); return { x: r.left + r.width/2, y: r.top + r.height/2 }; }
+function addShake(panel){ if (!panel) return; panel.classList.add('fx-shake'); setTimeout(()=> panel.classList.remove('fx-shake'), 340); }
+function triggerCardFX(attackerName, targetName, role, succeeded){
+  const fx = document.getElementById('fxLayer');
+  const atkPanel = findPanelByName(attackerName);
+  const tgtPanel = findPanelByName(targetName);
+  if (!fx || !atkPanel) return;
+
+  const start = centerOf(atkPanel);
+  const end = tgtPanel ? centerOf(tgtPanel) : { x: window.innerWidth/2, y: window.innerHeight*0.35 };
+
+  if (succeeded === false){
+    const smoke = document.createElement('div');
+    smoke.className = 'fx-smoke';
+    smoke.style.left = `${start.x}px`; smoke.style.top = `${start.y}px`;
+    fx.appendChild(smoke);
+    setTimeout(()=> smoke.remove(), 600);
+    addShake(atkPanel);
+    return;
+  }
+
+  const ball = document.createElement('div');
+  ball.className = 'fx-projectile';
+  if (role === ' 狙擊手') ball.classList.add('snipe');
+  if (role === ' 贈禮者') ball.classList.add('gift');
+  if (role === ' 小丑') ball.classList.add('clown');
+
+  ball.style.left = `${start.x}px`; ball.style.top = `${start.y}px`;
+  fx.appendChild(ball);
+
+  requestAnimationFrame(()=>{
+    const dx = end.x - start.x;
+    const dy = end.y - start.y;
+    ball.style.transform = `translate(calc(-50% + ${dx}px), calc(-50% + ${dy}px))`;
+  });
+
+  setTimeout(()=>{
+    ball.remove();
+    const hit = document.createElement('div');
+    hit.className = 'fx-hit';
+    hit.style.left = `${end.x}px`; hit.style.top = `${end.y}px`;
+    fx.appendChild(hit);
+    setTimeout(()=> hit.remove(), 520);
+    if (tgtPanel) addShake(tgtPanel);
+  }, 470);
+}
+
+// Admin
+function adminResetGame() {
+  if (!confirm('確定要重啟遊戲嗎？所有進行中行動將被取消、並重新發牌。')) return;
+  socket.emit('admin_reset_game', { player: currentPlayer });
+}
+
+// 卡片放大關閉
+function closeGameOverModal(){ document.getElementById('gameOverModal').style.display='none'; }
@@ -0,0 +1,68 @@
+// 精簡線路編碼的 MessagePack 解碼（只解碼，伺服器以 msgpack.packb(use_bin_type=True) 編碼）
+// 支援 nil / bool / 整數 / 浮點數 / 字串 / 二進位 / 陣列 / 物件；伺服器不送擴充型別，遇到就報錯
+(function () {
+  const utf8 = new TextDecoder();
+
+  function decode(input) {
+    const bytes = input instanceof ArrayBuffer ? new Uint8Array(input)
+      : new Uint8Array(input.buffer, input.byteOffset, input.byteLength);
+    const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    let pos = 0;
+
+    function str(len) { const s = utf8.decode(bytes.subarray(pos, pos + len)); pos += len; return s; }
+    function bin(len) { const b = bytes.slice(pos, pos + len); pos += len; return b; }
+    function array(len) { const out = new Array(len); for (let i = 0; i < len; i++) out[i] = read(); return out; }
+    function map(len) { const out = {}; for (let i = 0; i < len; i++) { const k = read(); out[k] = read(); } return out; }
+    function u8() { return bytes[pos++]; }
+    function u16() { const v = view.getUint16(pos); pos += 2; return v; }
+    function u32() { const v = view.getUint32(pos); pos += 4; return v; }
+    function i64(signed) {
+      const v = signed ? view.getBigInt64(pos) : view.getBigUint64(pos);
+      pos += 8;
+      return Number(v);
+    }
+
+    function read() {
+      if (pos >= bytes.length) throw new Error('msgpack: 資料不完整');
+      const b = u8();
+      if (b <= 0x7f) return b;
+      if (b >= 0xe0) return b - 0x100;
+      if ((b & 0xe0) === 0xa0) return str(b & 0x1f);
+      if ((b & 0xf0) === 0x90) return array(b & 0x0f);
+      if ((b & 0xf0) === 0x80) return map(b & 0x0f);
+      let v;
+      switch (b) {
+        case 0xc0: return null;
+        case 0xc2: return false;
+        case 0xc3: return true;
+        case 0xc4: return bin(u8());
+        case 0xc5: return bin(u16());
+        case 0xc6: return bin(u32());
+        case 0xca: v = view.getFloat32(pos); pos += 4; return v;
+        case 0xcb: v = view.getFloat64(pos); pos += 8; return v;
+        case 0xcc: return u8();
+        case 0xcd: return u16();
+        case 0xce: return u32();
+        case 0xcf: return i64(false);
+        case 0xd0: v = view.getInt8(pos); pos += 1; return v;
+        case 0xd1: v = view.getInt16(pos); pos += 2; return v;
+        case 0xd2: v = view.getInt32(pos); pos += 4; return v;
+        case 0xd3: return i64(true);
+        case 0xd9: return str(u8());
+        case 0xda: return str(u16());
+        case 0xdb: return str(u32());
+        case 0xdc: return array(u16());
+        case 0xdd: return array(u32());
+        case 0xde: return map(u16());
+        case 0xdf: return map(u32());
+      }
+      throw new Error('msgpack: 不支援的型別 0x' + b.toString(16));
+    }
+
+    const value = read();
+    if (pos !== bytes.length) throw new Error('msgpack: 結尾有多餘資料');
+    return value;
+  }
+
+  window.MessagePack = { decode };
+})();
@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import importlib.util
+
+import backend
+from backend import LocalBus, ClusterBackend
+
+# ====== 同一行程內的多 worker ======
+# 把 app.py 以不同模組名稱載入 N 次，每份各自有房間表、排程器與 ClusterBackend，
+# 共用一條 LocalBus：worker 之間的轉送、RPC 與正式部署走同一段程式，只是匯流排換成行程內的。
+# Flask-SocketIO 的測試客戶端不能搭配訊息佇列，因此連線以假的 sid 直接呼叫事件處理函數，
+# 送往客戶端的事件記錄在各 worker 的 CaptureTransport。
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+class CaptureTransport:
+    def __init__(self):
+        self.sent = []          # (事件, 資料, 對象)
+
+    def emit(self, event, payload, to):
+        self.sent.append((event, payload, to))
+
+    def enter_room(self, sid, room_id):
+        pass
+
+    def leave_room(self, sid, room_id):
+        pass
+
+    def close_room(self, room_id):
+        pass
+
+    def is_connected(self, sid):
+        return True
+
+    def events_to(self, to):
+        return [event for event, _, target in self.sent if target == to]
+
+
+def load_worker(worker_id, workers, bus):
+    name = "app_worker%d" % worker_id
+    original = backend.backend_from_env
+    backend.backend_from_env = lambda environ: ClusterBackend(worker_id, workers, bus)
+    try:
+        spec = importlib.util.spec_from_file_location(name, APP_PATH)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    finally:
+        backend.backend_from_env = original
+    module.use_runtime(CaptureTransport(), module.scheduler)
+    return module
+
+def start_workers(workers=2):
+    bus = LocalBus()
+    return [load_worker(i, workers, bus) for i in range(workers)]
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = predicate()
+        if result:
+            return result
+        time.sleep(0.01)
+    raise AssertionError("condition not met within %.1fs" % timeout)
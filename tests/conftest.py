@@ -0,0 +1,6 @@
+import os
+import sys
+
+# 測試從專案根目錄匯入模組（app、engine…）與 tests/ 內的輔助模組
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.dirname(os.path.abspath(__file__))]
@@ -0,0 +1,92 @@
+import time
+import asyncio
+
+import asgi
+import app as core
+
+
+# ====== 直接呼叫 ASGI 應用程式（不開埠）======
+async def get(path, headers=(), disconnect=None):
+    # 回傳 (狀態碼, 標頭, 內容)；disconnect 為 asyncio.Event 時，設定後客戶端視為斷線
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "server": ("test", 80), "client": ("127.0.0.1", 1234),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+    }
+    sent_body = False
+    messages = []
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        if disconnect is not None:
+            await disconnect.wait()
+        else:
+            await asyncio.Event().wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi.application(scope, receive, send)
+    start = messages[0]
+    body = b"".join(m.get("body", b"") for m in messages[1:])
+    return start["status"], dict(start["headers"]), body.decode("utf-8")
+
+def new_room(room_id):
+    room = core.rooms.get(room_id) or core.rooms.create(room_id)
+    with room.lock:
+        core.broadcast_state(room)
+    return room
+
+
+def test_long_poll_does_not_block_other_routes():
+    async def main():
+        room = new_room("asgi-long-poll")
+        tag = room.state_tag()
+        poll = asyncio.ensure_future(
+            get("/state?room=asgi-long-poll&wait=5", [("If-None-Match", '"%s"' % tag)]))
+        await asyncio.sleep(0.2)
+
+        t0 = time.monotonic()
+        status, _, body = await asyncio.wait_for(get("/rooms"), 2)
+        assert status == 200 and "asgi-long-poll" in body
+        assert time.monotonic() - t0 < 1.0
+        assert not poll.done()
+
+        with room.lock:
+            core.run_command(room, "join_game", {"player_name": "alice"})
+        status, headers, body = await asyncio.wait_for(poll, 2)
+        assert status == 200 and "alice" in body
+        assert headers[b"etag"].decode() == '"%s"' % room.state_tag()
+    asyncio.run(main())
+
+def test_long_poll_times_out_with_304():
+    async def main():
+        room = new_room("asgi-long-poll-timeout")
+        tag = room.state_tag()
+        status, _, _ = await get("/state?room=asgi-long-poll-timeout&wait=0.2", [("If-None-Match", '"%s"' % tag)])
+        assert status == 304
+    asyncio.run(main())
+
+def test_sse_stream_does_not_block_other_routes():
+    async def main():
+        room = new_room("asgi-sse")
+        gone = asyncio.Event()
+        stream = asyncio.ensure_future(get("/state/stream?room=asgi-sse", disconnect=gone))
+        await asyncio.sleep(0.2)
+
+        status, _, _ = await asyncio.wait_for(get("/rooms"), 2)
+        assert status == 200
+        with room.lock:
+            core.run_command(room, "join_game", {"player_name": "bob"})
+        await asyncio.sleep(0.1)
+        gone.set()
+        status, headers, body = await asyncio.wait_for(stream, 2)
+        assert status == 200 and headers[b"content-type"].startswith(b"text/event-stream")
+        assert body.count("event: state") == 2 and "bob" in body
+    asyncio.run(main())
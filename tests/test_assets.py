@@ -0,0 +1,73 @@
+import os
+import re
+import shutil
+import threading
+
+import pytest
+
+import assets
+
+
+def test_committed_vendor_files_match_pins():
+    files = assets.build_files()
+    assert set(files) == set(assets.PAGE_FILES) | {"vendor/" + name for name in assets.VENDOR}
+
+
+def test_build_fails_without_vendor_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(assets, "VENDOR_DIR", str(tmp_path))
+    with pytest.raises(RuntimeError):
+        assets.build_files()
+
+
+def test_build_fails_on_tampered_vendor_file(tmp_path, monkeypatch):
+    for name in assets.VENDOR:
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(f"{assets.VENDOR_DIR}/{name}", tmp_path / name)
+        with open(tmp_path / name, "ab") as f:
+            f.write(b"\n")
+    monkeypatch.setattr(assets, "VENDOR_DIR", str(tmp_path))
+    with pytest.raises(RuntimeError):
+        assets.build_files()
+
+
+def test_page_never_points_at_cdn():
+    manifest = assets.build_assets()
+    for rel in ("vendor/socket.io.min.js", "vendor/fontawesome/css/all.min.css", "js/msgpack.js"):
+        assert assets.asset_url(manifest, rel).startswith(assets.URL_PREFIX)
+    assert assets.asset_url({}, "vendor/socket.io.min.js") == "/static/vendor/socket.io.min.js"
+    with open(os.path.join(assets.BASE_DIR, "templates", "index.html"), encoding="utf-8") as f:
+        assert "//" not in "".join(line for line in f if "<link" in line or "<script" in line)
+
+
+def test_vendored_css_points_at_hashed_fonts():
+    manifest = assets.build_assets()
+    css = manifest["files"]["vendor/fontawesome/css/all.min.css"]
+    with open(os.path.join(assets.BUILD_DIR, css[len(assets.URL_PREFIX):]), "rb") as f:
+        urls = set(re.findall(rb"url\(([^)]*)\)", f.read()))
+    fonts = {url.encode() for rel, url in manifest["files"].items() if "/webfonts/" in rel}
+    assert urls and urls == fonts
+    assert all(os.path.exists(os.path.join(assets.BUILD_DIR, url[len(assets.URL_PREFIX):].decode())) for url in urls)
+
+
+def test_concurrent_builds_do_not_clobber_each_other(tmp_path, monkeypatch):
+    (tmp_path / "images").mkdir()
+    monkeypatch.setattr(assets, "SOURCE_DIR", str(tmp_path / "images"))     # 卡圖轉檔太慢，只建頁面資產
+    monkeypatch.setattr(assets, "BUILD_DIR", str(tmp_path / "build"))
+    monkeypatch.setattr(assets, "MANIFEST_PATH", str(tmp_path / "build" / "manifest.json"))
+    errors = []
+
+    def build():
+        try:
+            assets.build_assets(force=True)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=build) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    manifest = assets.load_manifest()
+    assert manifest["files"].keys() == assets.build_files().keys()
+    assert not [name for name in os.listdir(tmp_path / "build") if name.endswith(assets.TMP_SUFFIX)]
@@ -0,0 +1,40 @@
+import multiprocessing
+import random
+import subprocess
+import sys
+import time
+
+import app
+import bots
+import engine
+import server
+
+
+def test_bot_search_runs_without_app(monkeypatch):
+    monkeypatch.setattr(app, "bot_pool", None)
+    pool = app.get_bot_pool()
+    try:
+        state = engine.new_game_state("bot-pool")
+        rng = random.Random(1)
+        for name in ("alice", "bob"):
+            engine.join_game(state, {"player_name": name}, time.time(), rng)
+        engine.deal(state, time.time(), rng)
+        me = state["current_turn"]
+        command, data, _ = pool.submit(bots.decide, bots.observe(state, me, time.time()), bots.TURN, 0.05, 7).result(30)
+        assert command in engine.COMMANDS and data["player"] == me
+
+        expected = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        assert pool.submit(eval, "__import__('multiprocessing').get_start_method()").result(30) == expected
+        # 子行程只載入搜尋需要的模組，沒有重跑伺服器（app / Flask）
+        loaded = pool.submit(eval, "[m for m in ('app', 'flask', 'bots') if m in __import__('sys').modules]").result(30)
+        assert loaded == ["bots"]
+    finally:
+        pool.shutdown()
+
+
+def test_entry_script_is_inert_when_rerun():
+    # 行程池的子行程以 __mp_main__ 重跑啟動腳本：server.py 重跑時不能匯入伺服器
+    code = ("import runpy, sys; runpy.run_path(%r, run_name='__mp_main__');"
+            "print(sorted(m for m in ('app', 'asgi', 'flask') if m in sys.modules))" % server.SERVER_PATH)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, timeout=30).stdout
+    assert out.strip() == "[]"
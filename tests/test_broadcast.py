@@ -0,0 +1,96 @@
+import pytest
+
+import app
+from bench import BenchTransport, make_room
+from engine import CLOWN, Hand
+
+STATE_EVENTS = ("game_state", "game_state_patch")
+
+
+@pytest.fixture
+def room(monkeypatch):
+    # 與 bench.py 相同：房間不登記、量測期間持有房間鎖；傳輸換成記錄事件的 BenchTransport
+    room = make_room(3, full_log=False)
+    app.broadcast_state(room)
+    monkeypatch.setattr(app, "transport", BenchTransport(record=True))
+    yield room
+    app.finish_all_timers(room)
+    room.lock.release()
+
+def sent():
+    events = [event for event, _ in app.transport.sent]
+    app.transport.sent.clear()
+    return events
+
+def states(events):
+    return [e for e in events if e in STATE_EVENTS]
+
+def play_clown(room, target_score=None):
+    state = room.state
+    attacker = state["current_turn"]
+    target = next(n for n in state["player_order"] if n != attacker)
+    state["players"][attacker].roles = Hand([CLOWN])
+    if target_score is not None:
+        state["players"][target].score = target_score
+    app.run_command(room, "play_card", {"player": attacker, "role": CLOWN, "target": target})
+    return attacker, target
+
+
+def test_one_broadcast_per_command(room):
+    _, target = play_clown(room)
+    events = sent()
+    assert states(events) == ["game_state_patch"]
+    assert events.index("bluff_challenge") < events.index("game_state_patch")
+
+    app.run_command(room, "call_bluff", {"prompt_id": room.state["pending_prompt_id"], "player": target})
+    events = sent()
+    assert states(events) == ["game_state_patch"] and "bluff_result" in events
+
+    # 被拒絕的指令沒有改動狀態，不廣播
+    app.run_command(room, "call_bluff", {"prompt_id": "gone", "player": target})
+    assert states(sent()) == []
+
+def test_state_is_flushed_before_game_over(room):
+    play_clown(room, target_score=2)
+    sent()
+    app.run_command(room, "not_call_bluff", {"prompt_id": room.state["pending_prompt_id"]})
+    events = sent()
+    # 分數歸零的狀態要在 game_over 之前送出，之後不再多送一次
+    assert states(events) == ["game_state_patch"]
+    assert events.index("game_state_patch") < events.index("game_over")
+    assert not room.state_dirty and not room.last_snapshot["game_started"]
+
+def test_min_interval_defers_and_merges_broadcasts(room, monkeypatch):
+    monkeypatch.setattr(app, "BROADCAST_MIN_INTERVAL_SEC", 60.0)
+    players = room.state["players"]
+    version = room.version
+
+    first = room.state["current_turn"]
+    app.run_command(room, "end_turn_discard_draw", {"player": first})
+    assert states(sent()) == [] and room.state_dirty
+    timer = room.flush_timer
+    assert timer is not None
+    second = room.state["current_turn"]
+    app.run_command(room, "end_turn_discard_draw", {"player": second})
+    assert states(sent()) == [] and room.flush_timer is timer
+
+    # 延後的廣播一次帶出期間所有變更
+    room.last_broadcast -= 60.0
+    app.flush_state_later(room)
+    assert states(sent()) == ["game_state_patch"]
+    assert room.version == version + 1 and room.flush_timer is None
+    assert room.last_snapshot["current_turn"] == room.state["current_turn"] != second
+    assert room.last_snapshot["turn_index"] == room.state["turn_index"]
+    assert {n: p["score"] for n, p in room.last_snapshot["players"].items()} == {n: p.score for n, p in players.items()}
+
+def test_room_event_flushes_deferred_state_early(room, monkeypatch):
+    monkeypatch.setattr(app, "BROADCAST_MIN_INTERVAL_SEC", 60.0)
+    app.run_command(room, "end_turn_discard_draw", {"player": room.state["current_turn"]})
+    assert states(sent()) == [] and room.flush_timer is not None
+    timer = room.flush_timer
+
+    # 下一個指令的 bluff_challenge 之前先送出積著的狀態，計時器取消
+    play_clown(room)
+    events = sent()
+    assert events[:2] == ["game_state_patch", "bluff_challenge"]
+    assert timer.cancelled and room.flush_timer is not None
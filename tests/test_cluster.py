@@ -0,0 +1,37 @@
+import pytest
+
+from backend import make_backend, owner_of
+from cluster_harness import start_workers, wait_for
+
+
+def room_owned_by(worker_id, workers):
+    return next(r for r in ("cluster-%d" % i for i in range(1000)) if owner_of(r, workers) == worker_id)
+
+
+def test_workers_require_cross_process_bus():
+    with pytest.raises(RuntimeError):
+        make_backend(2, 0, None)
+    with pytest.raises(RuntimeError):
+        make_backend(2, 0, "local")
+
+def test_command_is_forwarded_to_owning_worker():
+    w0, w1 = start_workers(2)
+    room_id = room_owned_by(1, 2)
+
+    # 連到 worker 0 的連線進入 worker 1 持有的房間：房間只在 owner 建立
+    w0.client_connected("sid-a", room_id)
+    wait_for(lambda: w1.rooms.get(room_id))
+    assert w0.rooms.get(room_id) is None
+    wait_for(lambda: "game_state" in w1.transport.events_to("sid-a"))
+
+    # 指令由 worker 0 收到，轉送給 worker 1 執行
+    w0.SOCKET_EVENTS["join_game"]("sid-a", {"player_name": "alice"})
+    wait_for(lambda: "alice" in w1.rooms.get(room_id).state["players"])
+    wait_for(lambda: "session" in w1.transport.events_to("sid-a"))
+    assert w1.rooms.get(room_id).player_sids["alice"] == "sid-a"
+
+    # HTTP 讀取經 RPC 由 owner 回覆
+    resp = w0.app.test_client().get("/state?room=" + room_id)
+    assert resp.status_code == 200 and "alice" in resp.get_json()["players"]
+    rooms = w0.app.test_client().get("/rooms").get_json()["rooms"]
+    assert room_id in [r["room_id"] for r in rooms]
@@ -0,0 +1,125 @@
+import app
+import engine
+from cluster_harness import CaptureTransport
+from delta import apply_patch, diff_snapshot, VOLATILE_FIELDS
+from gamelog import LOG_MAXLEN
+
+
+def without_volatile(state):
+    return {k: v for k, v in state.items() if k not in VOLATILE_FIELDS}
+
+
+def test_apply_reverses_diff():
+    prev = {
+        "current_turn": "alice", "turn_index": 3, "winner": "bob", "time_remaining_ms": 5000,
+        "players": {"alice": {"score": 1, "hand_count": 3}, "bob": {"score": 0, "hand_count": 2}},
+    }
+    cur = {
+        "current_turn": "carol", "turn_index": 3, "round_number": 2, "time_remaining_ms": 4000,
+        "players": {"alice": {"score": 2, "hand_count": 3}, "carol": {"score": 0, "hand_count": 4}},
+    }
+    patch = diff_snapshot(prev, cur)
+    assert patch["unset"] == ["winner"] and patch["players_removed"] == ["bob"]
+    assert patch["players"]["alice"] == {"score": 2}
+    assert without_volatile(apply_patch(prev, patch)) == without_volatile(cur)
+    assert diff_snapshot(cur, cur) == {}
+
+
+class Client:
+    # 與 static/js/game.js 的 handleGameState / applyStatePatch 相同的套用規則
+    def __init__(self, room, sid):
+        self.room, self.sid = room, sid
+        self.state = None
+        self.resyncs = 0
+
+    def receive(self, event, payload):
+        if event == "game_state":
+            self.state = payload
+        elif event == "game_state_patch":
+            if self.state is None or self.state["version"] != payload["base"]:
+                self.resyncs += 1
+                app.submit(self.room, app.run_handler, ("handle_request_full_state", None, self.sid))
+                return
+            state = apply_patch(self.state, payload)
+            if payload.get("logs_reset"):
+                state["logs"] = payload.get("logs_new") or []
+            elif "logs_new" in payload:
+                state["logs"] = (state["logs"] + payload["logs_new"])[-LOG_MAXLEN:]
+            state["version"] = payload["v"]
+            if "log_seq" in payload:
+                state["log_seq"] = payload["log_seq"]
+            state["time_remaining_ms"] = payload["time_remaining_ms"]
+            self.state = state
+
+
+def deliver(transport, client, drop=()):
+    # 依序送出房間廣播與給這個 sid 的事件；drop 內的第幾筆廣播模擬遺失
+    sent, transport.sent = transport.sent, []
+    n = 0
+    for event, payload, to in sent:
+        if to == client.room.room_id:
+            n += 1
+            if n in drop:
+                continue
+            client.receive(event, payload[0])
+        elif to == client.sid:
+            client.receive(event, payload)
+    while transport.sent:
+        deliver(transport, client)
+
+
+def discard_turn(room):
+    player = room.state["current_turn"]
+    app.run_command(room, "end_turn_discard_draw",
+                    {"player": player, "discard_role": room.state["players"][player].roles.to_list()[0]})
+
+def assert_in_sync(client, room):
+    with room.lock:
+        expected = app.full_state(room)
+    got = {k: v for k, v in client.state.items() if k != "event_seq"}
+    expected = {k: v for k, v in expected.items() if k != "event_seq"}
+    assert without_volatile(got) == without_volatile(expected)
+
+
+def test_client_follows_patches_and_resyncs(monkeypatch):
+    transport = CaptureTransport()
+    monkeypatch.setattr(app, "transport", transport)
+    room = app.rooms.create("delta-sync", seed=3)
+    client = Client(room, "sid-delta")
+    try:
+        with room.lock:
+            app.run_command(room, "join_game", {"player_name": "alice"})
+            app.run_command(room, "join_game", {"player_name": "bob"})
+            app.run_command(room, "join_game", {"player_name": "carol"})
+        deliver(transport, client)
+        with room.lock:
+            app.run_command(room, "start_game", None)
+            discard_turn(room)
+        deliver(transport, client)
+        assert client.resyncs == 0
+        assert_in_sync(client, room)
+
+        # 日誌超過緩衝區：補丁帶 logs_reset 與完整日誌，客戶端整份替換
+        with room.lock:
+            for i in range(LOG_MAXLEN + 5):
+                engine.add_log(room.state, "line %d" % i)
+            room.state_dirty = True
+            app.broadcast_state(room)
+        assert transport.sent[-1][1][0]["logs_reset"]
+        deliver(transport, client)
+        assert client.resyncs == 0
+        assert_in_sync(client, room)
+
+        # 遺失一筆補丁：下一筆的 base 對不上，客戶端要求完整狀態後重新同步
+        with room.lock:
+            discard_turn(room)
+            engine.add_log(room.state, "after gap")
+            room.state_dirty = True
+            app.broadcast_state(room)
+        deliver(transport, client, drop=(1,))
+        assert client.resyncs == 1
+        assert_in_sync(client, room)
+    finally:
+        with room.lock:
+            app.finish_all_timers(room)
+        app.rooms.close(room.room_id)
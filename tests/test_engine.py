@@ -0,0 +1,193 @@
+import random
+
+import engine
+import simulate
+from engine import BIRTHDAY, CLOWN, DETECTIVE, GIFTER, GUARDIAN, REPLY, SNIPER, STATE, Hand
+
+T0 = 1_000_000.0
+
+
+def started(*names, seed=1):
+    state = engine.new_game_state("engine")
+    rng = random.Random(seed)
+    for name in names or ("alice", "bob", "carol"):
+        engine.join_game(state, {"player_name": name}, T0, rng)
+    engine.deal(state, T0, rng)
+    return state, rng
+
+def effect(state, attacker, role, target, extra=None):
+    events = []
+    engine.resolve_effect(state, events, T0, attacker, role, target, extra, consume_if_has=False)
+    return events
+
+def scores(state):
+    return {name: p.score for name, p in state["players"].items()}
+
+def names_of(events):
+    return [name for name, _ in events]
+
+
+# ====== 牌效 ======
+def test_each_card_effect():
+    state, _ = started()
+    players = state["players"]
+
+    effect(state, "alice", GUARDIAN, None)
+    assert players["alice"].guardian_active and scores(state) == {"alice": 100, "bob": 100, "carol": 100}
+
+    effect(state, "bob", BIRTHDAY, "carol")
+    assert (players["bob"].mark_target, players["bob"].mark_used_turn) == ("carol", engine.round_number(state))
+
+    events = effect(state, "bob", DETECTIVE, "carol")
+    assert names_of(events) == ["force_choice"] and "carol" in state["force_choices"]
+
+    # 小丑：目標 -2、自己 -1；標記同一輪的目標再 -1
+    effect(state, "carol", CLOWN, "bob")
+    assert scores(state)["bob"] == 98 and scores(state)["carol"] == 99
+    effect(state, "bob", CLOWN, "carol")
+    assert scores(state)["carol"] == 96 and scores(state)["bob"] == 97
+
+    # 狙擊手：目標分數 > 80 時 -2，否則 -3；自己 -1
+    effect(state, "carol", SNIPER, "bob")
+    assert scores(state)["bob"] == 95 and scores(state)["carol"] == 95
+    players["bob"].score = 80
+    effect(state, "carol", SNIPER, "bob")
+    assert scores(state)["bob"] == 77
+
+    before = scores(state)
+    effect(state, "bob", GIFTER, "carol", {"mode": "A"})
+    assert scores(state)["bob"] == before["bob"] + 1 and scores(state)["carol"] == before["carol"] - 1
+    before = scores(state)
+    effect(state, "bob", GIFTER, "carol", {"mode": "B", "second_target": "alice"})
+    assert scores(state) == {"alice": before["alice"] - 1, "bob": before["bob"], "carol": before["carol"] - 1}
+    # B 模式的第二目標無效時退回 A 模式
+    before = scores(state)
+    effect(state, "bob", GIFTER, "carol", {"mode": "B", "second_target": "carol"})
+    assert scores(state)["bob"] == before["bob"] + 1 and scores(state)["carol"] == before["carol"] - 1
+
+    # 守護者擋下攻擊並反擊（狙擊手 -2，其他 -1），之後失效
+    before = scores(state)
+    effect(state, "carol", SNIPER, "alice")
+    assert scores(state)["alice"] == before["alice"] and scores(state)["carol"] == before["carol"] - 2
+    assert not players["alice"].guardian_active
+
+
+def test_played_card_is_consumed_unless_admin():
+    state, _ = started("alice", "admin")
+    state["players"]["alice"].roles = Hand([CLOWN, CLOWN])
+    engine.resolve_effect(state, [], T0, "alice", CLOWN, "admin")
+    assert state["players"]["alice"].roles.to_list() == [CLOWN] and state["discard_pile"] == [CLOWN]
+    state["players"]["admin"].roles = Hand([CLOWN])
+    engine.resolve_effect(state, [], T0, "admin", CLOWN, "alice", consume_if_has=False)
+    assert state["players"]["admin"].roles.to_list() == [CLOWN]
+
+
+# ====== 虛張與拆穿 ======
+def play(state, rng, role, target, bluff):
+    attacker = state["current_turn"]
+    state["players"][attacker].roles = Hand([] if bluff else [role])
+    events = engine.play_card(state, {"player": attacker, "role": role, "target": target}, T0, rng)
+    assert names_of(events) == ["bluff_challenge", STATE]
+    return attacker, state["pending_prompt_id"]
+
+def other(state, *excluding):
+    return next(n for n in state["player_order"] if n not in excluding)
+
+def test_call_on_bluff_costs_attacker_five():
+    state, rng = started()
+    attacker = state["current_turn"]
+    target = other(state, attacker)
+    _, pid = play(state, rng, CLOWN, target, bluff=True)
+    events = engine.call_bluff(state, {"prompt_id": pid, "player": target}, T0, rng)
+    result = dict(events)["bluff_result"]
+    assert result["success"] and scores(state)[attacker] == 95 and scores(state)[target] == 100
+    assert state["players"][target].call_bluff_success == 1
+    assert not state["pending_prompts"] and state["current_turn"] != attacker
+
+def test_call_on_honest_play_costs_caller_two_and_applies_effect():
+    state, rng = started()
+    attacker = state["current_turn"]
+    target = other(state, attacker)
+    caller = other(state, attacker, target)
+    _, pid = play(state, rng, CLOWN, target, bluff=False)
+    events = engine.call_bluff(state, {"prompt_id": pid, "player": caller}, T0, rng)
+    assert not dict(events)["bluff_result"]["success"]
+    assert scores(state) == {attacker: 99, target: 98, caller: 98}
+    assert state["players"][attacker].roles.to_list() == []
+
+def test_uncalled_bluff_still_takes_effect():
+    state, rng = started()
+    attacker = state["current_turn"]
+    target = other(state, attacker)
+    _, pid = play(state, rng, CLOWN, target, bluff=True)
+    events = engine.not_call_bluff(state, {"prompt_id": pid}, T0, rng)
+    assert dict(events)["bluff_result"]["success"]
+    assert scores(state)[target] == 98 and state["players"][attacker].bluff_success == 1
+    assert engine.HISTORY in names_of(events)
+
+def test_call_bluff_ignores_unknown_players_and_prompts():
+    state, rng = started()
+    attacker = state["current_turn"]
+    _, pid = play(state, rng, CLOWN, other(state, attacker), bluff=True)
+    assert engine.call_bluff(state, {"prompt_id": pid, "player": "mallory"}, T0, rng) == []
+    assert engine.call_bluff(state, {"prompt_id": "nope", "player": attacker}, T0, rng) == []
+    assert pid in state["pending_prompts"] and scores(state)[attacker] == 100
+
+
+# ====== 強制選擇 ======
+def test_force_choice_answer_requires_pending_choice():
+    state, rng = started()
+    bob = state["players"]["bob"]
+    assert engine.force_choice_answer(state, {"player": "bob", "choice": "lose_one"}, T0, rng) == []
+    assert bob.score == 100
+
+    effect(state, "alice", DETECTIVE, "bob")
+    bob.roles = Hand([SNIPER])
+    events = engine.force_choice_answer(state, {"player": "bob", "choice": "discard_one", "discard_role": SNIPER}, T0, rng)
+    assert events == [(STATE, None)] and bob.roles.to_list() == [] and bob.score == 100
+    # 同一個強制選擇只能回覆一次；逾時也不再扣分
+    assert engine.force_choice_answer(state, {"player": "bob", "choice": "lose_one"}, T0, rng) == []
+    assert engine.force_choice_timeout(state, {"player": "bob"}, T0, rng) == []
+    assert bob.score == 100
+
+    effect(state, "alice", DETECTIVE, "bob")
+    engine.force_choice_answer(state, {"player": "bob", "choice": "discard_one", "discard_role": CLOWN}, T0, rng)
+    assert bob.score == 99      # 沒有這張牌：視為扣 1 分
+
+
+# ====== 結束 ======
+def test_game_ends_when_a_score_reaches_zero():
+    state, rng = started()
+    attacker = state["current_turn"]
+    target = other(state, attacker)
+    state["players"][target].score = 2
+    _, pid = play(state, rng, CLOWN, target, bluff=False)
+    events = engine.not_call_bluff(state, {"prompt_id": pid}, T0, rng)
+    assert not state["game_started"] and "game_over" in names_of(events)
+    results = dict(events)["game_over"]["results"]
+    assert results[-1]["player"] == target and results[-1]["score"] == 0
+
+def test_game_ends_after_max_rounds_and_deadline():
+    state, rng = started("alice", "bob")
+    events = []
+    for _ in range(2 * state["max_rounds"]):
+        player = state["current_turn"]
+        events += engine.end_turn_discard_draw(state, {"player": player}, T0, rng)
+    assert not state["game_started"] and names_of(events).count("game_over") == 1
+
+    state, rng = started("alice", "bob")
+    assert engine.game_deadline(state, {"start_ts": T0 - 1}, T0, rng) == []
+    assert names_of(engine.game_deadline(state, {"start_ts": T0}, T0, rng)) == [STATE, "game_over"]
+    assert engine.play_card(state, {"player": state["current_turn"], "role": GUARDIAN}, T0, rng)[0][0] == REPLY
+
+
+# ====== 模擬器 ======
+def test_simulator_is_deterministic_for_a_seed():
+    specs = ["random", "honest", "bluffer", "skeptic"]
+    first = simulate.simulate(200, specs, seed=5, batch_size=50)
+    assert first == simulate.simulate(200, specs, seed=5, batch_size=50)
+    assert first != simulate.simulate(200, specs, seed=6, batch_size=50)
+    assert first["games"] == 200 and sum(first["policy_seats"].values()) == 800
+    assert sum(first["policy_wins"].values()) == 200
+    report = simulate.summarize(first)
+    assert report["games"] == 200 and set(report["policy_win_rate"]) == set(specs)
@@ -0,0 +1,176 @@
+import random
+
+import engine
+from engine import CARD_IDS, CARD_TYPES, GIFTER, GUARDIAN
+
+# ====== 固定種子的對局：與最佳化前的引擎逐步比對 ======
+# 驅動程式只依排序後的手牌與玩家順序做決定，同一個種子在兩版引擎上送出的指令完全相同。
+# 期望值由改用 Player / Hand / deque / turn_pos 之前的引擎（dict 玩家、list 手牌、每次掃描 player_order）
+# 以同一個驅動程式跑出；中途有玩家離開，涵蓋 turn_pos 快取失效的情形。
+NAMES = ("alice", "bob", "carol", "dave", "erin")
+T0 = 1_000_000.0
+
+
+def hand_of(state, name):
+    return sorted(CARD_IDS[c] for c in state["players"][name].roles)
+
+def leave(state, name):
+    # 引擎沒有離開指令：直接從狀態移除，等同房間把斷線玩家踢出
+    del state["players"][name]
+    state["player_order"].remove(name)
+
+def summary(state):
+    return {
+        "hands": {name: hand_of(state, name) for name in state["player_order"]},
+        "scores": {name: state["players"][name].score for name in state["player_order"]},
+        "draw_pile": [CARD_IDS[c] for c in state["draw_pile"]],
+        "discard_pile": [CARD_IDS[c] for c in state["discard_pile"]],
+        "current_turn": state["current_turn"],
+        "turn_index": state["turn_index"],
+    }
+
+def play(seed, steps=20, leaves=((5, 1), (10, 0), (15, -1))):
+    # leaves：(第幾步, 第幾位離開)；-1 表示目前輪到的玩家，其餘是 player_order 中的位置
+    rng = random.Random(seed)
+    driver = random.Random(seed + 1)
+    state = engine.new_game_state("seeded")
+    now = T0
+    for name in NAMES:
+        engine.join_game(state, {"player_name": name}, now, rng)
+    engine.start_game(state, None, now, rng)
+    state["max_rounds"] = 20        # 讓對局撐到所有離開都發生
+    leave_at = dict(leaves)
+    turns, checkpoints = [], []
+    for step in range(steps):
+        if not state["game_started"]:
+            break
+        now += 1.0
+        if step in leave_at and len(state["player_order"]) > 2:
+            checkpoints.append(summary(state))
+            i = leave_at[step]
+            leave(state, state["current_turn"] if i < 0 else state["player_order"][i])
+            if state["current_turn"] not in state["players"]:
+                engine.advance_turn(state, [], now, rng)
+        me = state["current_turn"]
+        turns.append(me)
+        others = [n for n in state["player_order"] if n != me]
+        hand = hand_of(state, me)
+        if not hand or driver.random() < 0.25:
+            discard = CARD_TYPES[driver.choice(hand)] if hand else ""
+            engine.end_turn_discard_draw(state, {"player": me, "discard_role": discard}, now, rng)
+            continue
+        bluff = driver.random() < 0.3
+        role = CARD_TYPES[driver.randrange(len(CARD_TYPES))] if bluff else CARD_TYPES[driver.choice(hand)]
+        data = {"player": me, "role": role, "target": None if role == GUARDIAN else driver.choice(others),
+                "is_bluff": bluff}
+        if role == GIFTER and len(others) > 1:
+            data["extra"] = {"mode": "B", "second_target": [n for n in others if n != data["target"]][0]}
+        engine.play_card(state, data, now, rng)
+        if state["pending_prompt_id"]:
+            pid = state["pending_prompt_id"]
+            caller = driver.choice(others)
+            if driver.random() < 0.4:
+                engine.call_bluff(state, {"prompt_id": pid, "player": caller}, now, rng)
+            else:
+                engine.not_call_bluff(state, {"prompt_id": pid}, now, rng)
+        for target in list(state["force_choices"]):
+            if driver.random() < 0.5 and hand_of(state, target):
+                answer = {"player": target, "choice": "discard_one",
+                          "discard_role": CARD_TYPES[hand_of(state, target)[0]]}
+            else:
+                answer = {"player": target, "choice": "lose_one"}
+            engine.force_choice_answer(state, answer, now, rng)
+    checkpoints.append(summary(state))
+    return turns, checkpoints
+
+
+# 舊版引擎跑出的結果：(每一步輪到的玩家, 每次有人離開前與結束時的狀態摘要)
+EXPECTED = {
+    7:
+    (["bob", "carol", "alice", "dave", "erin", "bob", "alice", "dave", "erin", "bob", "alice", "dave", "erin",
+      "alice", "dave", "alice", "dave", "alice", "dave", "alice"],
+     [{"current_turn": "bob",
+       "discard_pile": [4, 0, 4, 4, 3],
+       "draw_pile": [0, 2],
+       "hands": {"alice": [2, 2, 4, 5, 5],
+                 "bob": [0, 1, 1, 3, 5],
+                 "carol": [1, 1, 2, 4, 5],
+                 "dave": [1, 3, 3, 5],
+                 "erin": [0, 0, 2, 3]},
+       "scores": {"alice": 100, "bob": 100, "carol": 100, "dave": 100, "erin": 99},
+       "turn_index": 5},
+      {"current_turn": "alice",
+       "discard_pile": [4, 0, 4, 4, 3, 3, 2, 5, 0, 1],
+       "draw_pile": [2],
+       "hands": {"alice": [2, 4, 5, 5], "bob": [0, 1, 5], "dave": [1, 3, 3], "erin": [0, 0, 2, 3]},
+       "scores": {"alice": 99, "bob": 96, "dave": 97, "erin": 94},
+       "turn_index": 10},
+      {"current_turn": "erin",
+       "discard_pile": [4, 0, 4, 4, 3, 3, 2, 5, 0, 1, 3, 0, 3, 5, 3],
+       "draw_pile": [],
+       "hands": {"alice": [2, 4, 5], "dave": [1], "erin": [0, 2, 2]},
+       "scores": {"alice": 97, "dave": 95, "erin": 92},
+       "turn_index": 15},
+      {"current_turn": "dave",
+       "discard_pile": [4, 0, 4, 4, 3, 3, 2, 5, 0, 1, 3, 0, 3, 5, 3, 4, 1, 2, 5],
+       "draw_pile": [],
+       "hands": {"alice": [], "dave": []},
+       "scores": {"alice": 94, "dave": 90},
+       "turn_index": 21}]),
+    2024:
+    (["erin", "alice", "bob", "dave", "carol", "erin", "bob", "dave", "carol", "erin", "bob", "dave", "carol",
+      "bob", "dave", "bob", "dave", "bob", "dave", "bob"],
+     [{"current_turn": "erin",
+       "discard_pile": [2, 0, 3, 1],
+       "draw_pile": [1, 3, 4, 1, 3],
+       "hands": {"alice": [0, 0, 2, 3, 5],
+                 "bob": [3, 4, 4, 5],
+                 "carol": [1, 1, 2, 5],
+                 "dave": [2, 4, 4, 5],
+                 "erin": [0, 0, 2, 5]},
+       "scores": {"alice": 90, "bob": 99, "carol": 100, "dave": 99, "erin": 100},
+       "turn_index": 5},
+      {"current_turn": "bob",
+       "discard_pile": [2, 0, 3, 1, 0, 4, 5, 5],
+       "draw_pile": [4, 1, 3],
+       "hands": {"bob": [3, 3, 4, 5], "carol": [1, 1, 2], "dave": [2, 4, 4, 5], "erin": [0, 1, 2]},
+       "scores": {"bob": 99, "carol": 97, "dave": 90, "erin": 99},
+       "turn_index": 10},
+      {"current_turn": "carol",
+       "discard_pile": [2, 0, 3, 1, 0, 4, 5, 5, 3, 1, 5, 2],
+       "draw_pile": [4, 1, 3],
+       "hands": {"bob": [3, 4], "carol": [1, 2], "dave": [4, 4, 5]},
+       "scores": {"bob": 93, "carol": 94, "dave": 79},
+       "turn_index": 15},
+      {"current_turn": "dave",
+       "discard_pile": [2, 0, 3, 1, 0, 4, 5, 5, 3, 1, 5, 2, 3, 4, 4, 4],
+       "draw_pile": [1, 3],
+       "hands": {"bob": [4], "dave": [5]},
+       "scores": {"bob": 92, "dave": 79},
+       "turn_index": 21}]),
+}
+
+
+def test_seeded_games_match_reference_engine():
+    for seed, expected in EXPECTED.items():
+        assert play(seed) == expected
+
+
+def test_turn_pos_survives_players_leaving_before_current():
+    state = engine.new_game_state("turn-pos")
+    rng = random.Random(1)
+    for name in NAMES:
+        engine.join_game(state, {"player_name": name}, T0, rng)
+    engine.start_game(state, None, T0, rng)
+    order = list(state["player_order"])
+    for _ in range(3):
+        engine.advance_turn(state, [], T0, rng)
+    assert state["current_turn"] == order[3] and state["turn_pos"] == 3
+    # 目前玩家之前的兩位離開：快取的位置失效，仍要輪到順序中的下一位
+    leave(state, order[0])
+    leave(state, order[2])
+    engine.advance_turn(state, [], T0, rng)
+    assert state["current_turn"] == order[4]
+    assert state["player_order"][state["turn_pos"]] == order[4]
+    engine.advance_turn(state, [], T0, rng)
+    assert state["current_turn"] == order[1]
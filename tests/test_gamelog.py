@@ -0,0 +1,37 @@
+import app
+import engine
+from cluster_harness import CaptureTransport
+from gamelog import GameLog, LOG_MAXLEN
+from rooms import Room
+
+
+def test_since_reports_gap():
+    log = GameLog(maxlen=3)
+    for i in range(5):
+        log.append("line %d" % i)
+    assert log.first_seq == 3
+    assert log.since(5) == []
+    assert log.since(3) == ["line 3", "line 4"]
+    assert log.since(2) == ["line 2", "line 3", "line 4"]
+    assert log.since(1) is None
+    assert log.tail(10) == ["line 2", "line 3", "line 4"]
+
+
+def test_patch_sends_full_log_after_overflow(monkeypatch):
+    transport = CaptureTransport()
+    monkeypatch.setattr(app, "transport", transport)
+    room = Room("log-gap", engine.new_game_state("log-gap"))
+    with room.lock:
+        app.broadcast_state(room)
+        for i in range(LOG_MAXLEN + 5):
+            engine.add_log(room.state, "line %d" % i)
+        room.state_dirty = True
+        app.broadcast_state(room)
+    event, (patch, _), _ = transport.sent[-1]
+    assert event == "game_state_patch"
+    assert patch["logs_reset"] and patch["logs_new"] == list(room.state["logs"])
+
+    body = app.state_body
+    monkeypatch.setattr(app, "http_room", lambda room_id: room)
+    assert body("log-gap", 1)["logs_reset"]
+    assert not body("log-gap", room.state["logs"].seq - 1)["logs_reset"]
@@ -0,0 +1,34 @@
+import app
+from history import HistoryStore
+
+
+def started_room(room_id):
+    room = app.rooms.create(room_id)
+    with room.lock:
+        for name in ("alice", "bob"):
+            app.run_command(room, "join_game", {"player_name": name})
+        room.state["players"]["alice"].is_admin = True
+        app.run_command(room, "start_game", None)
+    return room
+
+
+def test_unfinished_games_are_forgotten(tmp_path, monkeypatch):
+    store = HistoryStore(str(tmp_path))
+    monkeypatch.setattr(app, "history", store)
+    open_games = store.writer.games
+    try:
+        room = started_room("history-reset")
+        first = (room.room_id, room.state["start_ts"])
+        store.writer.game_id(*first)      # 出過牌的對局才會有 game_id
+
+        with room.lock:
+            app.run_command(room, "admin_reset_game", {"player": "alice"})
+        store.writer.game_id(room.room_id, room.state["start_ts"])
+        store.flush()
+        assert first not in open_games and len(open_games) == 1
+
+        app.rooms.close(room.room_id)
+        store.flush()
+        assert not open_games
+    finally:
+        store.close()
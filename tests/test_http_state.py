@@ -0,0 +1,67 @@
+import threading
+
+import app
+from cluster_harness import CaptureTransport
+
+
+def test_default_room_state_without_connections():
+    app.rooms.close(app.DEFAULT_ROOM_ID)
+    client = app.app.test_client()
+
+    resp = client.get("/state")
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["room_id"] == app.DEFAULT_ROOM_ID
+    assert body["players"] == {} and not body["game_started"]
+
+    # 閒置回收後仍然回傳空的大廳
+    app.rooms.get(app.DEFAULT_ROOM_ID).last_active = 0
+    assert app.DEFAULT_ROOM_ID in app.evict_idle_rooms()
+    assert client.get("/state").status_code == 200
+    assert client.get("/state/stream").status_code == 200
+
+
+def test_unknown_room_is_404():
+    resp = app.app.test_client().get("/state?room=no-such-room")
+    assert resp.status_code == 404
+    assert app.rooms.get("no-such-room") is None
+
+
+def test_state_read_waits_for_running_command():
+    room = app.rooms.get_or_create("state-lock")
+    result = []
+    with room.lock:
+        reader = threading.Thread(target=lambda: result.append(app.state_body("state-lock", None)))
+        reader.start()
+        reader.join(0.2)
+        assert reader.is_alive() and not result
+    reader.join(2)
+    assert result and result[0]["room_id"] == "state-lock"
+
+
+def test_http_state_matches_socket_full_state(monkeypatch):
+    monkeypatch.setattr(app, "transport", CaptureTransport())
+    room = app.rooms.create("state-same", seed=3)
+    with room.lock:
+        for name in ("alice", "bob"):
+            app.run_command(room, "join_game", {"player_name": name})
+        app.run_command(room, "start_game", {})
+        socket_state = app.full_state(room)
+    body = app.state_body("state-same", None)
+    assert body.pop("logs_reset") and body.pop("tag") == room.state_tag()
+    assert abs(body.pop("time_remaining_ms") - socket_state.pop("time_remaining_ms")) < 1000
+    assert body == socket_state
+
+    # 延後廣播期間 HTTP 不送出事件，沿用最近一次廣播的內容與版本
+    monkeypatch.setattr(app, "BROADCAST_MIN_INTERVAL_SEC", 60.0)
+    with room.lock:
+        app.run_command(room, "end_turn_discard_draw", {"player": room.state["current_turn"]})
+        assert room.state_dirty
+    sent = len(app.transport.sent)
+    body = app.state_body("state-same", body["log_seq"])
+    assert len(app.transport.sent) == sent and room.state_dirty
+    assert body["version"] == socket_state["version"] and body["current_turn"] == socket_state["current_turn"]
+    assert not body["logs_reset"]
+    with room.lock:
+        app.finish_all_timers(room)
+    app.rooms.close("state-same")
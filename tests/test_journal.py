@@ -0,0 +1,101 @@
+import json
+import os
+
+import app
+import engine
+from cluster_harness import CaptureTransport
+from journal import Journal, list_segments
+from rooms import RoomRegistry
+
+
+def discard_turn(room):
+    # 目前玩家棄掉第一張牌再抽一張：每次都動到手牌、牌堆、回合位置與日誌
+    player = room.state["current_turn"]
+    app.run_command(room, "end_turn_discard_draw",
+                    {"player": player, "discard_role": room.state["players"][player].roles.to_list()[0]})
+
+def restore(j, monkeypatch):
+    monkeypatch.setattr(app, "rooms", RoomRegistry(engine.new_game_state))
+    monkeypatch.setattr(app, "journal", None)
+    app.restore_rooms(j)
+    return app.rooms
+
+def assert_same_room(restored, live):
+    assert engine.dump_state(restored.state) == engine.dump_state(live.state)
+    assert restored.state["logs"].seq == live.state["logs"].seq
+    assert restored.journal_seq == live.journal_seq
+    assert restored.rng.getstate() == live.rng.getstate()
+
+
+def test_snapshot_and_replay_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "transport", CaptureTransport())
+    j = Journal(str(tmp_path))
+    monkeypatch.setattr(app, "journal", j)
+    live = app.rooms.create("journal-rt", seed=42)
+    try:
+        with live.lock:
+            for name in ("alice", "bob", "carol"):
+                app.run_command(live, "join_game", {"player_name": name})
+            app.run_command(live, "start_game", None)
+            discard_turn(live)
+
+            # 快照切點之後、房間序列化之前又執行了一個指令：它同時在快照與新日誌段裡，重播時不能再套用一次。
+            # 用管理員重開：每套用一次就重新發牌，重複套用一定看得出來
+            live.state["players"]["alice"].is_admin = True
+            rotate = j.rotate
+
+            def rotate_then_command():
+                cut = rotate()
+                app.run_command(live, "admin_reset_game", {"player": "alice"})
+                return cut
+            monkeypatch.setattr(j, "rotate", rotate_then_command)
+            cut = app.snapshot_rooms(j)
+            assert live.journal_seq > cut
+            monkeypatch.setattr(j, "rotate", rotate)
+
+            for _ in range(3):
+                discard_turn(live)
+        j.close()
+        # 寫入執行緒還沒切到新段時，舊段要等下一次快照才刪；重播必須略過其中早於切點的紀錄
+        assert list_segments(str(tmp_path))[-1][0] == cut + 1
+
+        # 當機時最後一筆只寫了一半：之前的紀錄照常重播，半筆被忽略
+        _, last_segment = list_segments(str(tmp_path))[-1]
+        torn = json.dumps({"s": j.seq + 1, "r": live.room_id, "c": "end_turn_discard_draw",
+                           "d": {"player": live.state["current_turn"]}, "t": 0}, ensure_ascii=False)
+        with open(last_segment, "a", encoding="utf-8") as f:
+            f.write(torn[:len(torn) // 2])
+
+        reopened = Journal(str(tmp_path))
+        assert reopened.seq == j.seq
+        restored = restore(reopened, monkeypatch).get(live.room_id)
+        assert_same_room(restored, live)
+        with restored.lock:
+            app.finish_all_timers(restored)
+    finally:
+        with live.lock:
+            app.finish_all_timers(live)
+
+
+def test_replay_without_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "transport", CaptureTransport())
+    j = Journal(str(tmp_path))
+    monkeypatch.setattr(app, "journal", j)
+    live = app.rooms.create("journal-replay", seed=7)
+    try:
+        with live.lock:
+            for name in ("alice", "bob"):
+                app.run_command(live, "join_game", {"player_name": name})
+            app.run_command(live, "start_game", None)
+            for _ in range(4):
+                discard_turn(live)
+        j.close()
+        assert not os.path.exists(os.path.join(str(tmp_path), "snapshot.json"))
+
+        restored = restore(Journal(str(tmp_path)), monkeypatch).get(live.room_id)
+        assert_same_room(restored, live)
+        with restored.lock:
+            app.finish_all_timers(restored)
+    finally:
+        with live.lock:
+            app.finish_all_timers(live)
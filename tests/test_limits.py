@@ -0,0 +1,83 @@
+import app
+import limits
+from cluster_harness import CaptureTransport
+from limits import RateLimiter
+
+
+def test_bucket_refills_at_its_rate():
+    limiter = RateLimiter(event_limits={"play_card": (2.0, 3)}, connection=(100.0, 100))
+    assert [limiter.allow("s", "play_card", now=0.0) for _ in range(4)] == [True, True, True, False]
+    assert not limiter.allow("s", "play_card", now=0.4)     # 0.8 個權杖，還不夠
+    assert limiter.allow("s", "play_card", now=0.5)
+    assert not limiter.allow("s", "play_card", now=0.5)
+    # 閒置再久也只補到桶容量
+    assert [limiter.allow("s", "play_card", now=100.0) for _ in range(4)] == [True, True, True, False]
+
+
+def test_each_event_has_its_own_bucket_and_shares_the_connection_bucket():
+    limiter = RateLimiter(event_limits={"create_room": (0.2, 1)}, default=(5.0, 2), connection=(1.0, 3))
+    assert limiter.allow("s", "create_room", now=0.0)
+    assert not limiter.allow("s", "create_room", now=0.0)
+    # 其他事件用預設上限，不受 create_room 影響；被事件桶擋下的請求沒有扣到連線總桶
+    assert limiter.allow("s", "play_card", now=0.0)
+    assert limiter.allow("s", "play_card", now=0.0)
+    assert not limiter.allow("s", "play_card", now=0.0)
+    assert not limiter.allow("s", "call_bluff", now=0.0)     # 連線總桶已用完
+    assert limiter.allow("other", "call_bluff", now=0.0)    # 每條連線各自計算
+    limiter.forget("s")
+    assert len(limiter) == 1 and limiter.allow("s", "create_room", now=0.0)
+
+
+def test_notices_are_throttled():
+    limiter = RateLimiter()
+    assert limiter.should_notify("s", now=10.0)
+    assert not limiter.should_notify("s", now=10.5)
+    assert limiter.should_notify("s", now=11.0)
+
+
+def test_valid_payload_rejects_malformed_shapes():
+    ok = [
+        ("play_card", {"player": "alice", "role": None, "target": "bob", "is_bluff": True,
+                       "extra": {"mode": "a", "second_target": None}, "cmd_id": 3}),
+        ("play_card", None),
+        ("join_game", {"player_name": "alice", "room_id": "r1"}),
+        ("unknown_event", ["anything"]),
+    ]
+    bad = [
+        ("join_game", "alice"),
+        ("join_game", {"player_name": 1}),
+        ("join_game", {"player_name": "x" * 33}),
+        ("join_game", {"player_name": "alice", "extra_field": 1}),
+        ("play_card", {"player": "alice", "extra": "a"}),
+        ("play_card", {"player": "alice", "extra": {"mode": "toolong"}}),
+        ("play_card", {"player": "alice", "extra": {"nested": {}}}),
+        ("call_bluff", {"prompt_id": ["p"], "player": "bob"}),
+        ("end_turn_discard_draw", {"player": "alice", "cmd_id": 1.5}),
+    ]
+    assert all(limits.valid_payload(event, data) for event, data in ok)
+    assert not any(limits.valid_payload(event, data) for event, data in bad)
+
+
+def test_read_only_requests_are_coalesced_while_queued(monkeypatch):
+    transport = CaptureTransport()
+    monkeypatch.setattr(app, "transport", transport)
+    room = app.rooms.create("limits-coalesce")
+    try:
+        # 房間已有執行者（佇列取完前不會執行）：同一連線的重複請求只排一次
+        room.draining = True
+        for _ in range(3):
+            app.call_room(room.room_id, "handle_request_full_state", None, "sid-a")
+        app.call_room(room.room_id, "handle_request_full_state", None, "sid-b")
+        app.call_room(room.room_id, "handle_get_my_cards", {"player": "alice"}, "sid-a")
+        assert len(room.commands) == 3
+        assert room.inflight == {("handle_request_full_state", "sid-a"), ("handle_request_full_state", "sid-b"),
+                                 ("handle_get_my_cards", "sid-a")}
+
+        app.drain(room)
+        assert not room.commands and not room.inflight
+        assert transport.events_to("sid-a") == ["game_state", "error"]    # alice 還沒入座，補手牌回錯誤
+        # 執行過後同一個請求又可以排入
+        app.call_room(room.room_id, "handle_request_full_state", None, "sid-a")
+        assert transport.events_to("sid-a") == ["game_state", "error", "game_state"]
+    finally:
+        app.rooms.close(room.room_id)
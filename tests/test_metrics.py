@@ -0,0 +1,25 @@
+import app
+import metrics
+from cluster_harness import CaptureTransport
+
+
+def handled(name):
+    series = app.HANDLER_SECONDS._series.get((name,))
+    return series[-1] if series else 0
+
+
+def test_handler_time_counts_only_executed_handlers(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    monkeypatch.setattr(app, "transport", CaptureTransport())
+    room = app.rooms.create("metrics-handler")
+    before = handled("handle_request_full_state")
+
+    app.submit(room, app.run_handler, ("handle_request_full_state", {"cmd_id": "a"}, "sid-1"))
+    assert handled("handle_request_full_state") == before + 1
+
+    # 重送同一個 cmd_id、觀戰者下的指令都沒有執行處理器，不計入處理時間
+    app.submit(room, app.run_handler, ("handle_request_full_state", {"cmd_id": "a"}, "sid-1"))
+    room.spectators["sid-2"] = "json"
+    app.submit(room, app.run_handler, ("handle_play_card", {}, "sid-2"))
+    assert handled("handle_request_full_state") == before + 1
+    assert handled("handle_play_card") == 0
@@ -0,0 +1,26 @@
+import app
+
+
+def connect(room_id):
+    return app.socketio.test_client(app.app, query_string="room=" + room_id)
+
+def names(client):
+    return [m["name"] for m in client.get_received()]
+
+
+def test_get_my_cards_does_not_hand_over_another_seat():
+    alice, eve = connect("hands-hijack"), connect("hands-hijack")
+    alice.emit("join_game", {"player_name": "alice"})
+    eve.emit("join_game", {"player_name": "eve"})
+    alice.emit("start_game")
+    room = app.rooms.get("hands-hijack")
+    alice_sid = room.player_sids["alice"]
+    alice.get_received(), eve.get_received()
+
+    eve.emit("get_my_cards", {"player": "alice"})
+    assert names(eve) == ["error"]
+    assert room.player_sids["alice"] == alice_sid
+
+    alice.emit("get_my_cards", {"player": "alice"})
+    assert names(alice) == ["my_cards"]
+    alice.disconnect(), eve.disconnect()
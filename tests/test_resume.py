@@ -0,0 +1,76 @@
+from collections import deque
+
+import app
+
+
+def connect(room_id, *params):
+    return app.socketio.test_client(app.app, query_string="&".join(("room=" + room_id,) + params))
+
+def room_events(messages):
+    # 房間事件帶第二個參數（事件序號）；私人事件沒有
+    return [(m["name"], m["args"][1], m["args"][0]) for m in messages if len(m["args"]) > 1]
+
+def discard_turn(room, clients):
+    player = room.state["current_turn"]
+    clients[player].emit("end_turn_discard_draw",
+                         {"player": player, "discard_role": room.state["players"][player].roles.to_list()[0]})
+
+def seated(room_id):
+    alice, bob, carol = connect(room_id), connect(room_id), connect(room_id)
+    for name, client in (("alice", alice), ("bob", bob), ("carol", carol)):
+        client.emit("join_game", {"player_name": name})
+    received = alice.get_received()
+    token = [m["args"][0]["token"] for m in received if m["name"] == "session"][-1]
+    last_seq = max(seq for _, seq, _ in room_events(received))
+    bob.get_received()
+    return alice, bob, carol, token, last_seq
+
+
+def test_resume_replays_exactly_the_missed_events():
+    alice, bob, carol, token, last_seq = seated("resume-replay")
+    room = app.rooms.get("resume-replay")
+    alice.disconnect()
+    clients = {"bob": bob, "carol": carol}
+    bob.emit("start_game")
+    for _ in range(4):
+        if room.state["current_turn"] == "alice":
+            break
+        discard_turn(room, clients)
+    missed = room_events(bob.get_received())
+    assert missed and missed[0][1] == last_seq + 1
+
+    resumed = connect("resume-replay", "resume=" + token, "seq=%d" % last_seq)
+    try:
+        received = resumed.get_received()
+        assert received[0]["name"] == "session" and received[0]["args"][0]["player"] == "alice"
+        assert room_events(received) == missed
+        assert [m["name"] for m in received if len(m["args"]) == 1] == ["session", "my_cards"]
+        assert received[-1]["args"][0]["cards"] == room.state["players"]["alice"].roles.to_list()
+        assert room.player_sids["alice"] not in (None, "")
+        # 已經補齊的連線再帶最新序號重連：什麼都不用補
+        latest = missed[-1][1]
+        again = connect("resume-replay", "resume=" + token, "seq=%d" % latest)
+        assert room_events(again.get_received()) == []
+        again.disconnect()
+    finally:
+        resumed.disconnect(), bob.disconnect(), carol.disconnect()
+
+
+def test_resume_older_than_buffer_sends_full_state():
+    alice, bob, carol, token, last_seq = seated("resume-full")
+    room = app.rooms.get("resume-full")
+    room.event_buffer = deque(room.event_buffer, maxlen=1)
+    alice.disconnect()
+    bob.emit("start_game")      # 開局至少有狀態與 game_started 兩筆房間事件，緩衝區只留最後一筆
+    assert room.event_seq - last_seq > len(room.event_buffer)
+
+    resumed = connect("resume-full", "resume=" + token, "seq=%d" % last_seq)
+    try:
+        received = resumed.get_received()
+        assert room_events(received) == []
+        assert [m["name"] for m in received] == ["session", "game_state", "my_cards"]
+        full = received[1]["args"][0]
+        assert full["version"] == room.version and full["event_seq"] == room.event_seq
+        assert full["logs"] == list(room.state["logs"])
+    finally:
+        resumed.disconnect(), bob.disconnect(), carol.disconnect()
@@ -0,0 +1,63 @@
+import threading
+
+from scheduler import Scheduler
+
+
+def test_cancel_counts_each_pending_handle_once():
+    sched = Scheduler("test-cancel")
+    try:
+        handles = [sched.call_later(60, lambda: None) for _ in range(10)]
+        start = threading.Barrier(8)
+
+        def cancel_all():
+            start.wait()
+            for h in handles:
+                h.cancel()
+        threads = [threading.Thread(target=cancel_all) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert sched._cancelled == 10 and len(sched) == 0
+    finally:
+        sched.stop()
+
+
+def test_fired_handle_cannot_be_cancelled():
+    sched = Scheduler("test-fired")
+    fired = threading.Event()
+    try:
+        handle = sched.call_later(0, fired.set)
+        assert fired.wait(5)
+        pending = sched.call_later(60, lambda: None)
+        handle.cancel()
+        assert sched._cancelled == 0 and len(sched) == 1
+        pending.cancel()
+        assert sched._cancelled == 1 and len(sched) == 0
+    finally:
+        sched.stop()
+
+
+def test_room_timers_run_off_the_scheduler_thread(monkeypatch):
+    import app
+    from cluster_harness import CaptureTransport
+
+    monkeypatch.setattr(app, "transport", CaptureTransport())
+    room = app.rooms.create("timer-offload")
+    started, ran = threading.Event(), threading.Event()
+    threads = []
+
+    def slow_callback(room):
+        threads.append(threading.current_thread().name)
+        started.set()
+        ran.wait(5)
+    app.schedule(room, 0, slow_callback)
+    # 房間的回呼卡住時，排程執行緒照樣執行其他到期的計時器
+    other = threading.Event()
+    app.scheduler.call_later(0, other.set)
+    try:
+        assert other.wait(5) and started.wait(5)
+        assert threads[0] != "game-timers"
+    finally:
+        ran.set()
+        app.rooms.close(room.room_id)
@@ -0,0 +1,72 @@
+import time
+
+import app
+
+PRIVATE_KEYS = {"roles", "cards", "token", "prompt_id"}
+
+
+def connect(room_id, *params):
+    return app.socketio.test_client(app.app, query_string="&".join(("room=" + room_id,) + params))
+
+def keys_of(obj):
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            yield k
+            yield from keys_of(v)
+    elif isinstance(obj, list):
+        for v in obj:
+            yield from keys_of(v)
+
+
+def test_spectator_sees_only_delayed_public_state(monkeypatch):
+    delay = 0.3
+    monkeypatch.setattr(app, "SPECTATOR_DELAY_SEC", delay)
+    monkeypatch.setattr(app, "SPECTATOR_HZ", 50.0)
+    committed = []      # (時間, 快照)：每一版公開狀態何時產生
+    commit = app.commit_snapshot
+
+    def recording_commit(room, snap):
+        committed.append((time.monotonic(), snap))
+        commit(room, snap)
+    monkeypatch.setattr(app, "commit_snapshot", recording_commit)
+
+    alice, bob = connect("spectate"), connect("spectate")
+    watcher = connect("spectate", "role=spectator")
+    received = []
+
+    def poll(seconds):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            now = time.monotonic()
+            received.extend((now, m) for m in watcher.get_received())
+            time.sleep(0.01)
+    try:
+        alice.emit("join_game", {"player_name": "alice"})
+        bob.emit("join_game", {"player_name": "bob"})
+        alice.emit("start_game")
+        room = app.rooms.get("spectate")
+        poll(0.1)
+        player = room.state["current_turn"]
+        client = alice if player == "alice" else bob
+        client.emit("end_turn_discard_draw",
+                    {"player": player, "discard_role": room.state["players"][player].roles.to_list()[0]})
+        poll(delay + 0.3)
+
+        # 觀戰者下的指令一律被拒絕，狀態不變
+        before = app.engine.dump_state(room.state)
+        watcher.emit("join_game", {"player_name": "eve"})
+        watcher.emit("end_turn_discard_draw", {"player": room.state["current_turn"], "discard_role": None})
+        watcher.emit("start_game")
+        assert [m["args"][0]["message"] for m in watcher.get_received()] == ["觀戰中，無法操作"] * 3
+        assert app.engine.dump_state(room.state) == before
+    finally:
+        alice.disconnect(), bob.disconnect(), watcher.disconnect()
+
+    assert {m["name"] for _, m in received} == {"spectator_state"}
+    views = [(t, m["args"][0]) for t, m in received]
+    assert views[-1][1]["turn_index"] == room.state["turn_index"] and views[-1][1]["current_turn"] != player
+    for t, view in views:
+        assert not PRIVATE_KEYS & set(keys_of(view))
+        # 每一份畫面都對應到至少早 delay 秒產生的公開狀態
+        shown = [ts for ts, snap in committed if {k: view[k] for k in snap} == snap]
+        assert shown and min(shown) <= t - delay
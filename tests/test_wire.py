@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import app
+import wire
+from cluster_harness import CaptureTransport
+from engine import CARD_TYPES
+
+msgpack = pytest.importorskip("msgpack")
+
+MSGPACK_JS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "js", "msgpack.js")
+
+
+def test_cards_travel_as_indices():
+    payload = {"cards": list(CARD_TYPES), "role": CARD_TYPES[2], "message": CARD_TYPES[2]}
+    packed = wire.compact(payload)
+    assert packed == {"c": list(range(len(CARD_TYPES))), "ro": 2, "m": CARD_TYPES[2]}
+    assert wire.expand(packed) == payload
+    # 名稱對照表裡的玩家名稱不縮寫，也不當成卡牌
+    players = {"players": {"role": {"score": 1}}}
+    assert wire.expand(wire.compact(players)) == players
+
+
+def test_room_events_round_trip(monkeypatch):
+    transport = CaptureTransport()
+    monkeypatch.setattr(app, "transport", transport)
+    room = app.rooms.create("wire-rt", seed=5)
+    room.compact_sids.add("sid-c")
+    try:
+        with room.lock:
+            for name in ("alice", "bob", "carol"):
+                app.run_command(room, "join_game", {"player_name": name})
+            room.player_sids["alice"] = "sid-c"
+            app.run_command(room, "start_game", None)
+            for _ in range(3):
+                player = room.state["current_turn"]
+                app.run_command(room, "end_turn_discard_draw",
+                                {"player": player, "discard_role": room.state["players"][player].roles.to_list()[0]})
+            app.send_full_state(room, "sid-c")
+        # 房間事件同時送 JSON 與精簡兩份：精簡那份解碼後要與 JSON 相同
+        sent = transport.sent
+        pairs = [(a, b) for a, b in zip(sent, sent[1:]) if b[2] == wire.socket_room(room.room_id, wire.COMPACT)]
+        events = {a[0] for a, _ in pairs}
+        assert {"game_state", "game_state_patch", "game_started"} <= events
+        for (event, (payload, seq), _), (compact_event, (data, compact_seq), _) in pairs:
+            assert (compact_event, compact_seq) == (event, seq)
+            assert wire.decode(data) == payload
+        assert any(p["logs_new"] for (e, (p, _), _), _ in pairs if e == "game_state_patch")
+
+        private = [(event, payload) for event, payload, to in sent if to == "sid-c"]
+        assert {event for event, _ in private} == {"my_cards", "game_state"}
+        cards = [wire.decode(data) for event, data in private if event == "my_cards"]
+        assert cards[-1] == {"cards": room.state["players"]["alice"].roles.to_list()}
+        full = wire.decode(private[-1][1])
+        assert full["logs"] == list(room.state["logs"]) and full["version"] == room.version
+
+        patch = {"base": 1, "v": 2, "set": {"current_turn": "bob"}, "unset": ["winner"], "players_removed": ["carol"],
+                 "players": {"alice": {"hand_count": 2}}, "logs_reset": True, "logs_new": ["a", "b"], "log_seq": 9}
+        assert wire.decode(wire.encode(patch)) == patch
+    finally:
+        with room.lock:
+            app.finish_all_timers(room)
+        app.rooms.close(room.room_id)
+
+
+# 手寫的 JS 解碼器只能靠固定位元組對照：每個型別的前綴照規格手寫，不從編碼器產生
+VECTOR_VALUE = {
+    "s8": "生日快樂" * 4,
+    "s16": "y" * 300,
+    "neg": -5,
+    "f": 0.1,
+    "m": {"k%02d" % i: i for i in range(16)},
+}
+VECTOR_BYTES = (
+    b"\x85"
+    + b"\xa2s8" + b"\xd9\x30" + "生日快樂".encode("utf-8") * 4
+    + b"\xa3s16" + b"\xda\x01\x2c" + b"y" * 300
+    + b"\xa3neg" + b"\xfb"
+    + b"\xa1f" + b"\xcb\x3f\xb9\x99\x99\x99\x99\x99\x9a"
+    + b"\xa1m" + b"\xde\x00\x10" + b"".join(b"\xa3" + b"k%02d" % i + bytes([i]) for i in range(16))
+)
+
+
+def test_fixed_vector_matches_encoder():
+    assert msgpack.packb(VECTOR_VALUE, use_bin_type=True) == VECTOR_BYTES
+    assert msgpack.unpackb(VECTOR_BYTES, raw=False) == VECTOR_VALUE
+
+
+@pytest.mark.skipif(not shutil.which("node"), reason="需要 node 執行頁面的解碼器")
+def test_fixed_vector_matches_js_decoder():
+    script = ("globalThis.window = {}; require(process.argv[1]);"
+              "const value = window.MessagePack.decode(Buffer.from(process.argv[2], 'hex'));"
+              "process.stdout.write(JSON.stringify(value));")
+    out = subprocess.run(["node", "-e", script, MSGPACK_JS, VECTOR_BYTES.hex()],
+                         capture_output=True, check=True, timeout=30).stdout
+    assert json.loads(out) == VECTOR_VALUE
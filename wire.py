@@ -0,0 +1,98 @@
+from engine import CARD_TYPES, ROLE_DISPLAY_NAMES
+
+try:
+    import msgpack
+except ImportError:  # 未安裝 msgpack 時一律使用 JSON
+    msgpack = None
+
+# ====== 精簡線路編碼 ======
+# 連線時以 ?enc=msgpack 協商。精簡模式下，伺服器送出的每個事件只帶一個二進位參數：
+# 以 MessagePack 打包、欄位改用短鍵、卡牌改為 CARD_TYPES 的索引。
+# 客戶端依 client_table() 還原；收到的若是一般物件（JSON）則照原樣使用。
+# 客戶端送出的動作仍是 JSON（資料量小），不需解碼。
+JSON = "json"
+COMPACT = "msgpack"
+ROOM_SUFFIX = "#c"      # 精簡模式的連線加入的 Socket.IO 房間：<room_id>#c
+
+CARD_IDS = {card: i for i, card in enumerate(CARD_TYPES)}
+CARD_FIELDS = frozenset(("role", "roles", "cards", "discard_role"))
+NAME_MAPS = frozenset(("players",))     # 以玩家名稱為鍵的 dict：鍵不縮寫
+SCALARS = frozenset((str, int, float, bool, type(None)))
+KEYS = {
+    # 狀態
+    "room_id": "r", "players": "p", "player_order": "o", "current_turn": "t",
+    "draw_pile_count": "dp", "discard_pile_count": "dc", "game_started": "g",
+    "max_players": "mp", "turn_index": "ti", "max_rounds": "mr", "round_number": "rn",
+    "time_remaining_ms": "tr", "turn_marker": "tm", "logs": "l", "log_seq": "ls", "version": "vn",
+    # 差異
+    "set": "s", "unset": "u", "players_removed": "pr", "logs_new": "ln", "logs_reset": "lr", "base": "b", "v": "v",
+    # 玩家
+    "score": "sc", "guardian_active": "ga", "mark_target": "mk", "mark_used_turn": "mu",
+    "is_admin": "ad", "stats": "st", "hand_count": "hc",
+    "call_bluff_success": "cs", "bluff_success": "bs", "turns_taken": "tt",
+    # 事件
+    "prompt_id": "pi", "player": "pl", "target": "tg", "role": "ro", "timeout_ms": "to",
+    "success": "ok", "message": "m", "results": "rs", "reason": "re", "total_players": "tp",
+    "cards": "c", "roles": "rl", "delay_ms": "dl", "event_seq": "es", "token": "tk",
+}
+
+
+def available():
+    return msgpack is not None
+
+def negotiate(requested):
+    return COMPACT if requested == COMPACT and available() else JSON
+
+def socket_room(room_id, encoding):
+    return room_id + ROOM_SUFFIX if encoding == COMPACT else room_id
+
+def compact(obj, key=None):
+    # 以 type() 比對而非 isinstance：狀態只含 dict / list / 純量，這條路徑每次廣播都會走
+    t = type(obj)
+    if t is dict:
+        if key in NAME_MAPS:
+            return {name: compact(v) for name, v in obj.items()}
+        return {KEYS.get(k, k): (v if type(v) in SCALARS and k not in CARD_FIELDS else compact(v, k))
+                for k, v in obj.items()}
+    if t is list:
+        if key in CARD_FIELDS:
+            return [CARD_IDS.get(c, c) for c in obj]
+        return [v if type(v) in SCALARS else compact(v) for v in obj]
+    if key in CARD_FIELDS:
+        return CARD_IDS.get(obj, obj)
+    return obj
+
+def encode(payload):
+    return msgpack.packb(compact(payload), use_bin_type=True)
+
+# 還原（與頁面中的 expandWire 相同；供壓力測試等 Python 客戶端使用）
+FULL_KEYS = {short: full for full, short in KEYS.items()}
+SHORT_CARD_FIELDS = frozenset(KEYS[k] for k in CARD_FIELDS if k in KEYS)
+SHORT_NAME_MAPS = frozenset(KEYS[k] for k in NAME_MAPS)
+
+def expand(obj, key=None):
+    t = type(obj)
+    if t is dict:
+        if key in SHORT_NAME_MAPS:
+            return {name: expand(v) for name, v in obj.items()}
+        return {FULL_KEYS.get(k, k): expand(v, k) for k, v in obj.items()}
+    if t is list:
+        if key in SHORT_CARD_FIELDS:
+            return [CARD_TYPES[c] if type(c) is int else c for c in obj]
+        return [expand(v) for v in obj]
+    if key in SHORT_CARD_FIELDS and type(obj) is int:
+        return CARD_TYPES[obj]
+    return obj
+
+def decode(data):
+    return expand(msgpack.unpackb(data, raw=False))
+
+def client_table():
+    # 注入頁面的對照表：卡牌索引 → 名稱，短鍵 → 原鍵
+    return {
+        "cards": CARD_TYPES,
+        "names": [ROLE_DISPLAY_NAMES[c] for c in CARD_TYPES],
+        "keys": FULL_KEYS,
+        "card_fields": sorted(SHORT_CARD_FIELDS),
+        "name_maps": sorted(SHORT_NAME_MAPS),
+    }